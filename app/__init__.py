@@ -7,14 +7,35 @@ def create_app():
 
     # Importar e registrar os Blueprints das rotas
     from app.routes.main_routes import main_bp
-    from app.routes.auth_routes import auth_bp
+    from app.routes.auth_routes import auth_bp, verificar_autenticacao
     from app.routes.process_routes import process_bp
     from app.routes.user_routes import user_bp
+    from app.routes.respostas import comprimir_resposta
+    from app.routes.metricas_routes import metricas_bp, iniciar_cronometro, registrar_requisicao
+    from app.routes.admin_routes import admin_bp
 
     # Registrar os Blueprints
     app.register_blueprint(main_bp)  # Rota principal
     app.register_blueprint(auth_bp)  # Rota de autenticação
     app.register_blueprint(process_bp)  # Rota de processamento
     app.register_blueprint(user_bp)  # Rota de usuário
+    app.register_blueprint(metricas_bp)  # Métricas no formato do Prometheus
+    app.register_blueprint(admin_bp)  # Rotas de administração (perfis dos jobs)
+
+    # Latência por rota: registrado antes dos demais para medir também a autenticação e a compressão
+    app.before_request(iniciar_cronometro)
+    app.after_request(registrar_requisicao)
+    # Autenticação centralizada para todas as rotas (com cache da validade do token)
+    app.before_request(verificar_autenticacao)
+    # Compressão gzip das respostas grandes (JSON de resultados, páginas)
+    app.after_request(comprimir_resposta)
+
+    # Jobs deixados como ativos por processos que não existem mais (reinício do servidor)
+    from app.process.fila_jobs import fila_jobs
+    fila_jobs.recuperar_orfaos()
+
+    # Grava periodicamente as métricas deste processo, somadas entre os workers em /metrics
+    from app.process.metricas import metricas
+    metricas.iniciar()
 
     return app
\ No newline at end of file
@@ -1,3 +1,8 @@
+import threading
+
+from app.globals import ANO_FINAL_PADRAO, ANO_INICIAL_PADRAO, TAREFA_MULTIANUAL
+
+
 class ResultadosDTO:
     def __init__(self, nome_local, ano_inicial, ano_final, area, latitude, longitude,
                  dados_grafico_precipitacao, dados_grafico_precipitacao_vs_evaporacao, 
@@ -37,7 +42,8 @@ class ResultadosDTO:
         }
     
 class ProcessarDadosDTO:
-    def __init__(self, latitude, longitude, cultura, estagio, head, user_id, ano_inicial=2004, ano_final=2024):
+    def __init__(self, latitude, longitude, cultura, estagio, head, user_id, ano_inicial=ANO_INICIAL_PADRAO, ano_final=ANO_FINAL_PADRAO,
+                 tarefa_unica=TAREFA_MULTIANUAL, stop_event=None):
         self.latitude = float(latitude)
         self.longitude = float(longitude)
         self.cultura = cultura
@@ -45,4 +51,40 @@ class ProcessarDadosDTO:
         self.head = head
         self.ano_inicial = ano_inicial
         self.ano_final = ano_final
-        self.user_id = user_id
\ No newline at end of file
+        self.user_id = user_id
+        self.tarefa_unica = tarefa_unica
+        # Cancelamento próprio de cada job: parar um job não afeta os demais
+        self.stop_event = stop_event or threading.Event()
+
+
+class ProcessarLoteDTO:
+    def __init__(self, coordenadas, cultura, estagio, head, user_id, ano_inicial=ANO_INICIAL_PADRAO, ano_final=ANO_FINAL_PADRAO,
+                 stop_event=None):
+        self.coordenadas = [(float(lat), float(lon)) for lat, lon in coordenadas]
+        self.cultura = cultura
+        self.estagio = estagio
+        self.head = head
+        self.ano_inicial = ano_inicial
+        self.ano_final = ano_final
+        self.user_id = user_id
+        self.stop_event = stop_event or threading.Event()
+
+
+class ResultadosLoteDTO:
+    def __init__(self, ano_inicial, ano_final, area, cultura, estagio, locais):
+        self.ano_inicial = ano_inicial
+        self.ano_final = ano_final
+        self.area = area
+        self.cultura = cultura
+        self.estagio = estagio
+        self.locais = locais
+
+    def to_dict(self):
+        return {
+            "ano_inicial": self.ano_inicial,
+            "ano_final": self.ano_final,
+            "area": self.area,
+            "cultura": self.cultura,
+            "estagio": self.estagio,
+            "locais": self.locais,
+        }
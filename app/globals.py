@@ -1,5 +1,76 @@
+import os
 import threading
 
-# Variável global para controlar a execução
+# Evento padrão de interrupção para chamadas fora da fila de jobs (cada job tem o seu)
 stop_event = threading.Event()
-api_url = "https://appeears.earthdatacloud.nasa.gov/api/"
\ No newline at end of file
+
+# Servidor substituto local (carga/simulador.py): quando SIMULADOR_URL está definido, o AppEEARS,
+# o CHIRPS e o Nominatim são atendidos por ele, sem credenciais da NASA nem a fila real
+SIMULADOR_URL = os.environ.get("SIMULADOR_URL", "").rstrip("/")
+if SIMULADOR_URL:
+    api_url = f"{SIMULADOR_URL}/api/"
+    URL_CHIRPS = f"{SIMULADOR_URL}/chirps/"
+    URL_NOMINATIM = f"{SIMULADOR_URL}/nominatim/reverse"
+else:
+    api_url = "https://appeears.earthdatacloud.nasa.gov/api/"
+    URL_CHIRPS = "https://data.chc.ucsb.edu/products/CHIRPS-2.0/global_annual/tifs/"
+    URL_NOMINATIM = "https://nominatim.openstreetmap.org/reverse"
+# Com o simulador, caches, dados dos usuários e banco de usuários ficam em pastas próprias,
+# para que os dados sintéticos nunca sejam reaproveitados por análises reais
+SUFIXO_DADOS = "_simulador" if SIMULADOR_URL else ""
+
+# Número máximo de tarefas do AppEEARS acompanhadas em paralelo por análise
+MAX_TAREFAS_SIMULTANEAS = 8
+
+# Pede todos os anos de ET/PET em uma única tarefa recorrente do AppEEARS
+TAREFA_MULTIANUAL = False
+
+# Pasta dos caches compartilhados entre usuários (fora de app/static)
+CACHE_DIR = f"app/cache{SUFIXO_DADOS}"
+
+# Pasta das análises de cada usuário, servida em /static/{URL_DADOS}
+URL_DADOS = f"data{SUFIXO_DADOS}"
+PASTA_DADOS = f"app/static/{URL_DADOS}"
+
+# Número máximo de arquivos de um bundle baixados em paralelo
+DOWNLOADS_SIMULTANEOS = 4
+
+# Período padrão das análises; ao publicar um novo ano do MODIS/CHIRPS basta avançar o
+# ano final (a tabela anual de cada local faz com que só o ano novo seja processado)
+ANO_INICIAL_PADRAO = 2004
+ANO_FINAL_PADRAO = 2024
+
+# Número máximo de coordenadas em uma análise em lote (uma feature por local na tarefa do AppEEARS)
+MAX_LOCAIS_LOTE = 100
+
+# Fila de jobs: análises executadas ao mesmo tempo por processo e jobs aguardando na fila
+# (somando todos os workers); acima disso, novos pedidos recebem 429
+MAX_JOBS_SIMULTANEOS = 2
+TAMANHO_FILA_JOBS = 8
+# Tempo (s) após o fim de um job até apagar seus logs e eventos de progresso, e até apagar o job
+RETENCAO_LOGS_JOBS = 24 * 3600
+RETENCAO_JOBS = 7 * 24 * 3600
+
+# Consulta o Nominatim quando o gazetteer local não cobre a coordenada (ex.: fora do Brasil)
+GEOCODIFICACAO_ONLINE = True
+
+# Banco de usuários (fora de app/static, para não ser servido como arquivo estático)
+ARQUIVO_USUARIOS = f"app/dados{SUFIXO_DADOS}/usuarios.sqlite"
+
+# Resultados de análise mantidos já decodificados em memória (por processo)
+MAX_RESULTADOS_EM_CACHE = 32
+# Respostas a partir deste tamanho (bytes) são comprimidas quando o cliente aceita
+TAMANHO_MINIMO_COMPRESSAO = 1024
+
+# Tiles XYZ do mapa de aridez mantidos em memória (por processo); os demais ficam em disco
+MAX_TILES_EM_MEMORIA = 2048
+
+# Token exigido (Authorization: Bearer) para raspar /metrics; sem ele, a rota é pública
+METRICAS_TOKEN = os.environ.get("METRICAS_TOKEN")
+
+# Perfil dos jobs (app/process/perfilador.py): com PERFILAR_JOBS=1 todos os jobs são perfilados;
+# sem ele, só os pedidos com perfil=1 de usuários administradores. Amostras a cada 10 ms
+PERFILAR_JOBS = os.environ.get("PERFILAR_JOBS") == "1"
+INTERVALO_AMOSTRAGEM_PERFIL = 0.01
+# Usuários do AppEEARS (separados por vírgula) com acesso às rotas /admin
+ADMINISTRADORES = {u.strip() for u in os.environ.get("ADMINISTRADORES", "").split(",") if u.strip()}
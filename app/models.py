@@ -1,86 +1,247 @@
 import os
+import numpy as np
 from app.process.climate_analysis import calcular_e_classificar_indices_aridez, recomendar_irrigacao, processar_dados_aridez
-from app.process.data_processing import processar_balanco_hidrico, processar_precipitacao
+from app.process.data_processing import (
+    gerar_grafico_balanco_hidrico, gerar_grafico_precipitacao, obter_balanco_hidrico, obter_balanco_lote,
+    obter_precipitacao, obter_precipitacao_lote
+)
 from app.process.file_operations import criar_diretorios, obter_caminhos_graficos
-from app.process.graphics import calcular_e_gerar_grafico_rai, calcular_indices_e_gerar_graficos, gerar_grafico_indice_aridez_unep
-from app.process.map_operations import criar_mapa
+from app.process.graphics import (
+    calcular_e_gerar_grafico_rai, calcular_indices_aridez, gerar_grafico_indice_aridez_unep,
+    gerar_grafico_precipitacao_evaporacao
+)
+from app.process.map_operations import montar_data_json, salvar_mapa
+from app.process.nucleo_analitico import analisar_lote, coeficiente_cultura
+from app.process.monitor_tarefas import monitor_tarefas
+from app.process.pipeline import Etapa, Progresso, executar_etapas
 from app.process.utils import get_location_name
 import climateservaccess as ca
-from app.globals import api_url as api
-from app.dto.dtos import ResultadosDTO
-from app.dto.dtos import ProcessarDadosDTO
+from app.globals import PASTA_DADOS, api_url as api
+from app.dto.dtos import ResultadosDTO, ResultadosLoteDTO
+from app.dto.dtos import ProcessarDadosDTO, ProcessarLoteDTO
 
 
-def processar_dados(dto: ProcessarDadosDTO, log=print):
+def processar_dados(dto: ProcessarDadosDTO, log=print, emitir_progresso=None):
     """
     Processa os dados necessários para o sistema, utilizando o cabeçalho de autenticação (head) fornecido.
+    emitir_progresso(evento), se informado, recebe o andamento estruturado (etapa, percentual, ano, ETA).
     """
     _res = 10
-    inDir = 'app/static/data'
+    inDir = PASTA_DADOS
 
     if not os.path.exists(inDir):
         os.makedirs(inDir)
 
     _localdataName, _graficos = criar_diretorios(inDir, dto.user_id, dto.latitude, dto.longitude, _res)
-
-    _NomeLocal = get_location_name(dto.latitude, dto.longitude, log=log)
     _quadrado = ca.getBox(dto.latitude, dto.longitude, _res)
 
-    data_Json = criar_mapa(dto.latitude, dto.longitude, _quadrado, _graficos)
-
-    log("Processando dados de balanço hídrico...")
-    _balanco, dados_grafico_balanco_hidrico = processar_balanco_hidrico(
-        dto.ano_inicial, dto.ano_final, data_Json, _localdataName, api, dto.head, _NomeLocal, log=log
+    # Pesos aproximados do tempo de cada etapa: o AppEEARS e o CHIRPS dominam a análise
+    progresso = Progresso(
+        {"balanco": 60, "precipitacao": 25, "indices": 3, "mapa_aridez": 5, "grafico_aridez": 1,
+         "classificacao": 1, "rai": 1, "recomendacoes": 1, "nome_local": 1, "mapa": 2},
+        emitir_progresso or (lambda evento: None),
+        eta_externa=lambda: monitor_tarefas.eta(dto.head),
     )
 
-    log("Gerando dados de precipitação...")
-    _precipitacao_df, dados_grafico_precipitacao = processar_precipitacao(
-        dto.ano_inicial, dto.ano_final, data_Json, _localdataName, _graficos, _NomeLocal, log=log
-    )
-
-    log("Calculando índices de aridez...")
-    dados_grafico_precipitacao_vs_evaporacao = calcular_indices_e_gerar_graficos(_balanco, _precipitacao_df, dto.ano_inicial, dto.ano_final, _graficos)
-
-    log("Gerando dados de índice de aridez (UNEP)...")
-    dados_grafico_aridez = gerar_grafico_indice_aridez_unep(_balanco, dto.ano_inicial, dto.ano_final, _graficos)
-
-    log("Classificando índices de aridez...")
-    indices_e_classificacoes = calcular_e_classificar_indices_aridez(_balanco, dto.ano_inicial, dto.ano_final)
-
-    log("Processando dados para mapa de aridez com o indice de aridez...")
-    mapaIA_path = processar_dados_aridez(dto.ano_inicial, dto.ano_final, _localdataName, _graficos, _NomeLocal)
-
-    log("Calculando RAI e gerando dados...")
-    dados_grafico_rai = calcular_e_gerar_grafico_rai(_balanco, _precipitacao_df, _graficos)
+    # Grafo de etapas: cada etapa declara de quais resultados depende. Geocodificação, mapa,
+    # CHIRPS e AppEEARS rodam em paralelo; as demais começam assim que suas entradas ficam prontas.
+    etapas = [
+        Etapa("nome_local", lambda: get_location_name(dto.latitude, dto.longitude, log=log)),
+        Etapa("data_Json", lambda: montar_data_json(_quadrado)),
+        Etapa("mapa", lambda: salvar_mapa(dto.latitude, dto.longitude, _quadrado, _graficos)),
+        Etapa(
+            "balanco",
+            lambda data_Json: obter_balanco_hidrico(
+                dto.ano_inicial, dto.ano_final, data_Json, _localdataName, api, dto.head, log=log,
+                tarefa_unica=dto.tarefa_unica, stop_event=dto.stop_event, progresso=progresso.etapa("balanco")
+            ),
+            ["data_Json"], "Processando dados de balanço hídrico...",
+        ),
+        Etapa(
+            "precipitacao",
+            lambda data_Json: obter_precipitacao(
+                dto.ano_inicial, dto.ano_final, data_Json, _localdataName, log=log, stop_event=dto.stop_event,
+                progresso=progresso.etapa("precipitacao")
+            ),
+            ["data_Json"], "Gerando dados de precipitação...",
+        ),
+        Etapa(
+            "grafico_balanco",
+            lambda balanco, nome_local: gerar_grafico_balanco_hidrico(balanco, nome_local, log=log),
+            ["balanco", "nome_local"],
+        ),
+        Etapa(
+            "grafico_precipitacao",
+            lambda precipitacao, nome_local: gerar_grafico_precipitacao(
+                precipitacao, dto.ano_inicial, dto.ano_final, nome_local, log=log
+            ),
+            ["precipitacao", "nome_local"],
+        ),
+        Etapa(
+            "grafico_precipitacao_evaporacao",
+            lambda balanco, precipitacao: gerar_grafico_precipitacao_evaporacao(balanco, precipitacao),
+            ["balanco", "precipitacao"],
+        ),
+        # Cópia do balanço com as colunas de índice usadas pelas etapas seguintes
+        Etapa(
+            "indices",
+            lambda balanco, precipitacao: calcular_indices_aridez(balanco, precipitacao),
+            ["balanco", "precipitacao"], "Calculando índices de aridez...",
+        ),
+        Etapa(
+            "grafico_aridez",
+            lambda indices: gerar_grafico_indice_aridez_unep(indices, dto.ano_inicial, dto.ano_final, _graficos),
+            ["indices"], "Gerando dados de índice de aridez (UNEP)...",
+        ),
+        # As etapas abaixo acrescentam colunas próprias; usam cópias para rodar em paralelo
+        Etapa(
+            "classificacao",
+            lambda indices: calcular_e_classificar_indices_aridez(indices.copy(), dto.ano_inicial, dto.ano_final),
+            ["indices"], "Classificando índices de aridez...",
+        ),
+        Etapa(
+            "rai",
+            lambda precipitacao, indices: calcular_e_gerar_grafico_rai(indices.copy(), precipitacao, _graficos),
+            ["precipitacao", "indices"], "Calculando RAI e gerando dados...",
+        ),
+        Etapa(
+            "mapa_aridez",
+            lambda balanco, nome_local: processar_dados_aridez(
+                dto.ano_inicial, dto.ano_final, _localdataName, _graficos, nome_local, stop_event=dto.stop_event
+            ),
+            ["balanco", "nome_local"], "Processando dados para mapa de aridez com o indice de aridez...",
+        ),
+        Etapa(
+            "recomendacoes",
+            lambda balanco, precipitacao: recomendar_irrigacao(
+                dto.cultura, dto.estagio, balanco["ET"], balanco["PET"], precipitacao["Precipitacao"], balanco["Ano"]
+            ),
+            ["balanco", "precipitacao"], "Gerando recomendações de irrigação...",
+        ),
+    ]
+
+    resultados, tempos = executar_etapas(etapas, dto.stop_event, log=log, progresso=progresso)
+    print("Tempo por etapa (s): " + ", ".join(f"{nome}={t:.2f}" for nome, t in tempos.items()))
+    if dto.stop_event.is_set():
+        return None
 
     log("Obtendo caminho do mapa...")
     mapaIA_path = obter_caminhos_graficos(
         dto.latitude, dto.longitude, _res, dto.ano_inicial, dto.ano_final, dto.user_id
     )
 
-    dados_ET = _balanco["ET"]
-    dados_PET = _balanco["PET"]
-    dados_precipitacao = _precipitacao_df["Precipitacao"]
-    anos = _balanco["Ano"]
-
-    log("Gerando recomendações de irrigação...")
-    recomendacoes = recomendar_irrigacao(dto.cultura, dto.estagio, dados_ET, dados_PET, dados_precipitacao, anos)
-
     log("Processamento completo! 🎉")
 
     return ResultadosDTO(
-        nome_local=_NomeLocal,
+        nome_local=resultados["nome_local"],
         ano_inicial=dto.ano_inicial,
         ano_final=dto.ano_final,
         area=_res,
         latitude=dto.latitude,
         longitude=dto.longitude,
-        dados_grafico_precipitacao=dados_grafico_precipitacao,
-        dados_grafico_precipitacao_vs_evaporacao=dados_grafico_precipitacao_vs_evaporacao,
-        dados_grafico_balanco_hidrico=dados_grafico_balanco_hidrico,
-        dados_grafico_rai=dados_grafico_rai,
-        dados_grafico_aridez=dados_grafico_aridez,
+        dados_grafico_precipitacao=resultados["grafico_precipitacao"],
+        dados_grafico_precipitacao_vs_evaporacao=resultados["grafico_precipitacao_evaporacao"],
+        dados_grafico_balanco_hidrico=resultados["grafico_balanco"],
+        dados_grafico_rai=resultados["rai"],
+        dados_grafico_aridez=resultados["grafico_aridez"],
         mapa_IA=mapaIA_path,
-        indices_e_classificacoes=indices_e_classificacoes,
-        recomendacoes=recomendacoes,
-    )
\ No newline at end of file
+        indices_e_classificacoes=resultados["classificacao"],
+        recomendacoes=resultados["recomendacoes"],
+    )
+
+
+def processar_lote(dto: ProcessarLoteDTO, log=print, emitir_progresso=None):
+    """
+    Processa vários locais de uma vez: uma única tarefa do AppEEARS para todas as áreas,
+    uma leitura do CHIRPS por ano para todas elas e as análises em uma passada vetorizada.
+    """
+    _res = 10
+    inDir = PASTA_DADOS
+    kc = coeficiente_cultura(dto.cultura, dto.estagio)
+
+    pastas_locais, data_Json_locais = [], []
+    for latitude, longitude in dto.coordenadas:
+        _localdataName, _ = criar_diretorios(inDir, dto.user_id, latitude, longitude, _res)
+        pastas_locais.append(_localdataName)
+        data_Json_locais.append(montar_data_json(ca.getBox(latitude, longitude, _res)))
+    _pastaLote = os.path.join(inDir, dto.user_id, "lote")
+    progresso = Progresso(
+        {"balancos": 60, "precipitacoes": 30, "nomes_locais": 10},
+        emitir_progresso or (lambda evento: None),
+        eta_externa=lambda: monitor_tarefas.eta(dto.head),
+    )
+
+    etapas = [
+        Etapa(
+            "nomes_locais",
+            lambda: [get_location_name(lat, lon, log=log) for lat, lon in dto.coordenadas],
+        ),
+        Etapa(
+            "balancos",
+            lambda: obter_balanco_lote(
+                dto.ano_inicial, dto.ano_final, data_Json_locais, pastas_locais, _pastaLote, api, dto.head, log=log,
+                stop_event=dto.stop_event
+            ),
+            mensagem=f"Processando dados de balanço hídrico de {len(pastas_locais)} local(is)...",
+        ),
+        Etapa(
+            "precipitacoes",
+            lambda: obter_precipitacao_lote(
+                dto.ano_inicial, dto.ano_final, data_Json_locais, pastas_locais, log=log, stop_event=dto.stop_event
+            ),
+            mensagem="Gerando dados de precipitação...",
+        ),
+    ]
+    resultados, tempos = executar_etapas(etapas, dto.stop_event, log=log, progresso=progresso)
+    print("Tempo por etapa (s): " + ", ".join(f"{nome}={t:.2f}" for nome, t in tempos.items()))
+    if dto.stop_event.is_set():
+        return None
+
+    # Matrizes (locais x anos), com NaN nos anos sem dados
+    log("Calculando índices de todos os locais...")
+    anos = list(range(dto.ano_inicial, dto.ano_final + 1))
+    et = np.stack([_serie_anual(b, "ET", anos) for b in resultados["balancos"]])
+    pet = np.stack([_serie_anual(b, "PET", anos) for b in resultados["balancos"]])
+    precipitacao = np.stack([_serie_anual(p, "Precipitacao", anos) for p in resultados["precipitacoes"]])
+    analise = analisar_lote(anos, et, pet, precipitacao, kc=kc)
+
+    locais = []
+    for i, (latitude, longitude) in enumerate(dto.coordenadas):
+        locais.append({
+            "nome_local": resultados["nomes_locais"][i],
+            "latitude": latitude,
+            "longitude": longitude,
+            "anos": anos,
+            "et": _lista(et[i]),
+            "pet": _lista(pet[i]),
+            "precipitacao": _lista(precipitacao[i]),
+            "indice_aridez_unep": _lista(analise["indice_aridez_unep"][i]),
+            "tendencia": _lista(analise["tendencia"][i]),
+            "rai": _lista(analise["rai"][i]),
+            "deficits": _lista(analise["deficits"][i]),
+            "indice_aridez_atual": _valor(analise["indice_aridez_atual"][i]),
+            "indice_aridez_tendencia": _valor(analise["indice_aridez_tendencia"][i]),
+            "categoria_atual": str(analise["categoria_atual"][i]),
+            "categoria_tendencia": str(analise["categoria_tendencia"][i]),
+            "risco_desertificacao": str(analise["risco_desertificacao"][i]),
+            "deficit_medio": _valor(analise["deficit_medio"][i]),
+            "anos_irrigacao": int(analise["anos_irrigacao"][i]),
+        })
+
+    log("Processamento do lote completo! 🎉")
+    return ResultadosLoteDTO(dto.ano_inicial, dto.ano_final, _res, dto.cultura, dto.estagio, locais)
+
+
+def _serie_anual(df, coluna, anos):
+    if df is None or df.empty:
+        return np.full(len(anos), np.nan)
+    return df.set_index("Ano")[coluna].reindex(anos).to_numpy(dtype=np.float64)
+
+
+def _valor(v):
+    return float(v) if np.isfinite(v) else None
+
+
+def _lista(valores):
+    # NaN não é JSON válido; anos sem dados viram null
+    return [_valor(v) for v in valores]
@@ -0,0 +1,213 @@
+import json
+import os
+import threading
+from functools import lru_cache
+
+import numpy as np
+import rasterio
+from rasterio.features import geometry_mask
+from rasterio.windows import Window, from_bounds
+from shapely.geometry import shape
+
+from app.globals import CACHE_DIR, URL_CHIRPS
+from app.process.cliente_appeears import cliente
+from app.process.gerenciador_downloads import DownloadInterrompido, baixar_arquivo, sha256_arquivo
+from app.process.metricas import USO_CACHE_ARQUIVOS
+
+PASTA_CHIRPS = os.path.join(CACHE_DIR, "chirps_annual")
+ASSINATURAS_TIFF = (b"II*\x00", b"MM\x00*", b"II+\x00", b"MM\x00+")
+NODATA_CHIRPS = -9999.0
+
+_lock = threading.Lock()
+_em_andamento = {}  # ano -> threading.Event do download em curso
+_verificados = set()
+
+
+def nome_tif_chirps(ano):
+    return f"chirps-v2.0.{ano}.tif"
+
+
+def caminho_tif_chirps(ano, pasta=PASTA_CHIRPS):
+    return os.path.join(pasta, nome_tif_chirps(ano))
+
+
+def obter_tif_chirps(ano, stop_event=None, log=print, pasta=PASTA_CHIRPS):
+    """
+    Retorna o caminho do GeoTIFF anual global do CHIRPS no acervo compartilhado do servidor,
+    baixando-o se necessário (ou None em caso de falha/interrupção).
+
+    O download é single-flight: se outra análise já está baixando o mesmo ano, esta apenas
+    espera por ele. Cada arquivo é baixado uma única vez por servidor, gravado de forma
+    atômica e verificado pelo tamanho e por um SHA-256 guardado ao lado do arquivo.
+    """
+    destino = caminho_tif_chirps(ano, pasta)
+    USO_CACHE_ARQUIVOS.inc(tipo="chirps", resultado="compartilhado" if _arquivo_integro(destino) else "falta")
+    tentou = False
+    while True:
+        if _arquivo_integro(destino):
+            return destino
+        if tentou:
+            return None
+
+        with _lock:
+            evento = _em_andamento.get(destino)
+            lider = evento is None
+            if lider:
+                evento = _em_andamento[destino] = threading.Event()
+
+        if not lider:
+            print(f"Aguardando o download do CHIRPS {ano} iniciado por outra análise...")
+            while not evento.wait(1.0):
+                if stop_event is not None and stop_event.is_set():
+                    return None
+            continue
+
+        tentou = True
+        try:
+            _baixar(ano, destino, stop_event, log)
+        finally:
+            with _lock:
+                _em_andamento.pop(destino, None)
+            evento.set()
+
+
+def _baixar(ano, destino, stop_event, log):
+    url = f"{URL_CHIRPS}{nome_tif_chirps(ano)}"
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    print(f"Baixando {url} ...")
+    try:
+        cabecalho = cliente.requisitar("HEAD", url)
+        if cabecalho.status_code != 200:
+            log(f"Erro ao baixar {url}. Código de status: {cabecalho.status_code}")
+            return
+        tamanho = int(cabecalho.headers["Content-Length"]) if "Content-Length" in cabecalho.headers else None
+
+        baixar_arquivo(url, destino, tamanho_esperado=tamanho, stop_event=stop_event, origem="chirps")
+        with open(destino, "rb") as f:
+            if f.read(4) not in ASSINATURAS_TIFF:
+                os.remove(destino)
+                raise ValueError("o arquivo baixado não é um GeoTIFF.")
+        _gravar_checksum(destino)
+        print(f"Arquivo {destino} baixado com sucesso.")
+    except DownloadInterrompido:
+        log(f"Processo interrompido pelo usuário durante o download do ano {ano}.")
+    except Exception as e:
+        if stop_event is None or not stop_event.is_set():
+            log(f"Erro ao baixar o arquivo {url}: {e}")
+
+
+def _arquivo_integro(destino):
+    """
+    Confere o arquivo uma vez por processo contra o SHA-256 gravado no download.
+    Arquivos corrompidos são apagados para serem baixados novamente.
+    """
+    if destino in _verificados:
+        return os.path.exists(destino)
+    if not os.path.exists(destino):
+        return False
+
+    checksum = f"{destino}.sha256"
+    if not os.path.exists(checksum):
+        # Arquivo anterior ao acervo verificado: registra o checksum atual
+        _gravar_checksum(destino)
+    else:
+        with open(checksum, "r") as f:
+            esperado = f.read().strip()
+        if sha256_arquivo(destino) != esperado:
+            print(f"Checksum do arquivo {destino} não confere; ele será baixado novamente.")
+            os.remove(destino)
+            os.remove(checksum)
+            return False
+
+    _verificados.add(destino)
+    return True
+
+
+def _gravar_checksum(destino):
+    with open(f"{destino}.sha256.tmp", "w") as f:
+        f.write(sha256_arquivo(destino))
+    os.replace(f"{destino}.sha256.tmp", f"{destino}.sha256")
+
+
+def media_chirps_na_area(caminho_tif, data_Json):
+    """
+    Média da precipitação (mm) dos pixels do CHIRPS cujo centro está dentro da geometria.
+
+    Lê do GeoTIFF global apenas a janela que cobre a geometria e aplica a máscara já
+    rasterizada para essa janela. Como todos os anos do CHIRPS têm a mesma grade, a janela
+    e a máscara são calculadas uma única vez por geometria e reaproveitadas.
+    """
+    geometria = data_Json["features"][0]["geometry"] if data_Json.get("type").lower() == "featurecollection" else data_Json
+    with rasterio.open(caminho_tif) as src:
+        grade = (tuple(src.transform)[:6], src.width, src.height)
+        janela, mascara = recorte_geometria(json.dumps(geometria, sort_keys=True), grade)
+        if mascara is None:
+            return float("nan")
+        dados = src.read(1, window=janela)
+        nodata = src.nodata
+
+    validos = mascara & (dados != NODATA_CHIRPS)
+    if nodata is not None:
+        validos &= dados != nodata
+    if not validos.any():
+        return float("nan")
+    return float(dados[validos].mean(dtype=np.float64))
+
+
+def medias_chirps_lote(caminho_tif, geometrias):
+    """
+    Médias da precipitação (mm) para várias geometrias com uma única leitura do GeoTIFF:
+    lê a janela que cobre todas as geometrias e aplica a máscara de cada uma sobre ela.
+    Retorna uma lista na ordem das geometrias (NaN onde não há pixels válidos).
+    """
+    with rasterio.open(caminho_tif) as src:
+        grade = (tuple(src.transform)[:6], src.width, src.height)
+        recortes = [recorte_geometria(json.dumps(g, sort_keys=True), grade) for g in geometrias]
+        janelas = [janela for janela, _ in recortes if janela is not None]
+        if not janelas:
+            return [float("nan")] * len(geometrias)
+        lin0 = min(j.row_off for j in janelas)
+        col0 = min(j.col_off for j in janelas)
+        lin1 = max(j.row_off + j.height for j in janelas)
+        col1 = max(j.col_off + j.width for j in janelas)
+        dados = src.read(1, window=Window(col0, lin0, col1 - col0, lin1 - lin0))
+        nodata = src.nodata
+
+    validos_total = dados != NODATA_CHIRPS
+    if nodata is not None:
+        validos_total &= dados != nodata
+
+    medias = []
+    for janela, mascara in recortes:
+        if mascara is None:
+            medias.append(float("nan"))
+            continue
+        linhas = slice(janela.row_off - lin0, janela.row_off - lin0 + janela.height)
+        colunas = slice(janela.col_off - col0, janela.col_off - col0 + janela.width)
+        validos = mascara & validos_total[linhas, colunas]
+        medias.append(float(dados[linhas, colunas][validos].mean(dtype=np.float64)) if validos.any() else float("nan"))
+    return medias
+
+
+@lru_cache(maxsize=256)
+def recorte_geometria(geometria_json, grade):
+    """
+    Janela de leitura e máscara (True dentro da geometria) para uma geometria e uma grade.
+    """
+    transform, largura, altura = rasterio.Affine(*grade[0]), grade[1], grade[2]
+    geometria = shape(json.loads(geometria_json))
+
+    bruta = from_bounds(*geometria.bounds, transform=transform)
+    col0 = max(int(np.floor(bruta.col_off)), 0)
+    lin0 = max(int(np.floor(bruta.row_off)), 0)
+    col1 = min(int(np.ceil(bruta.col_off + bruta.width)), largura)
+    lin1 = min(int(np.ceil(bruta.row_off + bruta.height)), altura)
+    if col1 <= col0 or lin1 <= lin0:
+        return None, None
+
+    janela = Window(col0, lin0, col1 - col0, lin1 - lin0)
+    mascara = geometry_mask(
+        [geometria], out_shape=(janela.height, janela.width),
+        transform=rasterio.windows.transform(janela, transform), invert=True,
+    )
+    return janela, mascara
@@ -0,0 +1,117 @@
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+from app.globals import ARQUIVO_USUARIOS
+
+# Banco antigo em JSON, importado automaticamente na primeira abertura
+ARQUIVO_USUARIOS_JSON = "app/static/usuarios_db.json"
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS usuarios (
+    usuario TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    criado_em REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class BancoUsuarios:
+    """
+    Cadastro usuário -> user_id em SQLite.
+
+    Consultas pela chave primária (usuario) e inserções/remoções em transações próprias,
+    seguras entre threads e workers; substitui o usuarios_db.json reescrito a cada login.
+    """
+
+    def __init__(self, caminho=ARQUIVO_USUARIOS, legado=ARQUIVO_USUARIOS_JSON):
+        self.caminho = caminho
+        self.legado = legado
+        self._lock = threading.Lock()
+        self._preparado = False
+
+    def registrar(self, usuario, user_id):
+        """
+        Cadastra o usuário com o user_id informado, se ainda não existir.
+        Retorna o user_id gravado no banco (o existente, para usuários já cadastrados).
+        """
+        conexao = self._conectar()
+        try:
+            with conexao:
+                conexao.execute("BEGIN IMMEDIATE")
+                conexao.execute(
+                    "INSERT INTO usuarios (usuario, user_id, criado_em) VALUES (?, ?, ?) ON CONFLICT(usuario) DO NOTHING",
+                    (usuario, user_id, time.time()),
+                )
+                return conexao.execute("SELECT user_id FROM usuarios WHERE usuario = ?", (usuario,)).fetchone()[0]
+        finally:
+            conexao.close()
+
+    def user_id(self, usuario):
+        conexao = self._conectar()
+        try:
+            linha = conexao.execute("SELECT user_id FROM usuarios WHERE usuario = ?", (usuario,)).fetchone()
+        finally:
+            conexao.close()
+        return linha[0] if linha else None
+
+    def remover(self, usuario):
+        """Remove o usuário. Retorna True se ele existia."""
+        conexao = self._conectar()
+        try:
+            with conexao:
+                conexao.execute("BEGIN IMMEDIATE")
+                return conexao.execute("DELETE FROM usuarios WHERE usuario = ?", (usuario,)).rowcount > 0
+        finally:
+            conexao.close()
+
+    def _conectar(self):
+        os.makedirs(os.path.dirname(self.caminho), exist_ok=True)
+        conexao = sqlite3.connect(self.caminho, timeout=30, isolation_level=None)
+        with self._lock:
+            if not self._preparado:
+                conexao.execute("PRAGMA journal_mode=WAL")
+                conexao.executescript(_ESQUEMA)
+                self._migrar(conexao)
+                self._preparado = True
+        return conexao
+
+    def _migrar(self, conexao):
+        """
+        Importa o usuarios_db.json (se existir) e o move, como cópia de segurança, para a pasta
+        do banco: sob app/static ele seria servido publicamente.
+        """
+        copia = os.path.join(os.path.dirname(self.caminho), os.path.basename(self.legado) + ".migrado")
+        # Cópia deixada em app/static por versões anteriores da migração
+        if os.path.exists(self.legado + ".migrado"):
+            self._mover(self.legado + ".migrado", copia)
+        if not os.path.exists(self.legado):
+            return
+        try:
+            with open(self.legado, "r") as f:
+                usuarios = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Erro ao ler {self.legado} para migração: {e}")
+            return
+        agora = time.time()
+        with conexao:
+            conexao.execute("BEGIN IMMEDIATE")
+            conexao.executemany(
+                "INSERT INTO usuarios (usuario, user_id, criado_em) VALUES (?, ?, ?) ON CONFLICT(usuario) DO NOTHING",
+                [(usuario, user_id, agora) for usuario, user_id in usuarios.items()],
+            )
+        self._mover(self.legado, copia)
+        print(f"{len(usuarios)} usuários migrados de {self.legado} para {self.caminho}")
+
+    @staticmethod
+    def _mover(origem, destino):
+        try:
+            shutil.move(origem, destino)
+        except FileNotFoundError:
+            pass  # Outro worker já concluiu a migração
+
+
+banco_usuarios = BancoUsuarios()
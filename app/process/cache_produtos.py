@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+from app.globals import CACHE_DIR
+
+PASTA_CACHE_PRODUTOS = os.path.join(CACHE_DIR, "produtos")
+ARQUIVO_REFERENCIAS = "referencias.json"
+ARQUIVO_CHAVE = ".chave_cache"  # gravado na pasta do usuário que referencia a entrada
+
+_lock = threading.Lock()
+
+
+def chave_produto(produto, bandas, ano, data_Json):
+    """
+    Chave de conteúdo de um pedido ao AppEEARS: hash do produto, bandas, ano e geometria.
+    Dois pedidos idênticos (mesmo que de usuários diferentes) têm a mesma chave.
+    """
+    geometrias = [f.get("geometry") for f in data_Json.get("features", [])] if "features" in data_Json else [data_Json]
+    conteudo = json.dumps(
+        {"produto": produto, "bandas": sorted(bandas), "ano": int(ano), "geometrias": geometrias},
+        sort_keys=True, separators=(",", ":"),
+    )
+    return hashlib.sha256(conteudo.encode()).hexdigest()
+
+
+def vincular(chave, pasta_destino, pasta_cache=PASTA_CACHE_PRODUTOS):
+    """
+    Se a entrada existe no cache compartilhado, cria na pasta do usuário links para os seus
+    arquivos, registra a referência e retorna True. Caso contrário, retorna False.
+    """
+    entrada = os.path.join(pasta_cache, chave)
+    with _lock:
+        referencias = _ler_referencias(entrada)
+        if referencias is None:
+            return False
+        _espelhar(entrada, pasta_destino)
+        _registrar(entrada, chave, referencias, pasta_destino)
+    return True
+
+
+def publicar(chave, pasta_origem, pasta_cache=PASTA_CACHE_PRODUTOS):
+    """
+    Registra no cache compartilhado (por hard link, sem copiar os dados) os arquivos
+    recém-baixados em pasta_origem e adiciona pasta_origem às referências da entrada.
+    """
+    entrada = os.path.join(pasta_cache, chave)
+    with _lock:
+        referencias = _ler_referencias(entrada)
+        if referencias is None:
+            # O lock só vale neste processo: o nome temporário inclui o pid para os demais workers
+            temporaria = f"{entrada}.{os.getpid()}.{threading.get_ident()}.tmp"
+            shutil.rmtree(temporaria, ignore_errors=True)
+            os.makedirs(temporaria)
+            for nome in _arquivos(pasta_origem):
+                _ligar(os.path.join(pasta_origem, nome), os.path.join(temporaria, nome))
+            _gravar_referencias(temporaria, [])
+            try:
+                os.replace(temporaria, entrada)  # a entrada só aparece completa
+            except OSError:
+                # Outro worker publicou a mesma chave antes: a entrada dele é usada
+                shutil.rmtree(temporaria, ignore_errors=True)
+                if not os.path.isdir(entrada):
+                    raise
+            referencias = _ler_referencias(entrada) or []
+        _espelhar(entrada, pasta_origem)
+        _registrar(entrada, chave, referencias, pasta_origem)
+
+
+def liberar_referencias(pasta_usuario, pasta_cache=PASTA_CACHE_PRODUTOS):
+    """
+    Remove as referências de todas as pastas sob pasta_usuario. Entradas que ficam sem
+    nenhuma referência são apagadas do cache compartilhado.
+    """
+    prefixo = os.path.abspath(pasta_usuario)
+    with _lock:
+        for raiz, _, arquivos in os.walk(pasta_usuario):
+            if ARQUIVO_CHAVE not in arquivos:
+                continue
+            with open(os.path.join(raiz, ARQUIVO_CHAVE), "r") as f:
+                entrada = os.path.join(pasta_cache, f.read().strip())
+            referencias = _ler_referencias(entrada)
+            if referencias is None:
+                continue
+            restantes = [r for r in referencias if not _dentro_de(r, prefixo) and os.path.isdir(r)]
+            if restantes:
+                _gravar_referencias(entrada, restantes)
+            else:
+                shutil.rmtree(entrada, ignore_errors=True)
+
+
+def coletar_entradas_orfas(pasta_cache=PASTA_CACHE_PRODUTOS):
+    """
+    Apaga as entradas cujas pastas de referência não existem mais (ex.: após limpeza manual).
+    """
+    if not os.path.isdir(pasta_cache):
+        return
+    with _lock:
+        for chave in os.listdir(pasta_cache):
+            entrada = os.path.join(pasta_cache, chave)
+            referencias = _ler_referencias(entrada)
+            if referencias is None:
+                continue
+            restantes = [r for r in referencias if os.path.isdir(r)]
+            if restantes:
+                if len(restantes) != len(referencias):
+                    _gravar_referencias(entrada, restantes)
+            else:
+                shutil.rmtree(entrada, ignore_errors=True)
+
+
+def _espelhar(entrada, pasta_destino):
+    """
+    Cria em pasta_destino hard links (ou cópias, se o sistema não permitir) dos arquivos da entrada.
+    """
+    os.makedirs(pasta_destino, exist_ok=True)
+    for nome in _arquivos(entrada):
+        origem = os.path.join(entrada, nome)
+        destino = os.path.join(pasta_destino, nome)
+        if os.path.exists(destino):
+            if os.path.samefile(origem, destino):
+                continue
+            os.remove(destino)
+        _ligar(origem, destino)
+
+
+def _ligar(origem, destino):
+    try:
+        os.link(origem, destino)
+    except OSError:
+        shutil.copy2(origem, destino)
+
+
+def _registrar(entrada, chave, referencias, pasta_destino):
+    pasta = os.path.abspath(pasta_destino)
+    if pasta not in referencias:
+        _gravar_referencias(entrada, referencias + [pasta])
+    with open(os.path.join(pasta_destino, ARQUIVO_CHAVE), "w") as f:
+        f.write(chave)
+
+
+def _arquivos(pasta):
+    return sorted(
+        nome for nome in os.listdir(pasta)
+        if nome not in (ARQUIVO_REFERENCIAS, ARQUIVO_CHAVE) and not nome.endswith(".part")
+        and os.path.isfile(os.path.join(pasta, nome))
+    )
+
+
+def _ler_referencias(entrada):
+    try:
+        with open(os.path.join(entrada, ARQUIVO_REFERENCIAS), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _gravar_referencias(entrada, referencias):
+    caminho = os.path.join(entrada, ARQUIVO_REFERENCIAS)
+    with open(f"{caminho}.tmp", "w") as f:
+        json.dump(referencias, f)
+    os.replace(f"{caminho}.tmp", caminho)
+
+
+def _dentro_de(caminho, prefixo):
+    return caminho == prefixo or caminho.startswith(prefixo + os.sep)
@@ -0,0 +1,89 @@
+import json
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timezone
+
+import numpy as np
+import orjson
+
+from app.globals import MAX_RESULTADOS_EM_CACHE
+
+# dados: JSON decodificado (compartilhado entre requisições, não deve ser alterado)
+# etag: identifica a versão do arquivo; modificado_em: datetime UTC da última gravação
+Resultados = namedtuple("Resultados", ["dados", "etag", "modificado_em"])
+
+
+def serializar(dados):
+    """
+    Converte resultados em JSON (bytes) com orjson. Escalares e arrays do NumPy viram números
+    e listas diretamente, NaN vira null; outros tipos desconhecidos, texto.
+    """
+    return orjson.dumps(dados, default=_converter, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+
+def _converter(valor):
+    if isinstance(valor, np.generic):
+        return valor.item()  # Tipos do NumPy que o orjson não serializa sozinho (ex.: np.str_)
+    return str(valor)
+
+
+def salvar_resultados(caminho, dados):
+    """
+    Grava o JSON de resultados de forma atômica (arquivo temporário + os.replace), para que
+    leitores concorrentes nunca vejam um arquivo pela metade.
+    """
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporario, "wb") as f:
+        f.write(serializar(dados))
+    os.replace(temporario, caminho)
+
+
+class CacheResultados:
+    """
+    LRU dos JSON de resultados já decodificados, invalidado pelo mtime/tamanho do arquivo.
+    Evita um json.load do arquivo inteiro a cada rota que mostra a análise.
+    """
+
+    def __init__(self, max_itens=MAX_RESULTADOS_EM_CACHE):
+        self.max_itens = max_itens
+        self._lock = threading.Lock()
+        self._itens = OrderedDict()  # caminho -> ((mtime_ns, tamanho), Resultados)
+
+    def ler(self, caminho):
+        """Retorna Resultados do arquivo, ou None se ele não existe."""
+        try:
+            info = os.stat(caminho)
+        except FileNotFoundError:
+            with self._lock:
+                self._itens.pop(caminho, None)
+            return None
+        versao = (info.st_mtime_ns, info.st_size)
+
+        with self._lock:
+            item = self._itens.get(caminho)
+            if item is not None and item[0] == versao:
+                self._itens.move_to_end(caminho)
+                return item[1]
+
+        with open(caminho, "rb") as f:
+            conteudo = f.read()
+        try:
+            dados = orjson.loads(conteudo)
+        except orjson.JSONDecodeError:
+            dados = json.loads(conteudo)  # Arquivos antigos gravados pelo json.dump podem conter NaN
+        resultados = Resultados(
+            dados=dados,
+            etag=f"{versao[0]:x}-{versao[1]:x}",
+            modificado_em=datetime.fromtimestamp(info.st_mtime, tz=timezone.utc),
+        )
+        with self._lock:
+            self._itens[caminho] = (versao, resultados)
+            self._itens.move_to_end(caminho)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+        return resultados
+
+
+cache_resultados = CacheResultados()
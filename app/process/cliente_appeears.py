@@ -0,0 +1,161 @@
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.globals import CACHE_DIR
+
+STATUS_RETENTATIVA = (429, 500, 502, 503, 504)
+METODOS_IDEMPOTENTES = ("GET", "HEAD", "DELETE", "OPTIONS")
+
+
+class ClienteAppEEARS:
+    """
+    Cliente HTTP compartilhado do AppEEARS (e dos demais serviços externos usados pela análise).
+
+    - uma única requests.Session com pool de conexões (keep-alive, sem novo TLS a cada chamada);
+    - timeout em todas as chamadas;
+    - novas tentativas com backoff exponencial e jitter em 429/5xx e falhas de conexão
+      (POST só é repetido em 429, para não duplicar tarefas);
+    - cache com TTL, em memória e em disco, dos metadados de produto e de projeções;
+    - contadores de requisições, novas tentativas e acertos de cache.
+    """
+
+    def __init__(self, timeout=(10, 60), tentativas=4, backoff_base=1.0, backoff_max=30.0,
+                 ttl_metadados=24 * 3600, pasta_cache=os.path.join(CACHE_DIR, "appeears"), tamanho_pool=32):
+        self.timeout = timeout
+        self.tentativas = tentativas
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.ttl_metadados = ttl_metadados
+        self.pasta_cache = pasta_cache
+
+        self.sessao = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=tamanho_pool, pool_maxsize=tamanho_pool)
+        self.sessao.mount("https://", adaptador)
+        self.sessao.mount("http://", adaptador)
+
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._contadores = Counter()
+
+    def requisitar(self, metodo, url, timeout=None, **kwargs):
+        """
+        Executa a requisição com timeout e novas tentativas. Retorna o requests.Response.
+        """
+        metodo = metodo.upper()
+        timeout = timeout or self.timeout
+        for tentativa in range(self.tentativas):
+            self._contar(f"{metodo} {_endpoint(url)}")
+            try:
+                resposta = self.sessao.request(metodo, url, timeout=timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if metodo not in METODOS_IDEMPOTENTES or tentativa == self.tentativas - 1:
+                    raise
+                self._contar("retentativas")
+                time.sleep(self._espera(tentativa))
+                continue
+
+            repetir = resposta.status_code == 429 or (
+                resposta.status_code in STATUS_RETENTATIVA and metodo in METODOS_IDEMPOTENTES
+            )
+            if not repetir or tentativa == self.tentativas - 1:
+                return resposta
+
+            self._contar("retentativas")
+            resposta.close()
+            time.sleep(self._espera(tentativa, resposta.headers.get("Retry-After")))
+        return resposta
+
+    def get(self, url, **kwargs):
+        return self.requisitar("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.requisitar("POST", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.requisitar("DELETE", url, **kwargs)
+
+    def camadas_produto(self, api, produto):
+        """
+        Metadados (camadas) de um produto, como product/MOD16A3GF.061, com cache.
+        """
+        return self._metadados(f"produto_{produto}", f"{api}product/{produto}")
+
+    def projecoes(self, api):
+        """
+        Lista de projeções disponíveis (spatial/proj), com cache.
+        """
+        return self._metadados("projecoes", f"{api}spatial/proj")
+
+    def contadores(self):
+        """
+        Cópia dos contadores de requisições por endpoint, novas tentativas e cache.
+        """
+        with self._lock:
+            return dict(self._contadores)
+
+    def _metadados(self, nome, url):
+        agora = time.time()
+        with self._lock:
+            em_memoria = self._cache.get(url)
+        if em_memoria and agora - em_memoria[0] < self.ttl_metadados:
+            self._contar("cache_memoria")
+            return em_memoria[1]
+
+        caminho = os.path.join(self.pasta_cache, f"{nome}.json")
+        try:
+            with open(caminho, "r") as f:
+                salvo = json.load(f)
+            if salvo.get("url") == url and agora - salvo["timestamp"] < self.ttl_metadados:
+                self._contar("cache_disco")
+                with self._lock:
+                    self._cache[url] = (salvo["timestamp"], salvo["dados"])
+                return salvo["dados"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+        resposta = self.get(url)
+        resposta.raise_for_status()
+        dados = resposta.json()
+        with self._lock:
+            self._cache[url] = (agora, dados)
+
+        os.makedirs(self.pasta_cache, exist_ok=True)
+        temporario = f"{caminho}.{threading.get_ident()}.tmp"
+        with open(temporario, "w") as f:
+            json.dump({"url": url, "timestamp": agora, "dados": dados}, f)
+        os.replace(temporario, caminho)
+        return dados
+
+    def _espera(self, tentativa, retry_after=None):
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        atraso = min(self.backoff_base * 2 ** tentativa, self.backoff_max)
+        return random.uniform(0, atraso)  # jitter completo
+
+    def _contar(self, chave):
+        with self._lock:
+            self._contadores[chave] += 1
+
+
+def _endpoint(url):
+    """
+    Reduz a URL ao host e ao primeiro segmento útil do caminho (ex.: 'appeears...: task').
+    """
+    partes = urlparse(url)
+    segmentos = [s for s in partes.path.split("/") if s and s != "api"]
+    return f"{partes.netloc}: {segmentos[0] if segmentos else '/'}"
+
+
+# Instância única compartilhada por todos os módulos
+cliente = ClienteAppEEARS()
@@ -1,73 +1,23 @@
 import numpy as np
-import pandas as pd
 
-from app.process.graphics import PlotGrafico, mostraGraficoDoAno
+from app.process import nucleo_analitico as na
+from app.process.graphics import PlotGrafico
+from app.process.file_operations import caminho_raster_aridez
+from app.process.raster_aridez import grade_mod16, passada_aridez
+from app.process.tiles_aridez import salvar_cog
 
 def categoria_climatica(index):
-    if index >= 0.65:
-        return 'Úmida'
-    elif index >= 0.5:
-        return 'Subhumid'
-    elif index >= 0.2:
-        return 'Semiárida'
-    elif index >= 0.05:
-        return 'Arid'
-    else:
-        return 'Hyperarid'
+    return str(na.categoria_climatica(index))
 
 def risco_desertificacao(ai):
-    if ai < 0.05:
-        return "Above Very High (AVH)"
-    elif 0.05 <= ai <= 0.20:
-        return "Very High (VH)"
-    elif 0.21 <= ai <= 0.50:
-        return "High (H)"
-    elif 0.51 <= ai <= 0.65:
-        return "Moderate (M)"
-    else:
-        return "Low (L)"
+    return str(na.risco_desertificacao(ai))
 
 def recomendar_irrigacao(cultura, estagio, dados_ET, dados_PET, dados_precipitacao, anos):
     """
     Fornece uma recomendação geral de irrigação com base nos dados anuais.
     """
-
-    cultura = cultura.lower()
-    estagio = estagio.lower()
-    
-    kc_values = {
-        "milho": {"inicial": 0.4, "medio": 1.2, "final": 0.5},
-        "feijao": {"inicial": 0.3, "medio": 1.1, "final": 0.6},
-        "tomate": {"inicial": 0.6, "medio": 1.15, "final": 0.8},
-        "cana-de-acucar": {"inicial": 0.5, "medio": 1.25, "final": 0.9}
-    }
-
-    if cultura not in kc_values or estagio not in kc_values[cultura]:
-        raise ValueError("Cultura ou estágio inválido")
-
-    kc = kc_values[cultura][estagio]
-
-    # Criar DataFrame com os dados anuais
-    df = pd.DataFrame({
-        "Ano": anos,
-        "ET": dados_ET,
-        "PET": dados_PET,
-        "Precipitacao": dados_precipitacao
-    })
-
-    deficits = []
-    for _, linha in df.iterrows():
-        pet = linha["PET"]
-        prec = linha["Precipitacao"]
-        etc = pet * kc
-        deficit = etc - prec
-        deficits.append(deficit)
-
-    deficit_medio = np.mean(deficits)
-    anos_irrigacao = sum(1 for d in deficits if d > 0)
-    total_anos = len(deficits)
-    ano_inicial = df["Ano"].iloc[0]
-    ano_final = df["Ano"].iloc[-1]
+    # Valida a cultura e o estágio (ValueError se inválidos)
+    na.coeficiente_cultura(cultura, estagio)
 
     # Recomendações de irrigação removidas conforme solicitado
     return []
@@ -78,22 +28,24 @@ def calcular_e_classificar_indices_aridez(_balanco, _ano_inicial, _ano_final):
     Calcula os índices de aridez, realiza classificações e retorna uma lista com os resultados.
     """
     resultados = []
-    
+
     # Cálculo de médias e classificações
-    indice_aridez_medio = _balanco["Indice de Aridez UNEP"].mean()
-    z = np.polyfit(_balanco["Ano"], _balanco["Indice de Aridez UNEP"], 1)
-    p = np.poly1d(z)
-    indice_aridez_tendencia = p(_balanco["Ano"]).mean()
-    indice_aridez_atual = _balanco.iloc[-1]["Indice de Aridez UNEP"]
+    anos = _balanco["Ano"].to_numpy(dtype=np.float64)
+    indices = _balanco["Indice de Aridez UNEP"].to_numpy(dtype=np.float64)
+    indice_aridez_medio = np.nanmean(indices)
+    _, _, tendencia = na.tendencia_linear(anos, indices)
+    indice_aridez_tendencia = tendencia.mean()
+    indice_aridez_atual = indices[-1]
+    categorias = na.categoria_climatica([indice_aridez_atual, indice_aridez_tendencia])
 
     resultados.append(
         f"Essa região está classificada atualmente como sendo uma região {indice_aridez_atual:.2f}, "
-        f"o que lhe classifica como uma região {categoria_climatica(indice_aridez_atual)}"
+        f"o que lhe classifica como uma região {categorias[0]}"
     )
     
     resultados.append(
         f"Entre os anos de {_ano_inicial} e {_ano_final}, a região teve um índice médio de {indice_aridez_tendencia:.2f}, "
-        f"o que lhe classifica como uma região {categoria_climatica(indice_aridez_tendencia)}"
+        f"o que lhe classifica como uma região {categorias[1]}"
     )
     
     resultados.append(
@@ -110,24 +62,21 @@ def calcular_e_classificar_indices_aridez(_balanco, _ano_inicial, _ano_final):
 
     return resultados
 
-def processar_dados_aridez(_ano_inicial, _ano_final, _localdataName, _graficos, _NomeLocal):
+def processar_dados_aridez(_ano_inicial, _ano_final, _localdataName, _graficos, _NomeLocal, stop_event=None):
     """
     Processa os dados de aridez para os anos fornecidos, calcula a média e gera o mapa de IA.
+    Os anos são lidos em uma única passada com média acumulada, sem empilhar os rasters.
     """
-    _dado = []
-    for i in range(_ano_inicial, _ano_final + 1):  # Inclui todos os anos no intervalo
-        try:
-            print(f"Processando o ano {i}...")
-            arid_data = mostraGraficoDoAno(i, _localdataName)
-            _dado.append(arid_data)
-        except FileNotFoundError as e:
-            print(f"Erro ao processar o ano {i}: {e}")
-    
-    # Calcula a média dos dados de aridez ao longo dos anos processados
-    if _dado:  # Verifica se há dados processados
-        _final = np.mean(_dado, axis=0)
+    anos = range(_ano_inicial, _ano_final + 1)  # Inclui todos os anos no intervalo
+    _final, medias_anuais = passada_aridez(anos, _localdataName, stop_event=stop_event)
     
-        # Gera o mapa usando os dados médios
+    # Gera o mapa usando os dados médios
+    if _final is not None:
+        print(f"Mapa de IA calculado com {len(medias_anuais)} ano(s).")
+        # COG georreferenciado que alimenta os tiles do mapa interativo e clientes GIS
+        grade = grade_mod16(anos, _localdataName)
+        if grade is not None:
+            salvar_cog(_final, *grade, caminho_raster_aridez(_graficos, _ano_inicial, _ano_final))
         mapaIA_path = PlotGrafico(_final, f"{_ano_inicial}-{_ano_final}", _NomeLocal, _graficos)
         print(f"Mapa de IA salvo em: {mapaIA_path}")
         return mapaIA_path
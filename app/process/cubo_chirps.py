@@ -0,0 +1,151 @@
+"""
+Cubo regional do CHIRPS (ano x latitude x longitude) em um único arquivo NPY mapeado em memória.
+
+Gerar/atualizar o cubo (baixa os anos que faltam no acervo compartilhado):
+
+    python -m app.process.cubo_chirps --anos 2004 2024 --bbox -47 -15 -29 -2
+"""
+import argparse
+import json
+import os
+import threading
+
+import numpy as np
+import rasterio
+from shapely.geometry import shape
+
+from app.globals import CACHE_DIR
+from app.process.acervo_chirps import NODATA_CHIRPS, obter_tif_chirps, recorte_geometria
+
+PASTA_CUBO = os.path.join(CACHE_DIR, "chirps_cubo")
+# Nordeste com folga para as caixas de getBox em torno do semiárido pernambucano
+BBOX_PADRAO = (-47.0, -15.0, -29.0, -2.0)  # oeste, sul, leste, norte
+
+_lock = threading.Lock()
+_cubo_carregado = None
+
+
+class CuboChirps:
+    """Cubo float32 (NaN = sem dado) com a georreferência da grade do CHIRPS recortada."""
+
+    def __init__(self, dados, anos, transform, bbox):
+        self.dados = dados
+        self.anos = list(anos)
+        self.transform = rasterio.Affine(*transform[:6])
+        self.bbox = tuple(bbox)
+        self._indice_ano = {ano: i for i, ano in enumerate(self.anos)}
+
+    def medias_na_area(self, data_Json, anos):
+        """
+        Médias anuais de precipitação na geometria para os anos presentes no cubo, em uma
+        única fatia vetorizada. Retorna {} se a geometria não estiver inteiramente no cubo.
+        """
+        geometria = data_Json["features"][0]["geometry"] if data_Json.get("type").lower() == "featurecollection" else data_Json
+        oeste, sul, leste, norte = shape(geometria).bounds
+        if oeste < self.bbox[0] or sul < self.bbox[1] or leste > self.bbox[2] or norte > self.bbox[3]:
+            return {}
+
+        presentes = [ano for ano in anos if ano in self._indice_ano]
+        if not presentes:
+            return {}
+
+        _, altura, largura = self.dados.shape
+        grade = (tuple(self.transform)[:6], largura, altura)
+        janela, mascara = recorte_geometria(json.dumps(geometria, sort_keys=True), grade)
+        if mascara is None or not mascara.any():
+            return {}
+
+        linhas = slice(janela.row_off, janela.row_off + janela.height)
+        colunas = slice(janela.col_off, janela.col_off + janela.width)
+        indices = [self._indice_ano[ano] for ano in presentes]
+        pixels = self.dados[indices, linhas, colunas][:, mascara]  # (anos, pixels da área)
+
+        with np.errstate(invalid="ignore"):
+            medias = np.nanmean(pixels.astype(np.float64), axis=1)
+        return {ano: float(m) for ano, m in zip(presentes, medias) if np.isfinite(m)}
+
+
+def carregar_cubo(pasta=PASTA_CUBO):
+    """
+    Abre o cubo mapeado em memória (uma vez por processo, recarregando se o arquivo mudar).
+    Retorna None se o cubo ainda não foi gerado.
+    """
+    global _cubo_carregado
+    caminho_dados = os.path.join(pasta, "cubo.npy")
+    caminho_meta = os.path.join(pasta, "cubo.json")
+    if not (os.path.exists(caminho_dados) and os.path.exists(caminho_meta)):
+        return None
+
+    versao = (pasta, os.path.getmtime(caminho_dados), os.path.getmtime(caminho_meta))
+    with _lock:
+        if _cubo_carregado is None or _cubo_carregado[0] != versao:
+            with open(caminho_meta, "r") as f:
+                meta = json.load(f)
+            dados = np.load(caminho_dados, mmap_mode="r")
+            _cubo_carregado = (versao, CuboChirps(dados, meta["anos"], meta["transform"], meta["bbox"]))
+        return _cubo_carregado[1]
+
+
+def precipitacao_anos_cubo(anos, data_Json):
+    """
+    Médias anuais na área a partir do cubo regional ({} se não houver cubo que cubra a área).
+    """
+    try:
+        cubo = carregar_cubo()
+        return cubo.medias_na_area(data_Json, anos) if cubo is not None else {}
+    except Exception as e:
+        print(f"Erro ao ler o cubo regional do CHIRPS: {e}")
+        return {}
+
+
+def gerar_cubo(anos, bbox=BBOX_PADRAO, pasta=PASTA_CUBO, log=print):
+    """
+    Extrai a região bbox de todos os anos informados para um único cubo NPY + JSON.
+    """
+    oeste, sul, leste, norte = bbox
+    os.makedirs(pasta, exist_ok=True)
+    anos_ok, camadas, transform = [], [], None
+
+    for ano in anos:
+        caminho = obter_tif_chirps(ano, log=log)
+        if caminho is None:
+            log(f"Ano {ano} ignorado: arquivo CHIRPS indisponível.")
+            continue
+        with rasterio.open(caminho) as src:
+            janela = rasterio.windows.from_bounds(oeste, sul, leste, norte, transform=src.transform)
+            janela = janela.round_offsets().round_lengths()
+            dados = src.read(1, window=janela).astype(np.float32)
+            nodata = src.nodata
+            transform_ano = src.window_transform(janela)
+        if transform is not None and tuple(transform_ano) != tuple(transform):
+            raise ValueError(f"A grade do CHIRPS {ano} difere da dos anos anteriores.")
+        transform = transform_ano
+
+        dados[dados == NODATA_CHIRPS] = np.nan
+        if nodata is not None:
+            dados[dados == nodata] = np.nan
+        camadas.append(dados)
+        anos_ok.append(ano)
+        log(f"Ano {ano} adicionado ao cubo.")
+
+    if not camadas:
+        raise RuntimeError("Nenhum ano do CHIRPS disponível para gerar o cubo.")
+
+    # Grava em arquivos temporários e troca atomicamente, para não afetar leitores em curso
+    temporario = os.path.join(pasta, "cubo.tmp.npy")
+    np.save(temporario, np.stack(camadas))
+    with open(os.path.join(pasta, "cubo.json.tmp"), "w") as f:
+        altura, largura = camadas[0].shape
+        limites = rasterio.transform.array_bounds(altura, largura, transform)  # oeste, sul, leste, norte
+        json.dump({"anos": anos_ok, "transform": list(transform)[:6], "bbox": list(limites)}, f)
+    os.replace(temporario, os.path.join(pasta, "cubo.npy"))
+    os.replace(os.path.join(pasta, "cubo.json.tmp"), os.path.join(pasta, "cubo.json"))
+    log(f"Cubo regional gerado com {len(anos_ok)} anos: {os.path.join(pasta, 'cubo.npy')}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera o cubo regional do CHIRPS para leitura instantânea.")
+    parser.add_argument("--anos", nargs=2, type=int, default=[2004, 2024], metavar=("INICIAL", "FINAL"))
+    parser.add_argument("--bbox", nargs=4, type=float, default=list(BBOX_PADRAO), metavar=("OESTE", "SUL", "LESTE", "NORTE"))
+    args = parser.parse_args()
+    gerar_cubo(range(args.anos[0], args.anos[1] + 1), bbox=tuple(args.bbox))
@@ -1,83 +1,254 @@
+import numpy as np
 import pandas as pd
-from app.globals import stop_event  # Atualize a importação
-from app.process.data_receiving import balanco_hidrico_ano, precipitacao_ano_chirps
+from app.globals import stop_event  # Evento padrão; cada job passa o seu próprio
+from app.process.acervo_chirps import medias_chirps_lote, obter_tif_chirps
+from app.process.data_receiving import adquirir_balanco_hidrico, adquirir_balanco_lote, precipitacao_ano_chirps
+from app.process.cubo_chirps import precipitacao_anos_cubo
 from app.process.graphics import gerar_dados_balanco_hidrico, gerar_dados_precipitacao
+from app.process.tabela_anual import ler_balanco, ler_precipitacao, salvar_balanco, salvar_precipitacao
 
 
-def processar_balanco_hidrico(_ano_inicial, _ano_final, data_Json, _localdataName, api, head, _NomeLocal, log=print):
+def processar_balanco_hidrico(_ano_inicial, _ano_final, data_Json, _localdataName, api, head, _NomeLocal, log=print,
+                              tarefa_unica=False, stop_event=stop_event):
     """
     Processa o balanço hídrico para os anos fornecidos e gera o gráfico correspondente.
+    Com tarefa_unica=True, os anos ausentes são pedidos ao AppEEARS em uma única tarefa.
     """
-    _balanco = pd.DataFrame(columns=["Ano", "ET", "PET", "Deficit"])
+    _balanco = obter_balanco_hidrico(
+        _ano_inicial, _ano_final, data_Json, _localdataName, api, head, log=log, tarefa_unica=tarefa_unica,
+        stop_event=stop_event
+    )
+    if _balanco is None:
+        return None, None
+    return _balanco, gerar_grafico_balanco_hidrico(_balanco, _NomeLocal, log=log)
+
+
+def obter_balanco_hidrico(_ano_inicial, _ano_final, data_Json, _localdataName, api, head, log=print, tarefa_unica=False,
+                          stop_event=stop_event, progresso=None):
+    """
+    Obtém o DataFrame de balanço hídrico (Ano, ET, PET, Deficit) dos anos fornecidos.
+    """
+    anos = list(range(_ano_inicial, _ano_final + 1))
+
+    # Anos já calculados para este local vêm da tabela anual; só os que faltam são processados
+    salvos = ler_balanco(_localdataName, anos)
+    faltantes = [a for a in anos if a not in set(salvos["Ano"])]
+    if not faltantes:
+        log(f"Balanço hídrico de {len(salvos)} ano(s) carregado da tabela anual.")
+        return salvos
+    if not salvos.empty:
+        log(f"Balanço hídrico: {len(salvos)} ano(s) já calculados; processando {len(faltantes)} ano(s) novos.")
+
     tarefas_criadas = []
 
-    for i in range(_ano_inicial, _ano_final + 1):
-        if stop_event.is_set():
-            print(f"Processo interrompido pelo usuário antes de processar o ano {i}.")
-            break
+    # Todas as tarefas ausentes são submetidas de uma vez e acompanhadas em paralelo
+    dados_anuais = adquirir_balanco_hidrico(
+        faltantes, data_Json, _localdataName, api, head, stop_event, tarefas_criadas, log=log, tarefa_unica=tarefa_unica,
+        progresso=progresso
+    )
+    _balanco = _montar_balanco(faltantes, dados_anuais, stop_event, log)
+
+    if not _balanco.empty and not stop_event.is_set():
+        salvar_balanco(_localdataName, _balanco)
 
-        print(f"Processando ano: {i}")
-        et_series, pet_series = balanco_hidrico_ano(i, data_Json, _localdataName, api, head, stop_event, tarefas_criadas, log=log)
+    _balanco = pd.concat([salvos, _balanco]) if not salvos.empty else _balanco
+    if _balanco.empty:
+        log("Nenhum dado de balanço hídrico foi processado.")
+        return None
+
+    _balanco["Ano"] = _balanco["Ano"].astype(int)
+    return _balanco.sort_values("Ano").reset_index(drop=True)
+
+
+def obter_balanco_lote(_ano_inicial, _ano_final, data_Json_locais, pastas_locais, _pastaLote, api, head, log=print,
+                       stop_event=stop_event):
+    """
+    Obtém o balanço hídrico de vários locais, pedindo os anos ausentes de todos eles ao
+    AppEEARS em uma única tarefa. Retorna uma lista de DataFrames (Ano, ET, PET, Deficit),
+    na ordem dos locais (vazio para locais sem dados).
+    """
+    anos = list(range(_ano_inicial, _ano_final + 1))
+    salvos = [ler_balanco(pasta, anos) for pasta in pastas_locais]
+    faltantes = [[a for a in anos if a not in set(s["Ano"])] for s in salvos]
+    log(f"Balanço hídrico: {sum(map(len, faltantes))} ano(s)-local a processar em {len(pastas_locais)} local(is).")
+
+    dados_anuais = {}
+    if any(faltantes):
+        dados_anuais = adquirir_balanco_lote(
+            faltantes, data_Json_locais, pastas_locais, _pastaLote, api, head, stop_event, [], log=log
+        )
+
+    balancos = []
+    for i, pasta in enumerate(pastas_locais):
+        novos = _montar_balanco(faltantes[i], dados_anuais.get(i, {}), stop_event, log)
+        if not novos.empty and not stop_event.is_set():
+            salvar_balanco(pasta, novos)
+        _balanco = pd.concat([salvos[i], novos]) if not salvos[i].empty else novos
+        _balanco["Ano"] = _balanco["Ano"].astype(int)
+        balancos.append(_balanco.sort_values("Ano").reset_index(drop=True))
+    return balancos
+
+
+def _montar_balanco(anos, dados_anuais, stop_event, log=print):
+    linhas = []
+    for i in anos:
         if stop_event.is_set():
             log(f"Processo interrompido pelo usuário durante o processamento do ano {i}.")
             break
 
+        et_series, pet_series = dados_anuais.get(i, (0, 0))
         if not (isinstance(et_series, pd.Series) and isinstance(pet_series, pd.Series)):
-            if not stop_event.is_set():
-                log(f"Erro ao recuperar dados de ET/PET para o ano {i}")
+            log(f"Erro ao recuperar dados de ET/PET para o ano {i}")
             continue
 
-        et_total = et_series.sum()
-        pet_total = pet_series.sum()
-        deficit = pet_total - et_total
-
-        _balanco.loc[len(_balanco)] = [i, et_total, pet_total, deficit]
-
-    if _balanco.empty:
-        log("Nenhum dado de balanço hídrico foi processado.")
-        return None, None
+        linhas.append((i, et_series.sum(), pet_series.sum()))
 
+    # Déficit calculado de uma vez sobre as colunas, sem crescer o DataFrame linha a linha
+    _balanco = pd.DataFrame(linhas, columns=["Ano", "ET", "PET"])
     _balanco["Ano"] = _balanco["Ano"].astype(int)
-    
+    _balanco["Deficit"] = _balanco["PET"] - _balanco["ET"]
+    return _balanco
+
 
+def gerar_grafico_balanco_hidrico(_balanco, _NomeLocal, log=print):
+    """
+    Gera os dados do gráfico de balanço hídrico.
+    """
     log("Gerando gráfico de balanço hídrico...")
     grafico_balanco_hidrico_dados = gerar_dados_balanco_hidrico(
         _balanco,            # DataFrame com os dados
         _NomeLocal,          # Nome da localização (string)
     )
 
-    return _balanco, grafico_balanco_hidrico_dados
+    return grafico_balanco_hidrico_dados
 
 
-def processar_precipitacao(_ano_inicial, _ano_final, data_Json, _localdataName, _graficos, _NomeLocal, log=print):
+def processar_precipitacao(_ano_inicial, _ano_final, data_Json, _localdataName, _graficos, _NomeLocal, log=print,
+                           stop_event=stop_event):
     """
     Processa os dados de precipitação para os anos fornecidos e gera o gráfico correspondente.
     """
+    _precipitacao_df = obter_precipitacao(_ano_inicial, _ano_final, data_Json, _localdataName, log=log, stop_event=stop_event)
+    if _precipitacao_df is None:
+        return None, None
+    return _precipitacao_df, gerar_grafico_precipitacao(_precipitacao_df, _ano_inicial, _ano_final, _NomeLocal, log=log)
+
+
+def obter_precipitacao(_ano_inicial, _ano_final, data_Json, _localdataName, log=print, stop_event=stop_event,
+                       progresso=None):
+    """
+    Obtém o DataFrame de precipitação (Ano, Precipitacao) dos anos fornecidos.
+    """
+    anos = list(range(_ano_inicial, _ano_final + 1))
+
+    # Anos já calculados para este local vêm da tabela anual; só os que faltam são processados
+    salvos = ler_precipitacao(_localdataName, anos)
+    faltantes = [a for a in anos if a not in set(salvos["Ano"])]
+    if not faltantes:
+        log(f"Precipitação de {len(salvos)} ano(s) carregada da tabela anual.")
+        return salvos
+
     _precipitacao_df = pd.DataFrame(columns=["Ano", "Precipitacao"])
 
-    for i in range(_ano_inicial, _ano_final + 1):
+    # Anos presentes no cubo regional saem de uma única leitura vetorizada;
+    # os demais são lidos ano a ano dos GeoTIFFs globais
+    medias_cubo = precipitacao_anos_cubo(faltantes, data_Json)
+    if medias_cubo:
+        log(f"Precipitação de {len(medias_cubo)} ano(s) obtida do cubo regional do CHIRPS.")
+
+    for indice, i in enumerate(faltantes, start=1):
         if stop_event.is_set():
             log(f"Processo interrompido pelo usuário antes de processar a precipitação do ano {i}.")
             break
 
-        print(f"Processando precipitação para o ano: {i}")
-        precip_total = precipitacao_ano_chirps(i, data_Json, _localdataName, stop_event, log=log)
+        if i in medias_cubo:
+            precip_total = medias_cubo[i]
+        else:
+            print(f"Processando precipitação para o ano: {i}")
+            precip_total = precipitacao_ano_chirps(i, data_Json, _localdataName, stop_event, log=log)
         if stop_event.is_set():
             log(f"Processo interrompido pelo usuário durante o processamento da precipitação do ano {i}.")
             break
 
-        if precip_total != 0:
+        # NaN: área fora do raster ou sem pixels válidos, tratado como ano sem dado
+        if np.isfinite(precip_total) and precip_total != 0:
             _precipitacao_df.loc[len(_precipitacao_df)] = [i, precip_total]
         else:
             if not stop_event.is_set():
                 log(f"Erro ao recuperar dados de precipitação para o ano {i}")
+        if progresso is not None:
+            progresso(len(salvos) + indice, len(anos), i)
+
+    if not _precipitacao_df.empty and not stop_event.is_set():
+        _precipitacao_df["Ano"] = _precipitacao_df["Ano"].astype(int)
+        salvar_precipitacao(_localdataName, _precipitacao_df)
 
+    _precipitacao_df = pd.concat([salvos, _precipitacao_df]) if not salvos.empty else _precipitacao_df
     if _precipitacao_df.empty:
         log("Nenhum dado de precipitação foi processado.")
-        return None, None
+        return None
 
     _precipitacao_df["Ano"] = _precipitacao_df["Ano"].astype(int)
+    return _precipitacao_df.sort_values("Ano").reset_index(drop=True)
+
+
+def obter_precipitacao_lote(_ano_inicial, _ano_final, data_Json_locais, pastas_locais, log=print, stop_event=stop_event):
+    """
+    Obtém a precipitação de vários locais. Cada GeoTIFF anual do CHIRPS é lido uma única vez
+    para todos os locais (janela comum + máscara de cada área). Retorna uma lista de
+    DataFrames (Ano, Precipitacao), na ordem dos locais.
+    """
+    anos = list(range(_ano_inicial, _ano_final + 1))
+    salvos = [ler_precipitacao(pasta, anos) for pasta in pastas_locais]
+    faltantes = [[a for a in anos if a not in set(s["Ano"])] for s in salvos]
+    novos = [[] for _ in pastas_locais]
+
+    # O cubo regional, quando cobre a área, responde todos os anos de um local de uma vez
+    for i, anos_local in enumerate(faltantes):
+        medias_cubo = precipitacao_anos_cubo(anos_local, data_Json_locais[i]) if anos_local else {}
+        novos[i].extend(medias_cubo.items())
+        faltantes[i] = [a for a in anos_local if a not in medias_cubo]
+
+    geometrias = [dj["features"][0]["geometry"] for dj in data_Json_locais]
+    for ano in anos:
+        locais = [i for i, anos_local in enumerate(faltantes) if ano in anos_local]
+        if not locais:
+            continue
+        if stop_event.is_set():
+            log(f"Processo interrompido pelo usuário antes de processar a precipitação do ano {ano}.")
+            break
 
+        print(f"Processando precipitação do ano {ano} para {len(locais)} local(is)")
+        destino_tif = obter_tif_chirps(ano, stop_event, log=log)
+        if destino_tif is None:
+            if not stop_event.is_set():
+                log(f"Erro ao recuperar o arquivo CHIRPS do ano {ano}.")
+            continue
+        try:
+            medias = medias_chirps_lote(destino_tif, [geometrias[i] for i in locais])
+        except Exception as e:
+            log(f"Erro ao processar o arquivo {destino_tif}: {e}")
+            continue
+        for i, media in zip(locais, medias):
+            if np.isfinite(media) and media != 0:
+                novos[i].append((ano, media))
+
+    resultado = []
+    for i, pasta in enumerate(pastas_locais):
+        _precipitacao_df = pd.DataFrame(novos[i], columns=["Ano", "Precipitacao"])
+        _precipitacao_df["Ano"] = _precipitacao_df["Ano"].astype(int)
+        if not _precipitacao_df.empty and not stop_event.is_set():
+            salvar_precipitacao(pasta, _precipitacao_df)
+        if not salvos[i].empty:
+            _precipitacao_df = pd.concat([salvos[i], _precipitacao_df])
+        resultado.append(_precipitacao_df.sort_values("Ano").reset_index(drop=True))
+    return resultado
+
+
+def gerar_grafico_precipitacao(_precipitacao_df, _ano_inicial, _ano_final, _NomeLocal, log=print):
+    """
+    Gera os dados do gráfico de precipitação.
+    """
     # Converter o DataFrame para Series com o ano como índice
     precip_series = _precipitacao_df.set_index("Ano")["Precipitacao"]
 
@@ -88,7 +259,6 @@ def processar_precipitacao(_ano_inicial, _ano_final, data_Json, _localdataName,
         _ano_inicial,
         _ano_final,
         _NomeLocal,
-        _graficos
     )
 
-    return _precipitacao_df, grafico_precipitacao_path
+    return grafico_precipitacao_path
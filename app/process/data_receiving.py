@@ -1,55 +1,356 @@
 import os
+import shutil
+import tempfile
 import time
 import pandas as pd
-import requests
-import rioxarray
-import geopandas as gpd
-from shapely.geometry import shape
+import rasterio
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-def status(id_tarefa, api, head):
-    return requests.get(f'{api}task/{id_tarefa}', headers=head).json()['status']
+from app.globals import DOWNLOADS_SIMULTANEOS, MAX_TAREFAS_SIMULTANEAS, TAREFA_MULTIANUAL
+from app.process.acervo_chirps import media_chirps_na_area, obter_tif_chirps
+from app.process.cache_produtos import ARQUIVO_CHAVE, chave_produto, publicar, vincular
+from app.process.cliente_appeears import cliente
+from app.process.gerenciador_downloads import arquivo_valido, baixar_em_paralelo
+from app.process.metricas import ESPERA_TAREFA, USO_CACHE_ARQUIVOS
+from app.process.monitor_tarefas import monitor_tarefas
+from app.process.raster_aridez import passada_aridez
+
+PRODUTO_BALANCO = "MOD16A3GF.061"
+BANDAS_BALANCO = ['ET_500m', 'PET_500m']
 
 def balanco_hidrico_ano(ano, data_Json, _localdataName, api, head, stop_event, tarefas_criadas, log=print):
     """
     Baixa os dados de ET e PET para o ano especificado e retorna os totais anuais.
     """
-    if stop_event.is_set():
-        log(f"Processo interrompido pelo usuário antes de iniciar o ano {ano}.")
-        cancelar_todas_as_tarefas(tarefas_criadas, api, head)  # Cancela todas as tarefas criadas
-        return 0, 0
+    resultados = adquirir_balanco_hidrico([ano], data_Json, _localdataName, api, head, stop_event, tarefas_criadas, log=log)
+    return resultados.get(ano, (0, 0))
 
-    produto_usado = "MOD16A3GF.061"
-    bandas_usadas = ['ET_500m', 'PET_500m']
-    task_name = f"BALANCO_HIDRICO_{ano}"
-    _appEEARsDir = os.path.join(_localdataName, task_name)
-    statistics_file = os.path.join(_appEEARsDir, "MOD16A3GF-061-Statistics.csv")
 
-    # Verificar se os dados já existem localmente
-    if os.path.exists(statistics_file):
-        print(f"Carregando dados de {ano} localmente...")
-        try:
-            return processar_dados_localmente(statistics_file)
-        except Exception as e:
+def adquirir_balanco_hidrico(anos, data_Json, _localdataName, api, head, stop_event, tarefas_criadas, log=print,
+                             max_tarefas=MAX_TAREFAS_SIMULTANEAS, tarefa_unica=TAREFA_MULTIANUAL, progresso=None):
+    """
+    Motor de aquisição concorrente dos dados de ET e PET.
+
+    Submete de uma vez as tarefas de todos os anos que ainda não existem localmente,
+    acompanha as tarefas em paralelo (pool limitado de threads) e baixa/processa cada
+    ano assim que sua tarefa termina. Com tarefa_unica=True, os anos ausentes são pedidos
+    em uma única tarefa recorrente cujo bundle é dividido por ano ao final.
+    progresso(indice, total, ano), se informado, é chamado a cada ano concluído.
+    Retorna um dicionário {ano: (et_series, pet_series)}.
+    """
+    resultados = {}
+    ausentes = []
+    avancar = progresso or (lambda indice, total, ano=None: None)
+
+    for ano in anos:
+        _appEEARsDir = os.path.join(_localdataName, f"BALANCO_HIDRICO_{ano}")
+        statistics_file = os.path.join(_appEEARsDir, "MOD16A3GF-061-Statistics.csv")
+        chave = chave_produto(PRODUTO_BALANCO, BANDAS_BALANCO, ano, data_Json)
+
+        # Verificar se os dados já existem localmente
+        if os.path.exists(statistics_file):
+            print(f"Carregando dados de {ano} localmente...")
+            USO_CACHE_ARQUIVOS.inc(tipo="mod16", resultado="local")
+            if not os.path.exists(os.path.join(_appEEARsDir, ARQUIVO_CHAVE)) and _pasta_integra(_appEEARsDir):
+                _publicar_no_cache(chave, _appEEARsDir)  # dados anteriores ao cache compartilhado
+            resultados[ano] = _ler_estatisticas_ano(ano, statistics_file, stop_event, log=log)
+        elif vincular(chave, _appEEARsDir):
+            log(f"Dados de ET/PET do ano {ano} reaproveitados do cache compartilhado.")
+            USO_CACHE_ARQUIVOS.inc(tipo="mod16", resultado="compartilhado")
+            resultados[ano] = _ler_estatisticas_ano(ano, statistics_file, stop_event, log=log)
+        else:
+            USO_CACHE_ARQUIVOS.inc(tipo="mod16", resultado="falta")
+            ausentes.append(ano)
+
+    if resultados:
+        avancar(len(resultados), len(anos))
+    if not ausentes:
+        return resultados
+
+    if tarefa_unica and len(ausentes) > 1:
+        resultados.update(
+            _adquirir_multianual(ausentes, data_Json, _localdataName, api, head, stop_event, tarefas_criadas, log=log)
+        )
+        avancar(len(anos), len(anos))
+        return resultados
+
+    pendentes = {}
+    for ano in ausentes:
+        if stop_event.is_set():
+            log(f"Processo interrompido pelo usuário antes de iniciar o ano {ano}.")
+            cancelar_todas_as_tarefas(tarefas_criadas, api, head)  # Cancela todas as tarefas criadas
+            return resultados
+
+        _appEEARsDir = os.path.join(_localdataName, f"BALANCO_HIDRICO_{ano}")
+        task_id = submeter_tarefa_ano(ano, data_Json, _appEEARsDir, api, head, log=log, stop_event=stop_event)
+        if task_id:
+            # Adiciona o ID da tarefa à lista de tarefas criadas
+            tarefas_criadas.append(task_id)
+            pendentes[ano] = task_id
+        else:
+            resultados[ano] = (0, 0)
+
+    if not pendentes:
+        return resultados
+
+    log(f"{len(pendentes)} tarefa(s) enviada(s) ao AppEEARS. Aguardando a conclusão em paralelo...")
+    with ThreadPoolExecutor(max_workers=max(1, min(max_tarefas, len(pendentes)))) as executor:
+        futuros = {
+            executor.submit(concluir_tarefa_ano, ano, task_id, _localdataName, api, head, stop_event, log,
+                            chave_produto(PRODUTO_BALANCO, BANDAS_BALANCO, ano, data_Json)): ano
+            for ano, task_id in pendentes.items()
+        }
+        for futuro in as_completed(futuros):
+            ano = futuros[futuro]
+            resultados[ano] = futuro.result()
             if not stop_event.is_set():
-                log(f"Erro ao processar o arquivo local {statistics_file}: {e}")
-            return 0, 0
+                log(f"Dados de ET/PET do ano {ano} recebidos.")
+                avancar(len(resultados), len(anos), ano)
+
+    if stop_event.is_set():
+        log("Processo interrompido pelo usuário. Cancelando as tarefas pendentes no AppEEARS...")
+        cancelar_todas_as_tarefas(tarefas_criadas, api, head)
+
+    return resultados
+
+
+def _adquirir_multianual(anos, data_Json, _localdataName, api, head, stop_event, tarefas_criadas, log=print):
+    """
+    Pede todos os anos ausentes em uma única tarefa recorrente e divide o bundle por ano.
+    """
+    if stop_event.is_set():
+        log("Processo interrompido pelo usuário antes de criar a tarefa multianual.")
+        cancelar_todas_as_tarefas(tarefas_criadas, api, head)
+        return {}
+
+    ano_inicial, ano_final = min(anos), max(anos)
+    task_name = f"BALANCO_HIDRICO_{ano_inicial}_{ano_final}"
+    _bundleDir = os.path.join(_localdataName, task_name)
 
-    # Caso os dados não existam, criar e processar a tarefa
     try:
+        task_id = criar_tarefa(api, PRODUTO_BALANCO, BANDAS_BALANCO, task_name, data_Json, _bundleDir,
+                               ano_inicial, head, ano_final=ano_final)
+        if not task_id:
+            raise ValueError(f"Falha ao criar a tarefa para os anos {ano_inicial}-{ano_final}.")
+        tarefas_criadas.append(task_id)
+
+        log(f"Tarefa única enviada ao AppEEARS para os anos {ano_inicial}-{ano_final}. Aguardando a conclusão...")
+        aguardar_tarefa(task_id, api, head, stop_event, log=log)
         if stop_event.is_set():
-            log(f"Processo interrompido pelo usuário antes de criar a tarefa para o ano {ano}.")
-            cancelar_todas_as_tarefas(tarefas_criadas, api, head)  # Cancela todas as tarefas criadas
-            return 0, 0
+            cancelar_todas_as_tarefas(tarefas_criadas, api, head)
+            return {}
+        baixar_arquivos(task_id, api, head, _bundleDir, stop_event=stop_event)
+        divididos = dividir_bundle_multianual(_bundleDir, anos, _localdataName)
+        for ano in divididos:
+            _publicar_no_cache(chave_produto(PRODUTO_BALANCO, BANDAS_BALANCO, ano, data_Json),
+                               os.path.join(_localdataName, f"BALANCO_HIDRICO_{ano}"))
+    except Exception as e:
+        if not stop_event.is_set():
+            log(f"Erro ao processar dados para os anos {ano_inicial}-{ano_final}: {e}")
+        return {ano: (0, 0) for ano in anos}
+    finally:
+        shutil.rmtree(_bundleDir, ignore_errors=True)
+
+    resultados = {}
+    for ano in anos:
+        if ano not in divididos:
+            # Sem dados no bundle: o ano continua ausente e é pedido de novo na próxima análise
+            log(f"O bundle da tarefa multianual não trouxe dados de ET/PET do ano {ano}.")
+            resultados[ano] = (0, 0)
+            continue
+        statistics_file = os.path.join(_localdataName, f"BALANCO_HIDRICO_{ano}", "MOD16A3GF-061-Statistics.csv")
+        resultados[ano] = _ler_estatisticas_ano(ano, statistics_file, stop_event, log=log)
+    return resultados
+
+
+def dividir_bundle_multianual(_bundleDir, anos, _localdataName):
+    """
+    Divide o bundle de uma tarefa multianual nas pastas BALANCO_HIDRICO_{ano}, com os
+    GeoTIFFs e o MOD16A3GF-061-Statistics.csv de cada ano, no mesmo formato das tarefas anuais.
+    Anos sem linhas no CSV ou sem GeoTIFFs no bundle não são criados. Retorna os anos divididos.
+    """
+    statistics_file = os.path.join(_bundleDir, "MOD16A3GF-061-Statistics.csv")
+    df = pd.read_csv(statistics_file)
+    anos_linhas = _anos_das_linhas(df)
+
+    arquivos = os.listdir(_bundleDir)
+    divididos = []
+    for ano in anos:
+        linhas = df[anos_linhas == ano]
+        tifs = [f for f in arquivos if f.endswith(".tif") and f"_doy{ano}" in f]
+        if linhas.empty or not tifs:
+            continue
+
+        _appEEARsDir = os.path.join(_localdataName, f"BALANCO_HIDRICO_{ano}")
+        os.makedirs(_appEEARsDir, exist_ok=True)
+        for f in tifs:
+            os.replace(os.path.join(_bundleDir, f), os.path.join(_appEEARsDir, f))
+
+        # O CSV é escrito por último: sua existência indica que o ano está completo
+        linhas.to_csv(os.path.join(_appEEARsDir, "MOD16A3GF-061-Statistics.csv"), index=False)
+        divididos.append(ano)
+    return divididos
+
+
+def _anos_das_linhas(df):
+    if 'Date' in df.columns:
+        return pd.to_datetime(df['Date']).dt.year
+    return df['File Name'].str.extract(r'doy(\d{4})', expand=False).astype(int)
+
+
+def _areas_das_linhas(df):
+    # O AppEEARS numera as features da FeatureCollection como aid0001, aid0002, ...
+    origem = df['aid'].astype(str) if 'aid' in df.columns else df['File Name']
+    return origem.str.extract(r'(\d+)\D*$', expand=False).astype(int)
+
+
+def adquirir_balanco_lote(faltantes_por_local, data_Json_locais, pastas_locais, _pastaLote, api, head, stop_event,
+                          tarefas_criadas, log=print):
+    """
+    Aquisição de ET/PET de vários locais com uma única tarefa de área no AppEEARS.
+
+    faltantes_por_local[i] são os anos ainda não calculados do local i, cuja área está em
+    data_Json_locais[i] e cujos dados ficam em pastas_locais[i]. Anos já baixados ou presentes
+    no cache compartilhado são reaproveitados; os demais são pedidos em uma tarefa multianual
+    com uma feature por local, e o bundle é dividido por área (aid) e por ano nas pastas
+    BALANCO_HIDRICO_{ano} de cada local. O bundle é baixado em uma pasta própria da tarefa,
+    criada em _pastaLote e apagada após a divisão. Retorna {i: {ano: (et_series, pet_series)}}.
+    """
+    resultados = {i: {} for i in range(len(pastas_locais))}
+    ausentes = {}
+
+    for i, anos in enumerate(faltantes_por_local):
+        for ano in anos:
+            _appEEARsDir = os.path.join(pastas_locais[i], f"BALANCO_HIDRICO_{ano}")
+            statistics_file = os.path.join(_appEEARsDir, "MOD16A3GF-061-Statistics.csv")
+            if os.path.exists(statistics_file):
+                USO_CACHE_ARQUIVOS.inc(tipo="mod16", resultado="local")
+            elif vincular(chave_produto(PRODUTO_BALANCO, BANDAS_BALANCO, ano, data_Json_locais[i]), _appEEARsDir):
+                USO_CACHE_ARQUIVOS.inc(tipo="mod16", resultado="compartilhado")
+            else:
+                USO_CACHE_ARQUIVOS.inc(tipo="mod16", resultado="falta")
+                ausentes.setdefault(i, []).append(ano)
+                continue
+            resultados[i][ano] = _ler_estatisticas_ano(ano, statistics_file, stop_event, log=log)
+
+    if not ausentes or stop_event.is_set():
+        return resultados
+
+    # Uma feature por local com anos ausentes; a ordem define o aid de cada área no bundle
+    locais = sorted(ausentes)
+    anos_tarefa = sorted({ano for anos in ausentes.values() for ano in anos})
+    ano_inicial, ano_final = anos_tarefa[0], anos_tarefa[-1]
+    data_Json_lote = {
+        "type": "FeatureCollection",
+        "features": [data_Json_locais[i]["features"][0] for i in locais],
+    }
+    task_name = f"BALANCO_HIDRICO_LOTE_{ano_inicial}_{ano_final}"
+    # Pasta exclusiva desta tarefa: os nomes dos GeoTIFFs (_doy{ano}_aid{NNNN}) se repetem entre
+    # lotes e locais diferentes, e sobras de outro lote iriam parar na pasta do local errado
+    os.makedirs(_pastaLote, exist_ok=True)
+    _bundleDir = tempfile.mkdtemp(prefix="tarefa_", dir=_pastaLote)
 
-        task_id = criar_tarefa(api, produto_usado, bandas_usadas, task_name, data_Json, _appEEARsDir, ano, head)
+    try:
+        task_id = criar_tarefa(api, PRODUTO_BALANCO, BANDAS_BALANCO, task_name, data_Json_lote, _bundleDir,
+                               ano_inicial, head, ano_final=ano_final)
+        if not task_id:
+            raise ValueError(f"Falha ao criar a tarefa do lote para os anos {ano_inicial}-{ano_final}.")
+        tarefas_criadas.append(task_id)
+
+        log(f"Tarefa única enviada ao AppEEARS para {len(locais)} local(is) e os anos {ano_inicial}-{ano_final}. "
+            "Aguardando a conclusão...")
+        aguardar_tarefa(task_id, api, head, stop_event, log=log)
+        if stop_event.is_set():
+            cancelar_todas_as_tarefas(tarefas_criadas, api, head)
+            return resultados
+        baixar_arquivos(task_id, api, head, _bundleDir, stop_event=stop_event)
+        divididos = dividir_bundle_lote(
+            _bundleDir, {aid: (pastas_locais[i], ausentes[i]) for aid, i in enumerate(locais, start=1)}
+        )
+    except Exception as e:
+        if not stop_event.is_set():
+            log(f"Erro ao processar o lote para os anos {ano_inicial}-{ano_final}: {e}")
+        for i in locais:
+            resultados[i].update({ano: (0, 0) for ano in ausentes[i]})
+        return resultados
+    finally:
+        shutil.rmtree(_bundleDir, ignore_errors=True)
+
+    for aid, i in enumerate(locais, start=1):
+        for ano in ausentes[i]:
+            if ano not in divididos.get(aid, []):
+                # Sem dados no bundle: o ano continua ausente e é pedido de novo na próxima análise
+                log(f"O bundle do lote não trouxe dados de ET/PET do ano {ano} para o local {i + 1}.")
+                resultados[i][ano] = (0, 0)
+                continue
+            _appEEARsDir = os.path.join(pastas_locais[i], f"BALANCO_HIDRICO_{ano}")
+            _publicar_no_cache(chave_produto(PRODUTO_BALANCO, BANDAS_BALANCO, ano, data_Json_locais[i]), _appEEARsDir)
+            resultados[i][ano] = _ler_estatisticas_ano(
+                ano, os.path.join(_appEEARsDir, "MOD16A3GF-061-Statistics.csv"), stop_event, log=log
+            )
+    return resultados
+
+
+def dividir_bundle_lote(_bundleDir, destinos):
+    """
+    Divide o bundle de uma tarefa de vários locais. destinos mapeia o aid de cada área para
+    (pasta do local, anos desejados); cada ano vira uma pasta BALANCO_HIDRICO_{ano} do local,
+    no mesmo formato das tarefas anuais de um único local. Anos sem linhas no CSV ou sem
+    GeoTIFFs da área não são criados. Retorna {aid: anos divididos}.
+    """
+    df = pd.read_csv(os.path.join(_bundleDir, "MOD16A3GF-061-Statistics.csv"))
+    anos_linhas = _anos_das_linhas(df)
+    areas_linhas = _areas_das_linhas(df)
+
+    arquivos = [f for f in os.listdir(_bundleDir) if f.endswith(".tif")]
+    divididos = {}
+    for aid, (pasta_local, anos) in destinos.items():
+        for ano in anos:
+            linhas = df[(anos_linhas == ano) & (areas_linhas == aid)]
+            tifs = [f for f in arquivos if f"_doy{ano}" in f and f"_aid{aid:04d}" in f]
+            if linhas.empty or not tifs:
+                continue
+
+            _appEEARsDir = os.path.join(pasta_local, f"BALANCO_HIDRICO_{ano}")
+            os.makedirs(_appEEARsDir, exist_ok=True)
+            for f in tifs:
+                os.replace(os.path.join(_bundleDir, f), os.path.join(_appEEARsDir, f))
+
+            # O CSV é escrito por último: sua existência indica que o ano está completo
+            linhas.to_csv(os.path.join(_appEEARsDir, "MOD16A3GF-061-Statistics.csv"), index=False)
+            divididos.setdefault(aid, []).append(ano)
+    return divididos
+
+
+def submeter_tarefa_ano(ano, data_Json, _appEEARsDir, api, head, log=print, stop_event=None):
+    """
+    Cria a tarefa de ET/PET de um ano no AppEEARS e retorna o seu ID (ou None em caso de falha).
+    """
+    try:
+        task_id = criar_tarefa(api, PRODUTO_BALANCO, BANDAS_BALANCO, f"BALANCO_HIDRICO_{ano}", data_Json, _appEEARsDir, ano, head)
         if not task_id:
             raise ValueError(f"Falha ao criar a tarefa para o ano {ano}.")
+        return task_id
+    except Exception as e:
+        if stop_event is None or not stop_event.is_set():
+            log(f"Erro ao processar dados para o ano {ano}: {e}")
+        return None
 
-        # Adiciona o ID da tarefa à lista de tarefas criadas
-        tarefas_criadas.append(task_id)
 
+def concluir_tarefa_ano(ano, task_id, _localdataName, api, head, stop_event, log=print, chave=None):
+    """
+    Aguarda a tarefa de um ano, baixa o bundle e retorna os totais de ET e PET.
+    Com a chave informada, o bundle baixado é publicado no cache compartilhado.
+    """
+    _appEEARsDir = os.path.join(_localdataName, f"BALANCO_HIDRICO_{ano}")
+    statistics_file = os.path.join(_appEEARsDir, "MOD16A3GF-061-Statistics.csv")
+    try:
         aguardar_tarefa(task_id, api, head, stop_event, log=log)
-        baixar_arquivos(task_id, api, head, _appEEARsDir)
+        if stop_event.is_set():
+            return 0, 0
+        baixar_arquivos(task_id, api, head, _appEEARsDir, stop_event=stop_event)
+        if chave:
+            _publicar_no_cache(chave, _appEEARsDir)
         return processar_dados_localmente(statistics_file)
     except Exception as e:
         if not stop_event.is_set():
@@ -57,6 +358,47 @@ def balanco_hidrico_ano(ano, data_Json, _localdataName, api, head, stop_event, t
         return 0, 0
 
 
+def _publicar_no_cache(chave, _appEEARsDir):
+    try:
+        publicar(chave, _appEEARsDir)
+    except Exception as e:
+        print(f"Erro ao publicar {_appEEARsDir} no cache compartilhado: {e}")
+
+
+def _pasta_integra(_appEEARsDir):
+    """
+    Confere uma pasta baixada antes do cache compartilhado (sem verificação de tamanho nem
+    SHA-256) antes de publicá-la: o CSV de estatísticas precisa ser lido e os GeoTIFFs, abertos
+    por inteiro. Uma pasta truncada continua só do usuário, sem se espalhar pelo cache.
+    """
+    try:
+        processar_dados_localmente(os.path.join(_appEEARsDir, "MOD16A3GF-061-Statistics.csv"))
+        tifs = [f for f in os.listdir(_appEEARsDir) if f.endswith(".tif")]
+        if not tifs:
+            return False
+        for f in tifs:
+            with rasterio.open(os.path.join(_appEEARsDir, f)) as src:
+                src.read(1)
+    except Exception as e:
+        print(f"Pasta {_appEEARsDir} não publicada no cache compartilhado: {e}")
+        return False
+    return True
+
+
+def _ler_estatisticas_ano(ano, statistics_file, stop_event, log=print):
+    try:
+        return processar_dados_localmente(statistics_file)
+    except Exception as e:
+        # Sem o CSV de estatísticas, as médias da área vêm dos próprios GeoTIFFs do ano
+        _, medias = passada_aridez([ano], os.path.dirname(os.path.dirname(statistics_file)), log=lambda msg: None)
+        if not medias.empty and medias[["ET", "PET"]].notna().all(axis=None):
+            log(f"Estatísticas de {ano} calculadas a partir dos GeoTIFFs de ET/PET ({e}).")
+            return pd.Series([medias.at[0, "ET"]], index=[0]), pd.Series([medias.at[0, "PET"]], index=[0])
+        if not stop_event.is_set():
+            log(f"Erro ao processar o arquivo local {statistics_file}: {e}")
+        return 0, 0
+
+
 def processar_dados_localmente(statistics_file):
     """
     Processa os dados locais do arquivo CSV e retorna os totais anuais de ET e PET como Series.
@@ -71,12 +413,14 @@ def processar_dados_localmente(statistics_file):
     # Retornar os valores como Series
     return pd.Series([et_total], index=[0]), pd.Series([pet_total], index=[0])
 
-def criar_tarefa(api, produto_usado, bandas_usadas, task_name, data_Json, _appEEARsDir, ano, head):
+def criar_tarefa(api, produto_usado, bandas_usadas, task_name, data_Json, _appEEARsDir, ano, head, ano_final=None):
     """
     Cria uma tarefa na API para baixar os dados.
+    Quando ano_final é informado, a tarefa cobre todo o intervalo ano..ano_final.
     """
-    lst_response = requests.get(f'{api}product/{produto_usado}').json()
-    projections = requests.get(f'{api}spatial/proj').json()
+    # Metadados do produto e das projeções vêm do cache do cliente (não mudam entre anos)
+    lst_response = cliente.camadas_produto(api, produto_usado)
+    projections = cliente.projecoes(api)
 
     proj = next((p['Name'] for p in projections if p['Name'] == 'geographic'), None)
     prodLayer = [{"layer": l, "product": produto_usado} for l in lst_response if l in bandas_usadas]
@@ -88,7 +432,7 @@ def criar_tarefa(api, produto_usado, bandas_usadas, task_name, data_Json, _appEE
             'dates': [{
                 'startDate': '01-01',
                 'endDate': '12-31',
-                'yearRange': [ano, ano],
+                'yearRange': [ano, ano_final or ano],
                 'recurring': True
             }],
             'layers': prodLayer,
@@ -102,7 +446,7 @@ def criar_tarefa(api, produto_usado, bandas_usadas, task_name, data_Json, _appEE
 
     os.makedirs(_appEEARsDir, exist_ok=True)
     print(f"Enviando tarefa para {ano}...")
-    task_response = requests.post(f'{api}task', json=task, headers=head).json()
+    task_response = cliente.post(f'{api}task', json=task, headers=head).json()
     print(f"Resposta da API ao criar tarefa para {ano}: {task_response}")
 
     return task_response.get('task_id')
@@ -111,43 +455,61 @@ def criar_tarefa(api, produto_usado, bandas_usadas, task_name, data_Json, _appEE
 def aguardar_tarefa(task_id, api, head, stop_event, log=print):
     """
     Aguarda a conclusão da tarefa na API ou cancela se o processo for interrompido.
+    O status é acompanhado pelo monitor compartilhado do processo (monitor_tarefas).
     """
-    starttime = time.time()
-    intervalo = 20.0
-    _status = status(task_id, api, head)
-    while _status != 'done':
+    espera = monitor_tarefas.registrar(task_id, api, head)
+    inicio = time.monotonic()
+    while not espera.evento.wait(1.0):
         if stop_event.is_set():
             log(f"Processo interrompido pelo usuário durante a execução da tarefa {task_id}. Cancelando a tarefa no AppEEARS...")
+            monitor_tarefas.remover(task_id)
             cancelar_tarefa(task_id, api, head)  # Cancela a tarefa
+            ESPERA_TAREFA.observar(time.monotonic() - inicio, resultado="cancelada")
             return
-        print(f"Status: {_status}")
-        time.sleep(intervalo - ((time.time() - starttime) % intervalo))
-        _status = status(task_id, api, head)
-    if _status != 'done':
-        raise RuntimeError(f"Tarefa {task_id} não foi concluída com sucesso.")
+    ESPERA_TAREFA.observar(time.monotonic() - inicio, resultado=espera.status or "removida")
+    if espera.status != 'done' and not stop_event.is_set():
+        raise RuntimeError(f"Tarefa {task_id} não foi concluída com sucesso (status: {espera.status}).")
 
 
-def baixar_arquivos(task_id, api, head, _appEEARsDir):
+def baixar_arquivos(task_id, api, head, _appEEARsDir, stop_event=None, max_paralelo=DOWNLOADS_SIMULTANEOS):
     """
     Baixa os arquivos gerados pela tarefa.
+
+    Os arquivos são baixados em paralelo, com retomada e verificação do tamanho/SHA-256
+    informados no manifesto do bundle. O CSV de estatísticas, que indica que o ano está
+    completo, só é baixado depois de todos os demais.
     """
-    bundle = requests.get(f'{api}bundle/{task_id}', headers=head).json()
+    bundle = cliente.get(f'{api}bundle/{task_id}', headers=head).json()
+    os.makedirs(_appEEARsDir, exist_ok=True)
+
+    itens, estatisticas = [], []
     for f in bundle['files']:
         filename = f['file_name'].split('/')[-1]
         filepath = os.path.join(_appEEARsDir, filename)
-        if not os.path.exists(filepath):
-            dl = requests.get(f'{api}bundle/{task_id}/{f["file_id"]}', headers=head, stream=True)
-            with open(filepath, 'wb') as file:
-                for data in dl.iter_content(chunk_size=8192):
-                    file.write(data)
+        if arquivo_valido(filepath, f.get('file_size')):
+            continue
+        if os.path.exists(filepath):
+            print(f"Arquivo incompleto encontrado, baixando novamente: {filepath}")
+            os.remove(filepath)
+        item = {
+            "url": f'{api}bundle/{task_id}/{f["file_id"]}',
+            "destino": filepath,
+            "headers": head,
+            "tamanho_esperado": f.get('file_size'),
+            "sha256": f.get('sha256'),
+        }
+        (estatisticas if filename.endswith("-Statistics.csv") else itens).append(item)
+
+    baixar_em_paralelo(itens, max_paralelo=max_paralelo, stop_event=stop_event)
+    baixar_em_paralelo(estatisticas, max_paralelo=max_paralelo, stop_event=stop_event)
+
 
-                    
 def cancelar_tarefa(task_id, api, head):
     """
     Cancela uma tarefa no AppEEARS.
     """
     try:
-        response = requests.delete(f'{api}task/{task_id}', headers=head)
+        response = cliente.delete(f'{api}task/{task_id}', headers=head)
         if response.status_code == 204:
             print(f"Tarefa {task_id} cancelada com sucesso no AppEEARS.")
         else:
@@ -175,38 +537,12 @@ def precipitacao_ano_chirps(ano, data_Json, _localdataName, stop_event, log=prin
         log(f"Processo interrompido pelo usuário antes de iniciar o ano {ano}.")
         return 0
 
-    # Criar diretório para armazenar os arquivos do ano
-    pasta_ano = os.path.join(_localdataName, f"CHIRPS_annual")
-    os.makedirs(pasta_ano, exist_ok=True)
-    # Nome do arquivo anual
-    nome_tif = f"chirps-v2.0.{ano}.tif"
-    destino_tif = os.path.join(pasta_ano, nome_tif)
-    url = f"https://data.chc.ucsb.edu/products/CHIRPS-2.0/global_annual/tifs/{nome_tif}"
-
-    # Baixar o arquivo se não existir
-    if not os.path.exists(destino_tif):
-        if stop_event.is_set():
-            log(f"Processo interrompido pelo usuário antes de baixar o arquivo para o ano {ano}.")
-            return 0
-
-        print(f"Baixando {url} ...")
-        try:
-            r = requests.get(url, stream=True)
-            if r.status_code != 200:
-                if not stop_event.is_set():
-                    log(f"Erro ao baixar {url}. Código de status: {r.status_code}")
-                return 0
-            with open(destino_tif, 'wb') as f:
-                for chunk in r.iter_content(chunk_size=8192):
-                    if stop_event.is_set():
-                        log(f"Processo interrompido pelo usuário durante o download do ano {ano}.")
-                        return 0
-                    f.write(chunk)
-            print(f"Arquivo {destino_tif} baixado com sucesso.")
-        except Exception as e:
-            if not stop_event.is_set():
-                log(f"Erro ao baixar o arquivo {url}: {e}")
-            return 0
+    # Os GeoTIFFs globais ficam no acervo compartilhado do servidor (um download por ano)
+    destino_tif = obter_tif_chirps(ano, stop_event, log=log)
+    if destino_tif is None:
+        if not stop_event.is_set():
+            log(f"Erro ao recuperar o arquivo CHIRPS do ano {ano}.")
+        return 0
 
     # Processar o arquivo GeoTIFF
     try:
@@ -214,12 +550,8 @@ def precipitacao_ano_chirps(ano, data_Json, _localdataName, stop_event, log=prin
             log(f"Processo interrompido pelo usuário antes de processar o arquivo para o ano {ano}.")
             return 0
 
-        ds = rioxarray.open_rasterio(destino_tif)
-        ds = ds.where(ds != -9999.0)
-        geometria = data_Json["features"][0]["geometry"] if data_Json.get("type").lower() == "featurecollection" else data_Json
-        gdf = gpd.GeoDataFrame({'geometry': [shape(geometria)]}, crs="EPSG:4326")
-        ds_clip = ds.rio.clip(gdf.geometry, gdf.crs, drop=True)
-        media_anual = ds_clip.mean().item()
+        # Leitura apenas da janela da área, com máscara pré-calculada por geometria
+        media_anual = media_chirps_na_area(destino_tif, data_Json)
         print(f"Média anual de precipitação: {media_anual:.2f} mm")
     except Exception as e:
         if not stop_event.is_set():
@@ -0,0 +1,461 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from app.globals import CACHE_DIR, MAX_JOBS_SIMULTANEOS, RETENCAO_JOBS, RETENCAO_LOGS_JOBS, TAMANHO_FILA_JOBS
+from app.process.cache_produtos import coletar_entradas_orfas
+
+ARQUIVO_JOBS = os.path.join(CACHE_DIR, "jobs.sqlite")
+ESTADOS_ATIVOS = ("na_fila", "executando")
+INTERVALO_MANUTENCAO = 3600  # s entre as limpezas periódicas
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    estado TEXT NOT NULL,
+    criado_em REAL NOT NULL,
+    iniciado_em REAL,
+    concluido_em REAL,
+    pid INTEGER,
+    instancia TEXT,
+    cancelar INTEGER NOT NULL DEFAULT 0,
+    resultado TEXT,
+    erro TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_estado ON jobs (estado, criado_em);
+CREATE INDEX IF NOT EXISTS jobs_usuario ON jobs (user_id, estado);
+CREATE TABLE IF NOT EXISTS logs (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    mensagem TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS logs_job ON logs (job_id, seq);
+CREATE TABLE IF NOT EXISTS eventos (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    dados TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS eventos_job ON eventos (job_id, seq);
+"""
+
+
+class FilaCheia(Exception):
+    """Limite de jobs ativos atingido; posicao é quantos jobs já aguardam na fila."""
+
+    def __init__(self, posicao):
+        super().__init__(f"Fila de processamento cheia ({posicao} job(s) aguardando).")
+        self.posicao = posicao
+
+
+class Job:
+    """Contexto entregue à função do job: id, evento de cancelamento próprio e log persistente."""
+
+    def __init__(self, fila, job_id, user_id):
+        self.id = job_id
+        self.user_id = user_id
+        self.stop_event = threading.Event()
+        self._fila = fila
+
+    def log(self, msg):
+        print(msg)
+        self._fila._registrar_log(self.id, msg)
+
+    def progresso(self, evento):
+        self._fila._registrar_evento(self.id, evento)
+
+
+class FilaJobs:
+    """
+    Fila de análises com pool limitado de workers e estado em SQLite.
+
+    Cada job tem ID e cancelamento próprios. O estado e os logs ficam no banco, de modo que
+    /status funciona em qualquer worker do gunicorn e sobrevive a reinícios; o pedido de
+    cancelamento também passa pelo banco e é entregue ao processo que executa o job.
+    """
+
+    def __init__(self, caminho=ARQUIVO_JOBS, max_simultaneos=MAX_JOBS_SIMULTANEOS, tamanho_fila=TAMANHO_FILA_JOBS):
+        self.caminho = caminho
+        self.max_simultaneos = max_simultaneos
+        self.tamanho_fila = tamanho_fila
+        self.instancia = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._executor = None
+        self._jobs = {}  # job_id -> Job deste processo ainda não concluído
+        self._observador = None
+        self._iniciado = False
+        self._esquema_criado = False
+
+    def enfileirar(self, user_id, tipo, funcao, *args):
+        """
+        Registra um job e o agenda no pool. funcao(job, *args) deve retornar o caminho do
+        resultado (ou None se o job foi interrompido). Retorna (job_id, posicao_na_fila) ou
+        levanta FilaCheia quando o limite de jobs ativos já foi atingido.
+        """
+        self._iniciar()
+        job_id = uuid.uuid4().hex
+        job = Job(self, job_id, user_id)
+        # Registrado antes da inserção: um job deste pid fora de _jobs é de um processo anterior
+        with self._lock:
+            self._jobs[job_id] = job
+        conexao = self._conectar()
+        try:
+            with conexao:
+                # BEGIN IMMEDIATE serializa a admissão entre os workers
+                conexao.execute("BEGIN IMMEDIATE")
+                self._marcar_orfaos(conexao)
+                executando, na_fila = self._contar_ativos(conexao)
+                if executando + na_fila >= self.max_simultaneos + self.tamanho_fila:
+                    raise FilaCheia(na_fila)
+                conexao.execute(
+                    "INSERT INTO jobs (id, user_id, tipo, estado, criado_em, pid, instancia) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, user_id, tipo, "na_fila", time.time(), os.getpid(), self.instancia),
+                )
+        except BaseException:
+            with self._lock:
+                self._jobs.pop(job_id, None)
+            raise
+        finally:
+            conexao.close()
+
+        with self._lock:
+            self._executor.submit(self._executar, job, funcao, args)
+        return job_id, self.posicao(job_id)
+
+    def cancelar(self, job_id=None, user_id=None):
+        """
+        Pede o cancelamento de um job (ou de todos os jobs ativos do usuário).
+        Retorna a quantidade de jobs sinalizados.
+        """
+        condicao, parametros = ("id = ?", [job_id]) if job_id else ("user_id = ?", [user_id])
+        if job_id and user_id:
+            condicao, parametros = "id = ? AND user_id = ?", [job_id, user_id]
+        conexao = self._conectar()
+        try:
+            with conexao:
+                conexao.execute("BEGIN IMMEDIATE")
+                linhas = conexao.execute(
+                    f"SELECT id FROM jobs WHERE {condicao} AND estado IN (?, ?)", parametros + list(ESTADOS_ATIVOS)
+                ).fetchall()
+                conexao.executemany("UPDATE jobs SET cancelar = 1 WHERE id = ?", linhas)
+        finally:
+            conexao.close()
+        self._entregar_cancelamentos()
+        return len(linhas)
+
+    def status(self, job_id):
+        """
+        Estado do job ({} se não existir): estado, logs, posição na fila e resultado.
+        """
+        self._verificar_orfao(job_id)
+        conexao = self._conectar()
+        try:
+            job = conexao.execute(
+                "SELECT user_id, tipo, estado, criado_em, iniciado_em, concluido_em, resultado, erro FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+            if job is None:
+                return {}
+            logs = [m for (m,) in conexao.execute("SELECT mensagem FROM logs WHERE job_id = ? ORDER BY seq", (job_id,))]
+        finally:
+            conexao.close()
+        chaves = ("user_id", "tipo", "estado", "criado_em", "iniciado_em", "concluido_em", "resultado", "erro")
+        dados = dict(zip(chaves, job))
+        dados["logs"] = logs
+        dados["posicao_fila"] = self.posicao(job_id) if dados["estado"] == "na_fila" else 0
+        return dados
+
+    def novidades(self, job_id, seq_log=0, seq_evento=0):
+        """
+        Logs e eventos de progresso do job posteriores aos cursores informados, e o estado atual.
+        Retorna (estado, [(seq, mensagem)], [(seq, evento)]); estado é None se o job não existe.
+        """
+        self._verificar_orfao(job_id)
+        conexao = self._conectar()
+        try:
+            linha = conexao.execute("SELECT estado FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if linha is None:
+                return None, [], []
+            logs = conexao.execute(
+                "SELECT seq, mensagem FROM logs WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, seq_log)
+            ).fetchall()
+            eventos = conexao.execute(
+                "SELECT seq, dados FROM eventos WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, seq_evento)
+            ).fetchall()
+        finally:
+            conexao.close()
+        return linha[0], logs, [(seq, json.loads(dados)) for seq, dados in eventos]
+
+    def dono(self, job_id):
+        """user_id do job (None se não existir)."""
+        conexao = self._conectar()
+        try:
+            linha = conexao.execute("SELECT user_id FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conexao.close()
+        return linha[0] if linha else None
+
+    def posicao(self, job_id):
+        """Quantos jobs na fila foram criados antes deste (0 = próximo a executar)."""
+        conexao = self._conectar()
+        try:
+            (posicao,) = conexao.execute(
+                "SELECT COUNT(*) FROM jobs WHERE estado = 'na_fila' AND criado_em < "
+                "(SELECT criado_em FROM jobs WHERE id = ?)",
+                (job_id,),
+            ).fetchone()
+        finally:
+            conexao.close()
+        return posicao
+
+    def contagem(self):
+        """Jobs executando e na fila, somando todos os workers."""
+        conexao = self._conectar()
+        try:
+            with conexao:
+                conexao.execute("BEGIN IMMEDIATE")
+                self._marcar_orfaos(conexao)
+            executando, na_fila = self._contar_ativos(conexao)
+        finally:
+            conexao.close()
+        return {"executando": executando, "na_fila": na_fila}
+
+    def _executar(self, job, funcao, args):
+        try:
+            if self._cancelamento_pedido(job.id):
+                job.stop_event.set()
+            if job.stop_event.is_set():
+                job.log("Processo interrompido pelo usuário antes do início.")
+                self._finalizar(job.id, "cancelado")
+                return
+
+            self._atualizar(job.id, "UPDATE jobs SET estado = 'executando', iniciado_em = ? WHERE id = ?", time.time())
+            resultado = funcao(job, *args)
+            if job.stop_event.is_set() or resultado is None:
+                self._finalizar(job.id, "cancelado")
+            else:
+                self._finalizar(job.id, "concluido", resultado=resultado)
+        except Exception as e:
+            if job.stop_event.is_set():
+                self._finalizar(job.id, "cancelado")
+            else:
+                job.log(f"Erro: {str(e)}")
+                self._finalizar(job.id, "erro", erro=str(e))
+        finally:
+            with self._lock:
+                self._jobs.pop(job.id, None)
+
+    def _finalizar(self, job_id, estado, resultado=None, erro=None):
+        conexao = self._conectar()
+        try:
+            with conexao:
+                conexao.execute(
+                    "UPDATE jobs SET estado = ?, concluido_em = ?, resultado = ?, erro = ? WHERE id = ?",
+                    (estado, time.time(), resultado, erro, job_id),
+                )
+        finally:
+            conexao.close()
+
+    def _atualizar(self, job_id, sql, *valores):
+        conexao = self._conectar()
+        try:
+            with conexao:
+                conexao.execute(sql, (*valores, job_id))
+        finally:
+            conexao.close()
+
+    def _registrar_log(self, job_id, mensagem):
+        conexao = self._conectar()
+        try:
+            with conexao:
+                conexao.execute("INSERT INTO logs (job_id, mensagem) VALUES (?, ?)", (job_id, str(mensagem)))
+        finally:
+            conexao.close()
+
+    def _registrar_evento(self, job_id, evento):
+        conexao = self._conectar()
+        try:
+            with conexao:
+                conexao.execute("INSERT INTO eventos (job_id, dados) VALUES (?, ?)", (job_id, json.dumps(evento, default=str)))
+        finally:
+            conexao.close()
+
+    def _cancelamento_pedido(self, job_id):
+        conexao = self._conectar()
+        try:
+            linha = conexao.execute("SELECT cancelar FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conexao.close()
+        return bool(linha and linha[0])
+
+    def _entregar_cancelamentos(self):
+        """Sinaliza o evento dos jobs deste processo cujo cancelamento foi pedido no banco."""
+        with self._lock:
+            locais = dict(self._jobs)
+        if not locais:
+            return
+        conexao = self._conectar()
+        try:
+            marcados = {
+                job_id for (job_id,) in conexao.execute(
+                    "SELECT id FROM jobs WHERE instancia = ? AND cancelar = 1 AND estado IN (?, ?)",
+                    (self.instancia, *ESTADOS_ATIVOS),
+                )
+            }
+        finally:
+            conexao.close()
+        for job_id in marcados & set(locais):
+            locais[job_id].stop_event.set()
+
+    def _observar(self):
+        # Cancelamentos pedidos em outro worker chegam por aqui
+        proxima_manutencao = time.monotonic()
+        while True:
+            time.sleep(1.0)
+            try:
+                self._entregar_cancelamentos()
+            except Exception as e:
+                print(f"Erro ao verificar cancelamentos da fila de jobs: {e}")
+            if time.monotonic() >= proxima_manutencao:
+                proxima_manutencao = time.monotonic() + INTERVALO_MANUTENCAO
+                try:
+                    self._manutencao()
+                except Exception as e:
+                    print(f"Erro na manutenção da fila de jobs: {e}")
+
+    def _manutencao(self):
+        self._limpar_historico()
+        # Remove do cache compartilhado as entradas cujas pastas de usuário foram apagadas
+        coletar_entradas_orfas()
+
+    def _limpar_historico(self, agora=None):
+        """
+        Apaga os logs e eventos dos jobs finalizados há mais de RETENCAO_LOGS_JOBS e os
+        próprios jobs após RETENCAO_JOBS, para o banco da fila não crescer sem limite.
+        """
+        agora = agora or time.time()
+        fim = "COALESCE(concluido_em, iniciado_em, criado_em)"
+        finalizados = f"SELECT id FROM jobs WHERE estado NOT IN (?, ?) AND {fim} < ?"
+        conexao = self._conectar()
+        try:
+            with conexao:
+                limite_logs = (*ESTADOS_ATIVOS, agora - RETENCAO_LOGS_JOBS)
+                conexao.execute(f"DELETE FROM logs WHERE job_id IN ({finalizados})", limite_logs)
+                conexao.execute(f"DELETE FROM eventos WHERE job_id IN ({finalizados})", limite_logs)
+                conexao.execute(
+                    f"DELETE FROM jobs WHERE estado NOT IN (?, ?) AND {fim} < ?",
+                    (*ESTADOS_ATIVOS, agora - RETENCAO_JOBS),
+                )
+        finally:
+            conexao.close()
+
+    def _contar_ativos(self, conexao):
+        contagem = dict(conexao.execute(
+            "SELECT estado, COUNT(*) FROM jobs WHERE estado IN (?, ?) GROUP BY estado", ESTADOS_ATIVOS
+        ).fetchall())
+        return contagem.get("executando", 0), contagem.get("na_fila", 0)
+
+    def _iniciar(self):
+        with self._lock:
+            if self._iniciado:
+                return
+            self._executor = ThreadPoolExecutor(max_workers=self.max_simultaneos, thread_name_prefix="job")
+            self._observador = threading.Thread(target=self._observar, name="fila-jobs", daemon=True)
+            self._observador.start()
+            self._iniciado = True
+
+    def recuperar_orfaos(self):
+        """
+        Jobs ativos cujo processo não existe mais (reinício do servidor) são marcados como
+        interrompidos, para não ocuparem a fila nem aparecerem em execução para sempre.
+        Retorna a quantidade de jobs marcados.
+        """
+        conexao = self._conectar()
+        try:
+            with conexao:
+                conexao.execute("BEGIN IMMEDIATE")
+                return self._marcar_orfaos(conexao)
+        finally:
+            conexao.close()
+
+    def _marcar_orfaos(self, conexao):
+        # Deve ser chamado dentro de uma transação BEGIN IMMEDIATE
+        ativos = conexao.execute("SELECT id, pid FROM jobs WHERE estado IN (?, ?)", ESTADOS_ATIVOS).fetchall()
+        orfaos = [job_id for job_id, pid in ativos if self._orfao(job_id, pid)]
+        conexao.executemany(
+            "UPDATE jobs SET estado = 'interrompido', concluido_em = ?, "
+            "erro = 'Servidor reiniciado durante o processamento.' WHERE id = ?",
+            [(time.time(), job_id) for job_id in orfaos],
+        )
+        return len(orfaos)
+
+    def _orfao(self, job_id, pid):
+        if pid == os.getpid():
+            # Mesmo pid, mas o job não é deste processo: o pid foi reaproveitado após um reinício
+            with self._lock:
+                return job_id not in self._jobs
+        return not _processo_vivo(pid)
+
+    def _verificar_orfao(self, job_id):
+        """Recupera o job se ele consta como ativo mas o processo que o executava não existe mais."""
+        conexao = self._conectar()
+        try:
+            linha = conexao.execute(
+                "SELECT pid FROM jobs WHERE id = ? AND estado IN (?, ?)", (job_id, *ESTADOS_ATIVOS)
+            ).fetchone()
+        finally:
+            conexao.close()
+        if linha and self._orfao(job_id, linha[0]):
+            self.recuperar_orfaos()
+
+    def _conectar(self):
+        os.makedirs(os.path.dirname(self.caminho), exist_ok=True)
+        conexao = sqlite3.connect(self.caminho, timeout=30, isolation_level=None)
+        if not self._esquema_criado:
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.executescript(_ESQUEMA)
+            self._esquema_criado = True
+        return conexao
+
+
+def _processo_vivo(pid):
+    if not pid:
+        return False
+    if os.name == "nt":
+        # No Windows, os.kill(pid, 0) encerraria o processo
+        return _processo_vivo_windows(pid)
+    try:
+        os.kill(pid, 0)
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+def _processo_vivo_windows(pid):
+    import ctypes
+
+    PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+    ERROR_ACCESS_DENIED = 5
+    STILL_ACTIVE = 259
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+    if not handle:
+        # Sem acesso, o processo existe; qualquer outro erro indica que não existe mais
+        return ctypes.get_last_error() == ERROR_ACCESS_DENIED
+    try:
+        codigo = ctypes.c_ulong()
+        if not kernel32.GetExitCodeProcess(handle, ctypes.byref(codigo)):
+            return True
+        return codigo.value == STILL_ACTIVE
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+fila_jobs = FilaJobs()
@@ -1,5 +1,7 @@
 import os
 
+from app.globals import PASTA_DADOS, URL_DADOS
+
 def criar_diretorios(inDir, user_id, latitude, longitude, area):
     """
     Cria os diretórios necessários para armazenar os dados do usuário.
@@ -23,16 +25,22 @@ def obter_caminhos_graficos(latitude, longitude, resolucao, ano_inicial, ano_fin
     Gera o caminho para o mapa IA gerado, organizado por usuário.
     """
     # Define o diretório base para os resultados
-    base_path = os.path.join("app", "static", "data", user_id, f"{latitude}_{longitude}_{resolucao}", "resultados")
+    base_path = os.path.join(PASTA_DADOS, user_id, f"{latitude}_{longitude}_{resolucao}", "resultados")
     os.makedirs(base_path, exist_ok=True)  # Cria o diretório, se não existir
 
     # Define apenas o arquivo do mapa IA (única imagem disponível)
     mapa_IA_nome = f"mapaIA{ano_inicial}-{ano_final}.png"
     
     # Gera o caminho completo para o arquivo e normaliza para o formato de URL
-    mapa_IA_path = os.path.join("data", user_id, f"{latitude}_{longitude}_{resolucao}", "resultados", mapa_IA_nome).replace("\\", "/")
+    mapa_IA_path = os.path.join(URL_DADOS, user_id, f"{latitude}_{longitude}_{resolucao}", "resultados", mapa_IA_nome).replace("\\", "/")
 
     # Log para depuração
     print(f"Mapa IA salvo em: {mapa_IA_path}")
 
-    return mapa_IA_path
\ No newline at end of file
+    return mapa_IA_path
+
+def caminho_raster_aridez(_graficos, ano_inicial, ano_final):
+    """
+    Caminho do COG com o índice de aridez médio do período, ao lado do PNG do mapa IA.
+    """
+    return os.path.join(_graficos, f"aridez{ano_inicial}-{ano_final}.tif")
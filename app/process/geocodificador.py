@@ -0,0 +1,177 @@
+"""
+Geocodificação reversa local: nome do município (e estado) mais próximo de uma coordenada.
+
+O gazetteer é um CSV com os centroides dos municípios brasileiros (codigo_ibge, nome, uf,
+estado, latitude, longitude), indexado em uma R-tree (shapely STRtree). Ele acompanha o
+projeto em app/static/geo/municipios.csv; para regerá-lo a partir das tabelas públicas de
+municípios e estados do IBGE:
+
+    python -m app.process.geocodificador --gerar
+
+Sem o gazetteer (ou para pontos fora do Brasil), o Nominatim é consultado como alternativa,
+com os resultados guardados em um cache persistente indexado pela coordenada arredondada.
+"""
+import argparse
+import math
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from shapely import STRtree, points
+
+from app.globals import CACHE_DIR, GEOCODIFICACAO_ONLINE, URL_NOMINATIM
+from app.process.cliente_appeears import cliente
+from app.process.metricas import DURACAO_NOMINATIM
+
+ARQUIVO_GAZETTEER = os.path.join("app", "static", "geo", "municipios.csv")
+ARQUIVO_CACHE = os.path.join(CACHE_DIR, "geocodificacao.sqlite")
+URL_MUNICIPIOS = "https://raw.githubusercontent.com/kelvins/municipios-brasileiros/main/csv/municipios.csv"
+URL_ESTADOS = "https://raw.githubusercontent.com/kelvins/municipios-brasileiros/main/csv/estados.csv"
+CASAS_CACHE = 2  # ~1 km: pontos vizinhos compartilham a mesma entrada do cache
+DISTANCIA_MAXIMA_KM = 60  # Acima disso o ponto provavelmente está fora do Brasil
+RAIO_TERRA_KM = 6371.0
+
+
+class Gazetteer:
+    """Centroides dos municípios em uma R-tree, com coordenadas corrigidas pela latitude."""
+
+    def __init__(self, tabela):
+        self.tabela = tabela.reset_index(drop=True)
+        self._lat = np.radians(self.tabela["latitude"].to_numpy(dtype=np.float64))
+        self._lon = np.radians(self.tabela["longitude"].to_numpy(dtype=np.float64))
+        # Longitude escalada por cos(lat): a distância euclidiana aproxima a distância real
+        self._arvore = STRtree(points(self._lon * np.cos(self._lat), self._lat))
+
+    def mais_proximo(self, latitude, longitude):
+        """Retorna (linha do município mais próximo, distância em km)."""
+        lat, lon = math.radians(latitude), math.radians(longitude)
+        indice = int(self._arvore.nearest(points(lon * math.cos(lat), lat)))
+        return self.tabela.iloc[indice], _haversine_km(lat, lon, self._lat[indice], self._lon[indice])
+
+
+class Geocodificador:
+    def __init__(self, gazetteer=ARQUIVO_GAZETTEER, cache=ARQUIVO_CACHE, online=GEOCODIFICACAO_ONLINE):
+        self.caminho_gazetteer = gazetteer
+        self.caminho_cache = cache
+        self.online = online
+        self._gazetteer = None
+        self._carregado = False
+        self._lock = threading.Lock()
+
+    def nome_local(self, latitude, longitude, log=print):
+        """
+        "Município - Estado" da coordenada: gazetteer local, depois cache persistente e, por
+        fim, o Nominatim. Se nada responder, retorna as próprias coordenadas.
+        """
+        latitude, longitude = float(latitude), float(longitude)
+        gazetteer = self._carregar()
+        if gazetteer is not None:
+            municipio, distancia = gazetteer.mais_proximo(latitude, longitude)
+            if distancia <= DISTANCIA_MAXIMA_KM:
+                nome = f"{municipio['nome']} - {municipio['estado']}"
+                log(f"Localização obtida: {nome}")
+                return nome
+
+        chave = (round(latitude, CASAS_CACHE), round(longitude, CASAS_CACHE))
+        nome = self._ler_cache(chave)
+        if nome is None and self.online:
+            nome = self._consultar_nominatim(latitude, longitude)
+            if nome is not None:
+                self._gravar_cache(chave, nome)
+        if nome is None:
+            return f"{latitude:.4f}, {longitude:.4f}"
+        log(f"Localização obtida: {nome}")
+        return nome
+
+    def _carregar(self):
+        with self._lock:
+            if not self._carregado:
+                self._carregado = True
+                if os.path.exists(self.caminho_gazetteer):
+                    self._gazetteer = Gazetteer(pd.read_csv(self.caminho_gazetteer))
+                else:
+                    print(f"Gazetteer {self.caminho_gazetteer} não encontrado; usando apenas o Nominatim.")
+            return self._gazetteer
+
+    def _consultar_nominatim(self, latitude, longitude):
+        inicio = time.perf_counter()
+        response = None
+        try:
+            response = cliente.get(
+                URL_NOMINATIM,
+                params={"format": "json", "lat": latitude, "lon": longitude},
+                headers={"User-Agent": "PaleBlueDot-DuneDivers/1.0 (seu-email@example.com)"},
+                timeout=(3, 5),
+            )
+            DURACAO_NOMINATIM.observar(time.perf_counter() - inicio, resultado=str(response.status_code))
+            if response.status_code != 200:
+                print(f"Erro na API Nominatim: {response.status_code}")
+                return None
+            address = response.json().get("address")
+            if not address:
+                return None
+            cidade = address.get("city") or address.get("town") or address.get("village") or "Localização desconhecida"
+            return f"{cidade} - {address.get('state', '')}"
+        except Exception as e:
+            if response is None:
+                DURACAO_NOMINATIM.observar(time.perf_counter() - inicio, resultado="erro")
+            print(f"Erro ao consultar o Nominatim: {e}")
+            return None
+
+    def _conectar(self):
+        os.makedirs(os.path.dirname(self.caminho_cache), exist_ok=True)
+        conexao = sqlite3.connect(self.caminho_cache, timeout=30)
+        conexao.execute(
+            "CREATE TABLE IF NOT EXISTS locais (latitude REAL, longitude REAL, nome TEXT, PRIMARY KEY (latitude, longitude))"
+        )
+        return conexao
+
+    def _ler_cache(self, chave):
+        conexao = self._conectar()
+        try:
+            linha = conexao.execute("SELECT nome FROM locais WHERE latitude = ? AND longitude = ?", chave).fetchone()
+        finally:
+            conexao.close()
+        return linha[0] if linha else None
+
+    def _gravar_cache(self, chave, nome):
+        conexao = self._conectar()
+        try:
+            with conexao:
+                conexao.execute("INSERT OR REPLACE INTO locais (latitude, longitude, nome) VALUES (?, ?, ?)", (*chave, nome))
+        finally:
+            conexao.close()
+
+
+def _haversine_km(lat1, lon1, lat2, lon2):
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * RAIO_TERRA_KM * math.asin(math.sqrt(a))
+
+
+def gerar_gazetteer(destino=ARQUIVO_GAZETTEER):
+    """
+    Monta o CSV do gazetteer a partir das tabelas de municípios e estados (códigos do IBGE).
+    """
+    municipios = pd.read_csv(URL_MUNICIPIOS)
+    estados = pd.read_csv(URL_ESTADOS)[["codigo_uf", "uf", "nome"]].rename(columns={"nome": "estado"})
+    tabela = municipios.merge(estados, on="codigo_uf")[["codigo_ibge", "nome", "uf", "estado", "latitude", "longitude"]]
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    tabela.sort_values("codigo_ibge").to_csv(destino, index=False)
+    print(f"Gazetteer com {len(tabela)} municípios gravado em {destino}")
+
+
+geocodificador = Geocodificador()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Geocodificação reversa local dos municípios brasileiros.")
+    parser.add_argument("--gerar", action="store_true", help="baixa as tabelas do IBGE e gera o gazetteer")
+    parser.add_argument("--consultar", nargs=2, type=float, metavar=("LATITUDE", "LONGITUDE"))
+    args = parser.parse_args()
+    if args.gerar:
+        gerar_gazetteer()
+    if args.consultar:
+        print(geocodificador.nome_local(*args.consultar))
@@ -0,0 +1,126 @@
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.process.cliente_appeears import cliente
+from app.process.metricas import BYTES_BAIXADOS, DURACAO_DOWNLOAD, VAZAO_DOWNLOAD
+
+TAMANHO_BLOCO = 1024 * 1024  # 1 MiB por leitura/escrita
+
+
+class DownloadInterrompido(Exception):
+    """O download foi interrompido pelo usuário; o arquivo parcial é mantido para retomada."""
+
+
+class FalhaVerificacao(Exception):
+    """O arquivo baixado não confere com o tamanho ou o checksum esperado."""
+
+
+def baixar_arquivo(url, destino, headers=None, tamanho_esperado=None, sha256=None, stop_event=None,
+                   tamanho_bloco=TAMANHO_BLOCO, origem="appeears"):
+    """
+    Baixa url para destino de forma retomável e atômica.
+
+    Os dados são gravados em destino + '.part'; se esse arquivo já existir (download
+    interrompido), a transferência continua com um cabeçalho Range. Ao final, o tamanho e o
+    SHA-256 (quando informados) são verificados e o arquivo é movido com os.replace, de modo
+    que destino só existe quando está completo. Bytes, duração e vazão entram nas métricas
+    com o rótulo origem.
+    """
+    inicio = time.monotonic()
+    recebidos = 0
+    resultado = "erro"
+    try:
+        recebidos = _transferir(url, destino, headers, tamanho_esperado, sha256, stop_event, tamanho_bloco, origem)
+        resultado = "ok"
+        return destino
+    except DownloadInterrompido:
+        resultado = "interrompido"
+        raise
+    finally:
+        duracao = time.monotonic() - inicio
+        DURACAO_DOWNLOAD.observar(duracao, origem=origem, resultado=resultado)
+        if resultado == "ok" and recebidos and duracao > 0:
+            VAZAO_DOWNLOAD.observar(recebidos / duracao, origem=origem)
+
+
+def _transferir(url, destino, headers, tamanho_esperado, sha256, stop_event, tamanho_bloco, origem):
+    """Transferência de baixar_arquivo; retorna os bytes recebidos nesta chamada."""
+    recebidos = 0
+    parcial = f"{destino}.part"
+    ja_baixado = os.path.getsize(parcial) if os.path.exists(parcial) else 0
+    if tamanho_esperado is not None and ja_baixado > tamanho_esperado:
+        os.remove(parcial)
+        ja_baixado = 0
+
+    headers = dict(headers or {})
+    if ja_baixado:
+        headers["Range"] = f"bytes={ja_baixado}-"
+
+    with cliente.get(url, headers=headers, stream=True) as resposta:
+        if resposta.status_code == 416 and ja_baixado:
+            # O parcial já contém o arquivo inteiro: só falta verificar
+            modo = None
+        elif resposta.status_code == 206 and ja_baixado:
+            modo = "ab"
+        elif resposta.status_code == 200:
+            modo = "wb"  # Servidor ignorou o Range: recomeça do zero
+            ja_baixado = 0
+        else:
+            raise IOError(f"Falha ao baixar {url}. Código de status: {resposta.status_code}")
+
+        if modo:
+            with open(parcial, modo, buffering=tamanho_bloco) as f:
+                for bloco in resposta.iter_content(chunk_size=tamanho_bloco):
+                    if stop_event is not None and stop_event.is_set():
+                        raise DownloadInterrompido(url)
+                    f.write(bloco)
+                    recebidos += len(bloco)
+                    BYTES_BAIXADOS.inc(len(bloco), origem=origem)
+
+    _verificar(parcial, tamanho_esperado, sha256)
+    os.replace(parcial, destino)
+    return recebidos
+
+
+def baixar_em_paralelo(itens, max_paralelo=4, stop_event=None):
+    """
+    Baixa uma lista de itens {'url', 'destino', 'headers', 'tamanho_esperado', 'sha256'}
+    com no máximo max_paralelo downloads simultâneos. Propaga o primeiro erro encontrado.
+    """
+    if not itens:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_paralelo, len(itens)))) as executor:
+        futuros = [executor.submit(baixar_arquivo, stop_event=stop_event, **item) for item in itens]
+        return [futuro.result() for futuro in futuros]
+
+
+def arquivo_valido(caminho, tamanho_esperado=None):
+    """
+    Verificação rápida de um arquivo já existente (apenas pelo tamanho, quando conhecido).
+    """
+    if not os.path.exists(caminho):
+        return False
+    return tamanho_esperado is None or os.path.getsize(caminho) == tamanho_esperado
+
+
+def _verificar(caminho, tamanho_esperado, sha256):
+    nome = os.path.basename(caminho).removesuffix(".part")
+    tamanho = os.path.getsize(caminho)
+    if tamanho_esperado is not None and tamanho != tamanho_esperado:
+        os.remove(caminho)
+        raise FalhaVerificacao(f"{nome}: {tamanho} bytes, esperado {tamanho_esperado}.")
+    if sha256:
+        calculado = sha256_arquivo(caminho)
+        if calculado.lower() != sha256.lower():
+            os.remove(caminho)
+            raise FalhaVerificacao(f"{nome}: checksum SHA-256 não confere.")
+
+
+def sha256_arquivo(caminho, tamanho_bloco=TAMANHO_BLOCO):
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b""):
+            h.update(bloco)
+    return h.hexdigest()
@@ -1,28 +1,16 @@
 import os
-import matplotlib
-matplotlib.use('Agg')  # Define o backend não interativo
-import matplotlib.pyplot as plt
-import numpy as np
-import rasterio
+import pandas as pd
+
+from app.process import nucleo_analitico as na
+from app.process.mapa_png import salvar_mapa_aridez
+from app.process.raster_aridez import passada_aridez
 
 def PlotGrafico(data, name, _NomeLocal, _graficos):
     """
-    Plota um gráfico de aridez com base nos dados fornecidos.
+    Gera o PNG do mapa de aridez com base nos dados fornecidos (sem matplotlib; ver mapa_png).
     """
-    plt.title(f'{_NomeLocal}' + name)
-    plt.imshow(data, cmap='jet_r', vmin=0, vmax=1)
-    plt.colorbar(label='Aridez')
-    mascara = np.where(data < 0.2, 0, np.nan)
-    plt.imshow(mascara, cmap='gray', vmin=0, vmax=1, alpha=1)
-    branco = np.where(data == 1, 0, np.nan)
-    plt.imshow(branco, cmap='gray_r', vmin=0, vmax=1, alpha=1)
-    plt.axis('off')
-    
-    plt.legend([], [], frameon=False)
-    
     output_path = os.path.join(_graficos, f"mapaIA{name}.png")
-    plt.savefig(output_path, format="png")
-    return output_path
+    return salvar_mapa_aridez(data, f"{_NomeLocal}{name}", output_path)
 
 
 def gerar_dados_balanco_hidrico(df, nome_local):
@@ -93,50 +81,27 @@ def gerar_dados_precipitacao(series_precipitacao, ano_inicial, ano_final, nome_l
 
 def mostraGraficoDoAno(ano, _inDir):
     """
-    Mostra o gráfico de aridez para um ano específico.
-    
+    Retorna o raster ET/PET (float32, NaN sem dado) de um ano, ou None se o ano não foi baixado.
     """
+    aridez, _ = passada_aridez([ano], _inDir)
+    return aridez
 
-    # Caminho da subpasta do ano
-    subpasta_ano = os.path.normpath(os.path.join(_inDir, f"BALANCO_HIDRICO_{ano}"))
-    print(f"Verificando subpasta: {subpasta_ano}")
-    
-    if not os.path.exists(subpasta_ano):
-        print(f"Subpasta não encontrada: {subpasta_ano}")
-        return None  # Retorna None para indicar que o ano não foi processado
-
-    # Inicializa as variáveis para os arquivos
-    et_tif = None
-    pet_tif = None
-
-    # Procura os arquivos ET e PET na subpasta
-    for f in os.listdir(subpasta_ano):
-        if "_ET_500m" in f:
-            et_tif = os.path.join(subpasta_ano, f)
-        if "_PET_500m" in f:
-            pet_tif = os.path.join(subpasta_ano, f)
-
-    # Verifica se os arquivos foram encontrados
-    if not et_tif or not pet_tif:
-        print(f"Arquivos ET ou PET não encontrados na subpasta: {subpasta_ano}")
-        return None
-
-    # Abre os arquivos e calcula os dados de aridez
-    with rasterio.open(et_tif) as et:
-        et_data = et.read(1)
-    with rasterio.open(pet_tif) as pet:
-        pet_data = pet.read(1)
-
-    # Calcula o índice de aridez
-    arid_data = et_data / pet_data
-    return arid_data
-
-def calcular_indices_e_gerar_graficos(_balanco, _precipitacao_df, _ano_inicial, _ano_final, _graficos):
-    # Calcula os índices de aridez
-    _balanco["Indice de Aridez UNEP"] = _precipitacao_df["Precipitacao"] / _balanco["PET"]
-    _balanco["Aridez"] = _precipitacao_df["Precipitacao"] / _balanco["ET"]
-
-    # Retorna dados para gráfico de precipitação e evaporação
+def calcular_indices_aridez(_balanco, _precipitacao_df):
+    """
+    Retorna uma cópia do balanço com as colunas "Indice de Aridez UNEP" e "Aridez".
+    """
+    _balanco = _balanco.copy()
+    # Alinha a precipitação às linhas do balanço pelo índice, como na divisão entre Series
+    precipitacao = _precipitacao_df["Precipitacao"].reindex(_balanco.index)
+    indice_unep, aridez, _ = na.indices_aridez(precipitacao, _balanco["ET"], _balanco["PET"])
+    _balanco["Indice de Aridez UNEP"] = indice_unep
+    _balanco["Aridez"] = aridez
+    return _balanco
+
+def gerar_grafico_precipitacao_evaporacao(_balanco, _precipitacao_df):
+    """
+    Retorna dados para gráfico de precipitação e evaporação.
+    """
     dados_grafico = {
         "titulo": "Precipitação e Evaporação Anuais Médias",
         "tipo": "line", 
@@ -167,9 +132,8 @@ def gerar_grafico_indice_aridez_unep(_balanco, _ano_inicial, _ano_final, _grafic
     """
     Retorna dados do índice de aridez UNEP para criação de gráfico no frontend.
     """
-    z = np.polyfit(_balanco["Ano"], _balanco["Indice de Aridez UNEP"], 1)
-    p = np.poly1d(z)
-    
+    _, _, tendencia = na.tendencia_linear(_balanco["Ano"], _balanco["Indice de Aridez UNEP"])
+
     dados_grafico = {
         "titulo": "Índice de Aridez na Região Escolhida",
         "tipo": "line",
@@ -183,7 +147,7 @@ def gerar_grafico_indice_aridez_unep(_balanco, _ano_inicial, _ano_final, _grafic
                 },
                 {
                     "nome": "Tendência",
-                    "valores": p(_balanco["Ano"]).tolist(),
+                    "valores": tendencia.tolist(),
                     "cor": "#DC143C",
                     "tipo": "linha"
                 }
@@ -202,12 +166,8 @@ def calcular_e_gerar_grafico_rai(_balanco, _precipitacao_df, _graficos):
     Calcula o índice de anomalia de chuva (RAI) e retorna dados para o frontend.
     """
     # Cálculo do índice de anomalia de chuva (RAI)
-    media_precipitacao = _precipitacao_df["Precipitacao"].mean()
-    desvio_precipitacao = _precipitacao_df["Precipitacao"].std()
-
-    _balanco["RAI"] = _precipitacao_df["Precipitacao"].apply(
-        lambda precipitacao: (precipitacao - media_precipitacao) / desvio_precipitacao * 100
-    )
+    precipitacao = _precipitacao_df["Precipitacao"]
+    _balanco["RAI"] = pd.Series(na.rai(precipitacao), index=precipitacao.index)
 
     dados_grafico = {
         "titulo": "Rain Anomaly Index (RAI)",
@@ -8,7 +8,16 @@ def criar_mapa(latitude, longitude, _quadrado, _graficos):
     """
     Cria um mapa com base nas coordenadas e salva como arquivo HTML.
     """
-    data_Json = {
+    data_Json = montar_data_json(_quadrado)
+    salvar_mapa(latitude, longitude, _quadrado, _graficos)
+    return data_Json
+
+
+def montar_data_json(_quadrado):
+    """
+    Monta a FeatureCollection (GeoJSON) da área de interesse enviada ao AppEEARS.
+    """
+    return {
         "type": "FeatureCollection",
         "features": [
             {
@@ -30,6 +39,11 @@ def criar_mapa(latitude, longitude, _quadrado, _graficos):
         ]
     }
 
+
+def salvar_mapa(latitude, longitude, _quadrado, _graficos):
+    """
+    Salva o mapa (folium) da área de interesse como arquivo HTML.
+    """
     quadrado = Polygon(_quadrado)
     quadrado_gdf = gpd.GeoSeries(quadrado)
     geo_json_data = quadrado_gdf.to_json()
@@ -40,4 +54,4 @@ def criar_mapa(latitude, longitude, _quadrado, _graficos):
     mapa_path = os.path.join(_graficos, "map.html")
     mapa.save(mapa_path)
 
-    return data_Json
\ No newline at end of file
+    return mapa_path
\ No newline at end of file
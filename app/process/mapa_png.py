@@ -0,0 +1,122 @@
+import hashlib
+import os
+import shutil
+import struct
+import threading
+import zlib
+
+import numpy as np
+
+from app.globals import CACHE_DIR
+
+PASTA_CACHE_MAPAS = os.path.join(CACHE_DIR, "mapas")
+LADO_MINIMO = 400  # Rasters pequenos são ampliados (vizinho mais próximo) até ~este tamanho
+LARGURA_LEGENDA = 24
+MARGEM = 8
+
+# Segmentos do colormap "jet" do matplotlib: (posição, valor) de cada canal
+_SEGMENTOS_JET = (
+    ((0, 0), (0.35, 0), (0.66, 1), (0.89, 1), (1, 0.5)),
+    ((0, 0), (0.125, 0), (0.375, 1), (0.64, 1), (0.91, 0), (1, 0)),
+    ((0, 0.5), (0.11, 1), (0.34, 1), (0.65, 0), (1, 0)),
+)
+
+
+def _tabela_jet_r(n=256):
+    x = np.linspace(0, 1, n)
+    canais = [np.interp(x, *zip(*segmentos)) for segmentos in _SEGMENTOS_JET]
+    rgba = np.ones((n, 4))
+    rgba[:, :3] = np.stack(canais, axis=1)
+    return (rgba[::-1] * 255 + 0.5).astype(np.uint8)  # jet_r = jet invertido
+
+
+LUT_JET_R = _tabela_jet_r()
+PRETO = np.array([0, 0, 0, 255], dtype=np.uint8)
+BRANCO = np.array([255, 255, 255, 255], dtype=np.uint8)
+TRANSPARENTE = np.zeros(4, dtype=np.uint8)
+
+_lock = threading.Lock()
+
+
+def colorir_aridez(dados, vmin=0.0, vmax=1.0):
+    """
+    Converte o raster de aridez em RGBA (uint8) pela tabela jet_r, como o imshow anterior:
+    valores < 0.2 em preto, == 1 em branco e pixels sem dado (NaN) transparentes.
+    """
+    dados = np.asarray(dados, dtype=np.float32)
+    n = len(LUT_JET_R)
+    validos = np.isfinite(dados)
+    with np.errstate(invalid="ignore"):
+        indices = np.clip(((dados - vmin) / (vmax - vmin) * n).astype(np.int32, copy=False), 0, n - 1)
+    rgba = LUT_JET_R[np.where(validos, indices, 0)]
+    rgba[~validos] = TRANSPARENTE
+    rgba[validos & (dados < 0.2)] = PRETO
+    rgba[dados == 1] = BRANCO
+    return rgba
+
+
+def montar_imagem(dados):
+    """
+    Imagem final: raster colorido ampliado por um fator inteiro e a barra de cores (0 a 1) à direita.
+    """
+    rgba = colorir_aridez(dados)
+    fator = max(1, LADO_MINIMO // max(rgba.shape[:2]))
+    mapa = np.repeat(np.repeat(rgba, fator, axis=0), fator, axis=1)
+
+    altura, largura = mapa.shape[:2]
+    legenda = LUT_JET_R[np.linspace(len(LUT_JET_R) - 1, 0, altura).astype(np.int32)]
+    imagem = np.zeros((altura, largura + MARGEM + LARGURA_LEGENDA, 4), dtype=np.uint8)
+    imagem[:, :largura] = mapa
+    imagem[:, largura + MARGEM:] = legenda[:, None, :]
+    return imagem
+
+
+def codificar_png(rgba, textos=None):
+    """
+    Codifica um array RGBA (altura x largura x 4, uint8) em PNG, com blocos tEXt opcionais.
+    """
+    altura, largura = rgba.shape[:2]
+    # Cada linha recebe o byte de filtro 0 (sem filtro) antes dos pixels
+    linhas = np.zeros((altura, largura * 4 + 1), dtype=np.uint8)
+    linhas[:, 1:] = np.ascontiguousarray(rgba, dtype=np.uint8).reshape(altura, -1)
+
+    partes = [b"\x89PNG\r\n\x1a\n", _bloco(b"IHDR", struct.pack(">IIBBBBB", largura, altura, 8, 6, 0, 0, 0))]
+    for chave, valor in (textos or {}).items():
+        partes.append(_bloco(b"tEXt", chave.encode("latin-1") + b"\x00" + valor.encode("latin-1", "replace")))
+    partes.append(_bloco(b"IDAT", zlib.compress(linhas.tobytes(), 6)))
+    partes.append(_bloco(b"IEND", b""))
+    return b"".join(partes)
+
+
+def _bloco(tipo, dados):
+    return struct.pack(">I", len(dados)) + tipo + dados + struct.pack(">I", zlib.crc32(tipo + dados) & 0xFFFFFFFF)
+
+
+def salvar_mapa_aridez(dados, titulo, destino, pasta_cache=PASTA_CACHE_MAPAS):
+    """
+    Grava o PNG do mapa de aridez em destino. O PNG fica em cache pelo hash do raster e do
+    título: renderizar de novo o mesmo mapa apenas liga (ou copia) o arquivo já pronto.
+    """
+    dados = np.ascontiguousarray(dados, dtype=np.float32)
+    assinatura = hashlib.sha256()
+    assinatura.update(str(dados.shape).encode())
+    assinatura.update(dados.tobytes())
+    assinatura.update(titulo.encode("utf-8"))
+    em_cache = os.path.join(pasta_cache, f"{assinatura.hexdigest()}.png")
+
+    with _lock:
+        if not os.path.exists(em_cache):
+            os.makedirs(pasta_cache, exist_ok=True)
+            temporario = f"{em_cache}.{threading.get_ident()}.tmp"
+            with open(temporario, "wb") as f:
+                f.write(codificar_png(montar_imagem(dados), {"Title": titulo, "Software": "PaleBlueDot"}))
+            os.replace(temporario, em_cache)
+
+    os.makedirs(os.path.dirname(destino) or ".", exist_ok=True)
+    if os.path.exists(destino):
+        os.remove(destino)
+    try:
+        os.link(em_cache, destino)
+    except OSError:
+        shutil.copyfile(em_cache, destino)
+    return destino
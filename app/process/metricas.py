@@ -0,0 +1,404 @@
+"""
+Métricas do servidor no formato de texto do Prometheus (exportadas em /metrics).
+
+Contadores e histogramas são mantidos em memória em cada processo e gravados periodicamente
+em SQLite (como a fila de jobs); a exportação soma os valores de todos os workers do gunicorn,
+de modo que rate() e quantis valem para o servidor todo. Os valores de processos encerrados
+são acumulados, para os contadores não regredirem após reinícios.
+"""
+import atexit
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from app.globals import CACHE_DIR
+
+ARQUIVO_METRICAS = os.path.join(CACHE_DIR, "metricas.sqlite")
+INTERVALO_GRAVACAO = 5  # s entre as gravações dos valores deste processo
+EXPIRACAO_PROCESSO = 300  # s sem gravar para um processo ser considerado encerrado
+ENCERRADOS = "encerrados"  # instância que acumula os valores dos processos encerrados
+
+# Limites (s) dos histogramas de duração: de requisições rápidas a tarefas do AppEEARS de horas
+BUCKETS_REQUISICAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_ETAPA = (0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+BUCKETS_TAREFA = (10, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200, 14400)
+BUCKETS_VAZAO = (64e3, 256e3, 1e6, 4e6, 16e6, 64e6, 256e6)  # bytes/s
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS series (
+    instancia TEXT NOT NULL,
+    metrica TEXT NOT NULL,
+    rotulos TEXT NOT NULL,
+    valor TEXT NOT NULL,
+    PRIMARY KEY (instancia, metrica, rotulos)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS processos (
+    instancia TEXT PRIMARY KEY,
+    pid INTEGER NOT NULL,
+    atualizado_em REAL NOT NULL
+);
+"""
+
+
+class _Metrica:
+    tipo = None
+    por_processo = True  # valores mantidos em cada processo e somados na exportação
+
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    @property
+    def acumulativa(self):
+        """Contadores e histogramas de processos encerrados continuam somando; medidores não."""
+        return self.tipo != "gauge"
+
+    def _chave(self, valores):
+        if set(valores) != set(self.rotulos):
+            raise ValueError(f"Rótulos de {self.nome} devem ser {self.rotulos}, recebidos {tuple(valores)}")
+        return tuple(str(valores[r]) for r in self.rotulos)
+
+    def valores(self):
+        """Cópia das séries deste processo: {(valores dos rótulos): valor}."""
+        with self._lock:
+            return dict(self._series)
+
+    def _reiniciar(self):
+        # Após um fork: o processo filho começa sem os valores do pai
+        self._lock = threading.Lock()
+        self._series = {}
+
+    @staticmethod
+    def somar(a, b):
+        return a + b
+
+    def linhas(self, series):
+        yield f"# HELP {self.nome} {self.ajuda}"
+        yield f"# TYPE {self.nome} {self.tipo}"
+        for chave, valor in sorted(series.items()):
+            yield from self._linhas_serie(dict(zip(self.rotulos, chave)), valor)
+
+    def _linhas_serie(self, rotulos, valor):
+        yield f"{self.nome}{_rotulos(rotulos)} {_numero(valor)}"
+
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def inc(self, valor=1, **rotulos):
+        chave = self._chave(rotulos)
+        with self._lock:
+            self._series[chave] = self._series.get(chave, 0) + valor
+
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nome, ajuda, rotulos=(), buckets=BUCKETS_REQUISICAO):
+        super().__init__(nome, ajuda, rotulos)
+        self.buckets = tuple(sorted(buckets))
+
+    def observar(self, valor, **rotulos):
+        chave = self._chave(rotulos)
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = self._series[chave] = [[0] * len(self.buckets), 0, 0.0]  # contagens, total, soma
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[0][i] += 1
+            serie[1] += 1
+            serie[2] += valor
+
+    @contextmanager
+    def cronometrar(self, **rotulos):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, **rotulos)
+
+    def valores(self):
+        with self._lock:
+            return {chave: [list(contagens), total, soma] for chave, (contagens, total, soma) in self._series.items()}
+
+    @staticmethod
+    def somar(a, b):
+        if len(a[0]) != len(b[0]):
+            return b  # Buckets alterados entre versões: fica a série mais recente
+        return [[x + y for x, y in zip(a[0], b[0])], a[1] + b[1], a[2] + b[2]]
+
+    def _linhas_serie(self, rotulos, serie):
+        contagens, total, soma = serie
+        for limite, contagem in zip(self.buckets, contagens):
+            yield f"{self.nome}_bucket{_rotulos({**rotulos, 'le': _numero(limite)})} {contagem}"
+        yield f"{self.nome}_bucket{_rotulos({**rotulos, 'le': '+Inf'})} {total}"
+        yield f"{self.nome}_sum{_rotulos(rotulos)} {_numero(soma)}"
+        yield f"{self.nome}_count{_rotulos(rotulos)} {total}"
+
+
+class Medidor(_Metrica):
+    """
+    Valores lidos no momento da gravação/exportação: coletar() retorna {(valores dos rótulos): valor}.
+    Com tipo="counter", exporta contadores mantidos por outro módulo. Com por_processo=False,
+    coletar() já vale para o servidor todo (ex.: lido do banco da fila) e não é somado.
+    """
+
+    def __init__(self, nome, ajuda, coletar, rotulos=(), tipo="gauge", por_processo=True):
+        super().__init__(nome, ajuda, rotulos)
+        self.coletar = coletar
+        self.tipo = tipo
+        self.por_processo = por_processo
+
+    def valores(self):
+        try:
+            valores = self.coletar()
+        except Exception as e:
+            print(f"Erro ao coletar a métrica {self.nome}: {e}")
+            return {}
+        return {
+            tuple(str(v) for v in (chave if isinstance(chave, tuple) else (chave,))): valor
+            for chave, valor in valores.items()
+        }
+
+    def _reiniciar(self):
+        pass
+
+
+class RegistroMetricas:
+    """
+    Registro das métricas do servidor. Com caminho=None, exporta apenas os valores deste processo.
+    """
+
+    def __init__(self, caminho=ARQUIVO_METRICAS):
+        self.caminho = caminho
+        self.instancia = uuid.uuid4().hex
+        self._metricas = []
+        self._lock = threading.Lock()
+        self._iniciado = False
+        self._esquema_criado = False
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._apos_fork)
+
+    def _registrar(self, metrica):
+        with self._lock:
+            self._metricas.append(metrica)
+        return metrica
+
+    def contador(self, nome, ajuda, rotulos=()):
+        return self._registrar(Contador(nome, ajuda, rotulos))
+
+    def histograma(self, nome, ajuda, rotulos=(), buckets=BUCKETS_REQUISICAO):
+        return self._registrar(Histograma(nome, ajuda, rotulos, buckets))
+
+    def medidor(self, nome, ajuda, coletar, rotulos=(), tipo="gauge", por_processo=True):
+        return self._registrar(Medidor(nome, ajuda, coletar, rotulos, tipo, por_processo))
+
+    def iniciar(self):
+        """Inicia a gravação periódica dos valores deste processo (uma vez por processo)."""
+        with self._lock:
+            if self._iniciado or self.caminho is None:
+                return
+            self._iniciado = True
+        self._iniciar_gravacao()
+        atexit.register(self._gravar_silenciosamente)
+
+    def _iniciar_gravacao(self):
+        threading.Thread(target=self._gravar_periodicamente, name="metricas", daemon=True).start()
+
+    def gravar(self):
+        """Grava os valores deste processo e acumula os dos processos encerrados."""
+        agora = time.time()
+        linhas = [
+            (self.instancia, metrica.nome, json.dumps(chave), json.dumps(valor))
+            for metrica in self._por_processo()
+            for chave, valor in metrica.valores().items()
+        ]
+        conexao = self._conectar()
+        try:
+            with conexao:
+                conexao.execute("BEGIN IMMEDIATE")
+                # Substitui as séries deste processo (medidores podem ter perdido rótulos)
+                conexao.execute("DELETE FROM series WHERE instancia = ?", (self.instancia,))
+                conexao.executemany("INSERT INTO series (instancia, metrica, rotulos, valor) VALUES (?, ?, ?, ?)", linhas)
+                conexao.execute(
+                    "INSERT INTO processos (instancia, pid, atualizado_em) VALUES (?, ?, ?) "
+                    "ON CONFLICT(instancia) DO UPDATE SET atualizado_em = excluded.atualizado_em",
+                    (self.instancia, os.getpid(), agora),
+                )
+                self._acumular_encerrados(conexao, agora)
+        finally:
+            conexao.close()
+
+    def exportar(self):
+        """Todas as métricas no formato de texto do Prometheus (versão 0.0.4)."""
+        with self._lock:
+            metricas = list(self._metricas)
+        try:
+            series, pids = self._agregar()
+        except (OSError, sqlite3.Error) as e:
+            print(f"Erro ao agregar as métricas dos workers; exportando apenas as deste processo: {e}")
+            series = {metrica.nome: metrica.valores() for metrica in metricas if metrica.por_processo}
+            pids = [os.getpid()]
+        linhas = ["# HELP processo_info Processos (workers) cujas métricas foram somadas.", "# TYPE processo_info gauge"]
+        linhas += [f'processo_info{{pid="{pid}"}} 1' for pid in sorted(pids)]
+        for metrica in metricas:
+            linhas.extend(metrica.linhas(series.get(metrica.nome, {}) if metrica.por_processo else metrica.valores()))
+        return "\n".join(linhas) + "\n"
+
+    def _agregar(self):
+        if self.caminho is None:
+            return {m.nome: m.valores() for m in self._por_processo()}, [os.getpid()]
+        # Os valores deste processo entram atualizados; os dos demais, da última gravação
+        self.gravar()
+        por_nome = {m.nome: m for m in self._por_processo()}
+        conexao = self._conectar()
+        try:
+            linhas = conexao.execute("SELECT metrica, rotulos, valor FROM series").fetchall()
+            pids = [pid for (pid,) in conexao.execute("SELECT pid FROM processos")]
+        finally:
+            conexao.close()
+        series = {}
+        for nome, rotulos, valor in linhas:
+            metrica = por_nome.get(nome)
+            if metrica is None:
+                continue  # Métrica removida do código
+            _somar_serie(series.setdefault(nome, {}), metrica, tuple(json.loads(rotulos)), json.loads(valor))
+        return series, pids
+
+    def _acumular_encerrados(self, conexao, agora):
+        """
+        Processos sem gravar há EXPIRACAO_PROCESSO foram encerrados: seus contadores e histogramas
+        são somados à instância ENCERRADOS e seus medidores descartados.
+        """
+        encerrados = [i for (i,) in conexao.execute(
+            "SELECT instancia FROM processos WHERE atualizado_em < ?", (agora - EXPIRACAO_PROCESSO,)
+        )]
+        if not encerrados:
+            return
+        por_nome = {m.nome: m for m in self._por_processo() if m.acumulativa}
+        marcadores = ",".join("?" * (len(encerrados) + 1))
+        acumulado = {}
+        for instancia, nome, rotulos, valor in conexao.execute(
+            f"SELECT instancia, metrica, rotulos, valor FROM series WHERE instancia IN ({marcadores})",
+            (ENCERRADOS, *encerrados),
+        ):
+            if nome in por_nome:
+                _somar_serie(acumulado.setdefault(nome, {}), por_nome[nome], rotulos, json.loads(valor))
+        conexao.execute(f"DELETE FROM series WHERE instancia IN ({marcadores})", (ENCERRADOS, *encerrados))
+        conexao.executemany(
+            "INSERT INTO series (instancia, metrica, rotulos, valor) VALUES (?, ?, ?, ?)",
+            [(ENCERRADOS, nome, rotulos, json.dumps(valor))
+             for nome, series in acumulado.items() for rotulos, valor in series.items()],
+        )
+        conexao.execute(
+            f"DELETE FROM processos WHERE instancia IN ({','.join('?' * len(encerrados))})", encerrados
+        )
+
+    def _por_processo(self):
+        with self._lock:
+            return [metrica for metrica in self._metricas if metrica.por_processo]
+
+    def _gravar_periodicamente(self):
+        while True:
+            time.sleep(INTERVALO_GRAVACAO)
+            self._gravar_silenciosamente()
+
+    def _gravar_silenciosamente(self):
+        try:
+            self.gravar()
+        except Exception as e:
+            print(f"Erro ao gravar as métricas: {e}")
+
+    def _apos_fork(self):
+        # Workers do gunicorn criados por fork: instância e valores próprios, e a thread de
+        # gravação (que não sobrevive ao fork) é iniciada de novo
+        self.instancia = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        for metrica in self._metricas:
+            metrica._reiniciar()
+        if self._iniciado:
+            self._iniciar_gravacao()
+
+    def _conectar(self):
+        os.makedirs(os.path.dirname(self.caminho), exist_ok=True)
+        conexao = sqlite3.connect(self.caminho, timeout=30, isolation_level=None)
+        if not self._esquema_criado:
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.executescript(_ESQUEMA)
+            self._esquema_criado = True
+        return conexao
+
+
+def _somar_serie(series, metrica, chave, valor):
+    series[chave] = metrica.somar(series[chave], valor) if chave in series else valor
+
+
+def _rotulos(rotulos):
+    if not rotulos:
+        return ""
+    pares = ",".join(f'{nome}="{_escapar(valor)}"' for nome, valor in rotulos.items())
+    return f"{{{pares}}}"
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _numero(valor):
+    if isinstance(valor, float):
+        if math.isinf(valor):
+            return "+Inf" if valor > 0 else "-Inf"
+        return repr(valor)
+    return str(valor)
+
+
+metricas = RegistroMetricas()
+
+# Rotas do Flask
+DURACAO_REQUISICAO = metricas.histograma(
+    "http_requisicao_duracao_segundos", "Duração das requisições por rota do Flask.", ("rota", "metodo", "status")
+)
+
+# Etapas de processar_dados e processar_lote
+DURACAO_ETAPA = metricas.histograma(
+    "pipeline_etapa_duracao_segundos", "Duração de cada etapa da análise.", ("etapa",), BUCKETS_ETAPA
+)
+
+# Tarefas do AppEEARS
+ESPERA_TAREFA = metricas.histograma(
+    "appeears_espera_tarefa_segundos", "Tempo de aguardar_tarefa até o fim da tarefa no AppEEARS.", ("resultado",),
+    BUCKETS_TAREFA,
+)
+TEMPO_STATUS_TAREFA = metricas.histograma(
+    "appeears_tarefa_status_segundos", "Tempo observado das tarefas em cada status (pending, queued, processing).",
+    ("status",), BUCKETS_TAREFA,
+)
+
+# Downloads (bundles do AppEEARS e GeoTIFFs do CHIRPS)
+BYTES_BAIXADOS = metricas.contador("download_bytes_total", "Bytes baixados.", ("origem",))
+DURACAO_DOWNLOAD = metricas.histograma(
+    "download_duracao_segundos", "Duração de cada download.", ("origem", "resultado"), BUCKETS_ETAPA
+)
+VAZAO_DOWNLOAD = metricas.histograma(
+    "download_vazao_bytes_por_segundo", "Vazão de cada download concluído.", ("origem",), BUCKETS_VAZAO
+)
+
+# Reaproveitamento de arquivos: local (pasta do usuário), compartilhado (cache entre usuários) ou falta
+USO_CACHE_ARQUIVOS = metricas.contador(
+    "cache_arquivos_total", "Anos de CSV/TIF encontrados localmente, no cache compartilhado ou ausentes.",
+    ("tipo", "resultado"),
+)
+
+# Geocodificação
+DURACAO_NOMINATIM = metricas.histograma(
+    "nominatim_duracao_segundos", "Latência das consultas ao Nominatim.", ("resultado",)
+)
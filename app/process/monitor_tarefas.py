@@ -0,0 +1,186 @@
+import statistics
+import threading
+import time
+from collections import deque
+
+from app.process.cliente_appeears import cliente
+from app.process.metricas import TEMPO_STATUS_TAREFA
+
+STATUS_FINAIS = ("done", "error", "deleted", "expired")
+
+
+class _Espera:
+    """Registro de uma tarefa acompanhada pelo monitor."""
+
+    def __init__(self, task_id, api, head):
+        self.task_id = task_id
+        self.api = api
+        self.head = head
+        self.inicio = time.time()
+        self.status = None
+        self.status_desde = self.inicio
+        self.evento = threading.Event()
+
+
+class MonitorTarefas:
+    """
+    Serviço único, por processo, que acompanha as tarefas do AppEEARS.
+
+    Em vez de cada ano/usuário consultar GET task/{id} a cada 20 s, uma thread em segundo
+    plano consulta a listagem GET task uma vez por token para todas as tarefas pendentes,
+    ajusta o intervalo conforme a duração observada das tarefas e avisa quem está esperando
+    por meio de um threading.Event. O histórico de durações alimenta a estimativa de ETA.
+    """
+
+    def __init__(self, intervalo_min=5.0, intervalo_max=120.0, duracao_padrao=600.0, tamanho_historico=200):
+        self.intervalo_min = intervalo_min
+        self.intervalo_max = intervalo_max
+        self.duracao_padrao = duracao_padrao
+        self._historico = deque(maxlen=tamanho_historico)
+        self._pendentes = {}
+        self._lock = threading.Lock()
+        self._acordar = threading.Event()
+        self._thread = None
+        self._intervalo_atraso = intervalo_min
+
+    def registrar(self, task_id, api, head):
+        """
+        Passa a acompanhar a tarefa e retorna o registro cujo evento é sinalizado ao final.
+        """
+        with self._lock:
+            espera = self._pendentes.get(task_id)
+            if espera is None:
+                espera = _Espera(task_id, api, head)
+                self._pendentes[task_id] = espera
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._executar, name="monitor-tarefas-appeears", daemon=True)
+                self._thread.start()
+        self._acordar.set()
+        return espera
+
+    def remover(self, task_id):
+        """
+        Deixa de acompanhar a tarefa (por exemplo, quando ela é cancelada).
+        """
+        with self._lock:
+            espera = self._pendentes.pop(task_id, None)
+        if espera is not None:
+            espera.evento.set()
+
+    def contagem(self):
+        """Tarefas acompanhadas por status (None enquanto o primeiro status não foi consultado)."""
+        with self._lock:
+            status = [espera.status or "pending" for espera in self._pendentes.values()]
+        return {s: status.count(s) for s in set(status)}
+
+    def duracao_tipica(self):
+        """
+        Mediana das durações observadas das tarefas (ou a duração padrão, sem histórico).
+        """
+        with self._lock:
+            duracoes = list(self._historico)
+        return statistics.median(duracoes) if duracoes else self.duracao_padrao
+
+    def eta(self, head=None):
+        """
+        Estimativa, em segundos, para a conclusão das tarefas pendentes do token informado
+        (ou de todas as tarefas, se head for None). Retorna None se não há tarefas pendentes.
+        """
+        esperado = self.duracao_tipica()
+        agora = time.time()
+        token = _token(head) if head else None
+        with self._lock:
+            restantes = [
+                max(esperado - (agora - espera.inicio), 0.0)
+                for espera in self._pendentes.values()
+                if token is None or _token(espera.head) == token
+            ]
+        return max(restantes) if restantes else None
+
+    def _executar(self):
+        while True:
+            with self._lock:
+                if not self._pendentes:
+                    self._thread = None
+                    return
+                grupos = {}
+                for espera in self._pendentes.values():
+                    grupos.setdefault((espera.api, _token(espera.head)), []).append(espera)
+
+            concluidas = 0
+            for esperas in grupos.values():
+                concluidas += self._consultar_grupo(esperas)
+
+            if concluidas:
+                self._intervalo_atraso = self.intervalo_min
+            self._acordar.clear()
+            self._acordar.wait(self._proximo_intervalo())
+
+    def _consultar_grupo(self, esperas):
+        """
+        Consulta de uma só vez o status de todas as tarefas de um mesmo token.
+        """
+        api, head = esperas[0].api, esperas[0].head
+        try:
+            listagem = cliente.get(f"{api}task", headers=head).json()
+            status_por_id = {t.get("task_id"): t.get("status") for t in listagem if isinstance(t, dict)}
+        except Exception as e:
+            print(f"Erro ao consultar a listagem de tarefas do AppEEARS: {e}")
+            status_por_id = {}
+
+        concluidas = 0
+        for espera in esperas:
+            novo_status = status_por_id.get(espera.task_id)
+            if novo_status is None:
+                # Tarefa fora da listagem (paginação, por exemplo): consulta individual
+                try:
+                    novo_status = cliente.get(f"{api}task/{espera.task_id}", headers=head).json().get("status")
+                except Exception as e:
+                    print(f"Erro ao consultar a tarefa {espera.task_id}: {e}")
+                    continue
+
+            if novo_status != espera.status:
+                print(f"Tarefa {espera.task_id}: {novo_status}")
+                agora = time.time()
+                if espera.status is not None:
+                    # Tempo no status anterior (fila, processamento), com a resolução do polling
+                    TEMPO_STATUS_TAREFA.observar(agora - espera.status_desde, status=espera.status)
+                    espera.status_desde = agora
+            espera.status = novo_status
+
+            if novo_status in STATUS_FINAIS:
+                with self._lock:
+                    self._pendentes.pop(espera.task_id, None)
+                    if novo_status == "done":
+                        self._historico.append(time.time() - espera.inicio)
+                espera.evento.set()
+                concluidas += 1
+        return concluidas
+
+    def _proximo_intervalo(self):
+        """
+        Consulta com mais frequência quando uma tarefa está perto da duração típica e recua
+        exponencialmente quando as tarefas estão atrasadas em relação ao histórico.
+        """
+        esperado = self.duracao_tipica()
+        agora = time.time()
+        with self._lock:
+            restantes = [esperado - (agora - espera.inicio) for espera in self._pendentes.values()]
+        if not restantes:
+            return self.intervalo_min
+
+        menor = min(restantes)
+        if menor > 0:
+            intervalo = menor / 2
+        else:
+            intervalo = self._intervalo_atraso
+            self._intervalo_atraso = min(self._intervalo_atraso * 1.5, self.intervalo_max)
+        return min(max(intervalo, self.intervalo_min), self.intervalo_max)
+
+
+def _token(head):
+    return (head or {}).get("Authorization")
+
+
+# Instância única compartilhada por todas as análises do processo
+monitor_tarefas = MonitorTarefas()
@@ -0,0 +1,125 @@
+import numpy as np
+
+# Limites de classificação (mesmas regras das antigas cadeias de if/else)
+_CATEGORIAS = ['Úmida', 'Subhumid', 'Semiárida', 'Arid', 'Hyperarid']
+
+KC_CULTURAS = {
+    "milho": {"inicial": 0.4, "medio": 1.2, "final": 0.5},
+    "feijao": {"inicial": 0.3, "medio": 1.1, "final": 0.6},
+    "tomate": {"inicial": 0.6, "medio": 1.15, "final": 0.8},
+    "cana-de-acucar": {"inicial": 0.5, "medio": 1.25, "final": 0.9}
+}
+
+
+def indices_aridez(precipitacao, et, pet):
+    """
+    Índices por ano a partir de arrays (anos) ou (locais x anos):
+    UNEP = P / PET, Aridez = P / ET e Aridez2 = ET / PET.
+    """
+    precipitacao, et, pet = (np.asarray(x, dtype=np.float64) for x in (precipitacao, et, pet))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return precipitacao / pet, precipitacao / et, et / pet
+
+
+def tendencia_linear(anos, valores):
+    """
+    Ajuste linear por mínimos quadrados ao longo do último eixo (equivalente a np.polyfit
+    de grau 1 para cada local), ignorando anos sem dado (NaN).
+    Retorna (inclinacao, intercepto, valores_ajustados).
+    """
+    y = np.asarray(valores, dtype=np.float64)
+    x = np.broadcast_to(np.asarray(anos, dtype=np.float64), y.shape)
+    validos = np.isfinite(y)
+    n = validos.sum(axis=-1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_medio = np.where(validos, x, 0).sum(axis=-1, keepdims=True) / n
+        y_medio = np.where(validos, y, 0).sum(axis=-1, keepdims=True) / n
+        dx = np.where(validos, x - x_medio, 0)
+        dy = np.where(validos, y - y_medio, 0)
+        inclinacao = (dx * dy).sum(axis=-1, keepdims=True) / (dx ** 2).sum(axis=-1, keepdims=True)
+    intercepto = y_medio - inclinacao * x_medio
+    ajustados = inclinacao * x + intercepto
+    return inclinacao.squeeze(-1), intercepto.squeeze(-1), ajustados
+
+
+def rai(precipitacao):
+    """
+    Índice de anomalia de chuva por ano: (P - média) / desvio padrão amostral * 100.
+    """
+    p = np.asarray(precipitacao, dtype=np.float64)
+    media = np.nanmean(p, axis=-1, keepdims=True)
+    desvio = np.nanstd(p, axis=-1, ddof=1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (p - media) / desvio * 100
+
+
+def categoria_climatica(indices):
+    """
+    Categoria climática (UNEP) para um array de índices de aridez.
+    """
+    i = np.asarray(indices, dtype=np.float64)
+    return np.select([i >= 0.65, i >= 0.5, i >= 0.2, i >= 0.05], _CATEGORIAS[:4], default=_CATEGORIAS[4])
+
+
+def risco_desertificacao(indices):
+    """
+    Risco de desertificação para um array de índices de aridez.
+    """
+    ai = np.asarray(indices, dtype=np.float64)
+    return np.select(
+        [ai < 0.05, (ai >= 0.05) & (ai <= 0.20), (ai >= 0.21) & (ai <= 0.50), (ai >= 0.51) & (ai <= 0.65)],
+        ["Above Very High (AVH)", "Very High (VH)", "High (H)", "Moderate (M)"],
+        default="Low (L)",
+    )
+
+
+def deficits_cultura(pet, precipitacao, kc):
+    """
+    Déficit hídrico da cultura por ano: ETc - P, com ETc = PET * Kc.
+    """
+    return np.asarray(pet, dtype=np.float64) * kc - np.asarray(precipitacao, dtype=np.float64)
+
+
+def coeficiente_cultura(cultura, estagio):
+    cultura = cultura.lower()
+    estagio = estagio.lower()
+    if cultura not in KC_CULTURAS or estagio not in KC_CULTURAS[cultura]:
+        raise ValueError("Cultura ou estágio inválido")
+    return KC_CULTURAS[cultura][estagio]
+
+
+def analisar_lote(anos, et, pet, precipitacao, kc=None):
+    """
+    Análise completa de vários locais de uma vez. Os arrays de entrada têm forma
+    (locais x anos), ou (anos) para um único local; anos pode ser 1-D e é compartilhado.
+
+    Retorna um dicionário de arrays: índices por ano, tendência do índice UNEP, médias,
+    valor atual, categorias, risco de desertificação, RAI e (com kc) déficits da cultura.
+    """
+    ia_unep, aridez, aridez2 = indices_aridez(precipitacao, et, pet)
+    inclinacao, intercepto, ia_ajustado = tendencia_linear(anos, ia_unep)
+    ia_tendencia_media = ia_ajustado.mean(axis=-1)
+    ia_atual = ia_unep[..., -1]
+
+    resultado = {
+        "indice_aridez_unep": ia_unep,
+        "aridez": aridez,
+        "aridez2": aridez2,
+        "tendencia_inclinacao": inclinacao,
+        "tendencia_intercepto": intercepto,
+        "tendencia": ia_ajustado,
+        "indice_aridez_medio": np.nanmean(ia_unep, axis=-1),
+        "indice_aridez2_medio": np.nanmean(aridez2, axis=-1),
+        "indice_aridez_tendencia": ia_tendencia_media,
+        "indice_aridez_atual": ia_atual,
+        "categoria_atual": categoria_climatica(ia_atual),
+        "categoria_tendencia": categoria_climatica(ia_tendencia_media),
+        "risco_desertificacao": risco_desertificacao(ia_tendencia_media),
+        "rai": rai(precipitacao),
+    }
+    if kc is not None:
+        deficits = deficits_cultura(pet, precipitacao, kc)
+        resultado["deficits"] = deficits
+        resultado["deficit_medio"] = np.nanmean(deficits, axis=-1)
+        resultado["anos_irrigacao"] = (deficits > 0).sum(axis=-1)
+    return resultado
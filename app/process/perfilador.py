@@ -0,0 +1,332 @@
+"""
+Perfil opcional de um job de análise: amostragem das pilhas das threads do job, com o tempo
+separado entre CPU e espera (AppEEARS, downloads, locks), e pico de memória com tracemalloc.
+
+Para cada job perfilado são gravados, na pasta perfis/ do usuário:
+- {job_id}.speedscope.json: dois perfis (CPU e espera), abertos em https://www.speedscope.app;
+- {job_id}.relatorio.txt: tempos, funções mais custosas e pico de memória com as alocações.
+
+São amostradas a thread do job e as threads de pool criadas depois do seu início (etapas,
+tarefas do AppEEARS, downloads). Com outros jobs executando ao mesmo tempo, as threads de pool
+deles também entram no perfil; para um perfil limpo, use MAX_JOBS_SIMULTANEOS = 1.
+"""
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from functools import lru_cache
+
+from app.globals import INTERVALO_AMOSTRAGEM_PERFIL, PASTA_DADOS
+
+PASTA_PERFIS = "perfis"
+RAIZ_APP = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAX_LINHAS_RELATORIO = 15
+# Uma amostra conta como CPU quando a thread usou ao menos esta fração do intervalo em CPU
+FRACAO_CPU = 0.5
+# Sem relógio de CPU por thread, a função no topo da pilha indica se a thread está esperando
+FUNCOES_ESPERA = {"wait", "sleep", "acquire", "select", "poll", "recv", "recv_into", "readinto", "read", "accept", "_wait_for_tstate_lock"}
+
+_lock_memoria = threading.Lock()
+_perfis_com_memoria = 0
+_tracemalloc_nosso = False
+
+
+class PerfilJob:
+    """
+    Amostrador em uma thread própria. Use como context manager em volta da função do job
+    (na thread do job) e chame salvar() ao final.
+    """
+
+    def __init__(self, intervalo=INTERVALO_AMOSTRAGEM_PERFIL, rastrear_memoria=True):
+        self.intervalo = intervalo
+        self.rastrear_memoria = rastrear_memoria
+        self._cpu = Counter()  # pilha -> segundos-thread em CPU
+        self._espera = Counter()  # pilha -> segundos-thread em espera
+        self._cpu_threads = {}  # ident -> último tempo de CPU lido
+        self._cpu_total = 0.0
+        self._parar = threading.Event()
+        self._amostrador = None
+        self._thread_job = None
+        self._preexistentes = set()
+        self._inicio = self._duracao = None
+        self._pico_memoria = 0
+        self._memoria_capturada = 0
+        self._alocacoes_no_pico = []
+
+    def __enter__(self):
+        self._thread_job = threading.get_ident()
+        self._preexistentes = {t.ident for t in threading.enumerate()} - {self._thread_job}
+        if self.rastrear_memoria:
+            _iniciar_tracemalloc()
+        self._inicio = time.perf_counter()
+        self._amostrador = threading.Thread(target=self._amostrar, name="perfilador", daemon=True)
+        self._amostrador.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._amostrador.join()
+        self._duracao = time.perf_counter() - self._inicio
+        if self.rastrear_memoria:
+            self._capturar_pico(forcar=not self._alocacoes_no_pico)
+            _parar_tracemalloc()
+        return False
+
+    def _amostrar(self):
+        anterior = time.perf_counter()
+        proxima_memoria = anterior
+        while not self._parar.wait(self.intervalo):
+            agora = time.perf_counter()
+            dt, anterior = agora - anterior, agora
+            nomes = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if not self._monitorada(ident, nomes.get(ident, "")):
+                    continue
+                pilha = _pilha(frame)
+                if ident != self._thread_job and not any(_do_app(q) for q in pilha):
+                    continue  # Thread de pool ociosa, aguardando trabalho
+                (self._cpu if self._em_cpu(ident, dt, pilha) else self._espera)[pilha] += dt
+            if self.rastrear_memoria and agora >= proxima_memoria:
+                self._capturar_pico()
+                proxima_memoria = agora + 0.5
+
+    def _monitorada(self, ident, nome):
+        if ident == self._thread_job:
+            return True
+        return ident not in self._preexistentes and nome.startswith("ThreadPoolExecutor")
+
+    def _em_cpu(self, ident, dt, pilha):
+        cpu = _cpu_thread(ident)
+        anterior = self._cpu_threads.get(ident)
+        self._cpu_threads[ident] = cpu
+        if cpu is None or anterior is None:
+            return bool(pilha) and pilha[-1][1] not in FUNCOES_ESPERA
+        self._cpu_total += cpu - anterior
+        return cpu - anterior >= FRACAO_CPU * dt
+
+    def _capturar_pico(self, forcar=False):
+        """Guarda as maiores alocações sempre que a memória rastreada supera o pico anterior em 10%."""
+        if not tracemalloc.is_tracing():
+            return
+        atual, pico = tracemalloc.get_traced_memory()
+        self._pico_memoria = max(self._pico_memoria, pico)
+        if forcar or atual > 1.1 * self._memoria_capturada:
+            self._memoria_capturada = atual
+            snapshot = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, __file__), tracemalloc.Filter(False, tracemalloc.__file__),
+            ])
+            estatisticas = snapshot.statistics("lineno")
+            self._alocacoes_no_pico = [(str(e.traceback[0]), e.size, e.count) for e in estatisticas[:MAX_LINHAS_RELATORIO]]
+
+    # Saída
+
+    def salvar(self, pasta, nome):
+        """Grava o speedscope e o relatório; retorna os caminhos."""
+        os.makedirs(pasta, exist_ok=True)
+        speedscope = os.path.join(pasta, f"{nome}.speedscope.json")
+        relatorio = os.path.join(pasta, f"{nome}.relatorio.txt")
+        _gravar(speedscope, json.dumps(self.speedscope(nome)))
+        _gravar(relatorio, self.relatorio(nome))
+        return speedscope, relatorio
+
+    def speedscope(self, nome):
+        frames, indices = [], {}
+
+        def _indice(quadro):
+            if quadro not in indices:
+                indices[quadro] = len(frames)
+                arquivo, funcao, linha = quadro
+                frames.append({"name": funcao, "file": arquivo, "line": linha})
+            return indices[quadro]
+
+        perfis = []
+        for titulo, amostras in (("CPU", self._cpu), ("Espera (AppEEARS, downloads, locks)", self._espera)):
+            pilhas = list(amostras.items())
+            perfis.append({
+                "type": "sampled",
+                "name": titulo,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(peso for _, peso in pilhas),
+                "samples": [[_indice(q) for q in pilha] for pilha, _ in pilhas],
+                "weights": [peso for _, peso in pilhas],
+            })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"job {nome}",
+            "exporter": "app.process.perfilador",
+            "shared": {"frames": frames},
+            "profiles": perfis,
+        }
+
+    def relatorio(self, nome):
+        cpu_amostrado = sum(self._cpu.values())
+        espera = sum(self._espera.values())
+        linhas = [
+            f"Perfil do job {nome}",
+            "",
+            f"Tempo de parede:            {self._duracao:10.2f} s",
+            f"CPU (soma das threads):     {self._cpu_total or cpu_amostrado:10.2f} s",
+            f"Amostras em CPU:            {cpu_amostrado:10.2f} s-thread",
+            f"Amostras em espera:         {espera:10.2f} s-thread",
+            "",
+        ]
+        for titulo, amostras in (("CPU", self._cpu), ("espera", self._espera)):
+            linhas.append(f"Código do app com mais tempo em {titulo} (s-thread, inclui chamadas):")
+            linhas += _tabela(_por_funcao_do_app(amostras))
+            linhas.append(f"Funções no topo da pilha em {titulo} (s-thread):")
+            linhas += _tabela(_por_topo(amostras))
+
+        linhas += [
+            "Memória",
+            f"Pico rastreado (tracemalloc): {_mib(self._pico_memoria)}",
+            f"Pico do processo (RSS):       {_pico_rss()}",
+            "Maiores alocações próximas ao pico (GDAL e outras bibliotecas em C não são rastreadas):",
+        ]
+        linhas += [f"  {_kib(tamanho):>12}  {quantidade:8d} blocos  {origem}" for origem, tamanho, quantidade in self._alocacoes_no_pico]
+        return "\n".join(linhas) + "\n"
+
+
+def perfilado(funcao, pasta_dados=PASTA_DADOS):
+    """
+    Envolve a função de um job da fila (funcao(job, *args)) com o perfil, salvo na pasta
+    perfis/ do usuário mesmo quando o job falha.
+    """
+    def executar(job, *args):
+        perfil = PerfilJob()
+        try:
+            with perfil:
+                return funcao(job, *args)
+        finally:
+            try:
+                caminhos = perfil.salvar(os.path.join(pasta_dados, job.user_id, PASTA_PERFIS), job.id)
+                print(f"Perfil do job {job.id} salvo em {', '.join(caminhos)}")
+            except Exception as e:
+                print(f"Erro ao salvar o perfil do job {job.id}: {e}")
+
+    return executar
+
+
+def listar_perfis(pasta_dados=PASTA_DADOS):
+    """Perfis salvos de todos os usuários: [{user_id, job_id, arquivo, tamanho, modificado_em}]."""
+    perfis = []
+    if not os.path.isdir(pasta_dados):
+        return perfis
+    for user_id in sorted(os.listdir(pasta_dados)):
+        pasta = os.path.join(pasta_dados, user_id, PASTA_PERFIS)
+        if not os.path.isdir(pasta):
+            continue
+        for arquivo in sorted(os.listdir(pasta)):
+            if not arquivo.endswith((".speedscope.json", ".relatorio.txt")):
+                continue
+            info = os.stat(os.path.join(pasta, arquivo))
+            perfis.append({
+                "user_id": user_id,
+                "job_id": arquivo.split(".", 1)[0],
+                "arquivo": arquivo,
+                "tamanho": info.st_size,
+                "modificado_em": info.st_mtime,
+            })
+    return sorted(perfis, key=lambda p: p["modificado_em"], reverse=True)
+
+
+def _pilha(frame):
+    """Pilha da raiz para o topo como tuplas (arquivo, função, primeira linha)."""
+    pilha = []
+    while frame is not None:
+        codigo = frame.f_code
+        pilha.append((codigo.co_filename, getattr(codigo, "co_qualname", codigo.co_name), codigo.co_firstlineno))
+        frame = frame.f_back
+    pilha.reverse()
+    return tuple(pilha)
+
+
+def _cpu_thread(ident):
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(ident))
+    except (AttributeError, OSError, OverflowError):
+        return None
+
+
+def _por_funcao_do_app(amostras):
+    """Tempo inclusivo da chamada mais profunda do código do app em cada amostra."""
+    totais = Counter()
+    for pilha, peso in amostras.items():
+        do_app = [q for q in pilha if _do_app(q)]
+        if do_app:
+            totais[do_app[-1]] += peso
+    return totais
+
+
+def _do_app(quadro):
+    return _arquivo_do_app(quadro[0])
+
+
+@lru_cache(maxsize=4096)
+def _arquivo_do_app(arquivo):
+    return os.path.abspath(arquivo).startswith(RAIZ_APP)
+
+
+def _por_topo(amostras):
+    totais = Counter()
+    for pilha, peso in amostras.items():
+        if pilha:
+            totais[pilha[-1]] += peso
+    return totais
+
+
+def _tabela(totais):
+    linhas = [
+        f"  {peso:10.2f}  {funcao} ({os.path.relpath(arquivo) if os.path.isabs(arquivo) else arquivo}:{linha})"
+        for (arquivo, funcao, linha), peso in totais.most_common(MAX_LINHAS_RELATORIO)
+    ]
+    return (linhas or ["  (sem amostras)"]) + [""]
+
+
+def _pico_rss():
+    try:
+        import resource  # Só existe em sistemas POSIX
+    except ImportError:
+        return "indisponível"
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss vem em KiB no Linux e em bytes no macOS
+    return _mib(pico if sys.platform == "darwin" else pico * 1024)
+
+
+def _mib(tamanho):
+    return f"{tamanho / 2 ** 20:.1f} MiB"
+
+
+def _kib(tamanho):
+    return f"{tamanho / 1024:.1f} KiB"
+
+
+def _gravar(caminho, texto):
+    temporario = f"{caminho}.{threading.get_ident()}.tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        f.write(texto)
+    os.replace(temporario, caminho)
+
+
+def _iniciar_tracemalloc():
+    # O tracemalloc é global: fica ligado enquanto houver algum job perfilado em execução
+    global _perfis_com_memoria, _tracemalloc_nosso
+    with _lock_memoria:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracemalloc_nosso = True
+        else:
+            tracemalloc.reset_peak()
+        _perfis_com_memoria += 1
+
+
+def _parar_tracemalloc():
+    global _perfis_com_memoria, _tracemalloc_nosso
+    with _lock_memoria:
+        _perfis_com_memoria -= 1
+        if _perfis_com_memoria == 0 and _tracemalloc_nosso:
+            tracemalloc.stop()
+            _tracemalloc_nosso = False
@@ -0,0 +1,123 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from app.process.metricas import DURACAO_ETAPA
+
+
+class Etapa:
+    """
+    Etapa do processamento: uma função que recebe, como argumentos nomeados, os resultados
+    das etapas das quais depende.
+    """
+
+    def __init__(self, nome, funcao, dependencias=(), mensagem=None):
+        self.nome = nome
+        self.funcao = funcao
+        self.dependencias = tuple(dependencias)
+        self.mensagem = mensagem
+
+
+class Progresso:
+    """
+    Combina o andamento das etapas, ponderado pelo peso de cada uma, em um percentual geral
+    e uma estimativa de término, entregues a emitir(evento) como dicionários.
+    """
+
+    def __init__(self, pesos, emitir, eta_externa=None):
+        self.pesos = dict(pesos)
+        self.emitir = emitir
+        self.eta_externa = eta_externa
+        self._fracoes = {nome: 0.0 for nome in self.pesos}
+        self._inicio = time.monotonic()
+        self._lock = threading.Lock()
+
+    def atualizar(self, etapa, fracao, **extras):
+        with self._lock:
+            if etapa in self._fracoes:
+                self._fracoes[etapa] = max(self._fracoes[etapa], min(fracao, 1.0))
+            total = sum(self.pesos.values()) or 1
+            percentual = 100 * sum(self.pesos[n] * f for n, f in self._fracoes.items()) / total
+
+        decorrido = time.monotonic() - self._inicio
+        eta = decorrido * (100 - percentual) / percentual if percentual > 0 else None
+        if self.eta_externa is not None:
+            # Enquanto há tarefas no AppEEARS, a estimativa delas domina o tempo restante
+            externa = self.eta_externa()
+            if externa is not None:
+                eta = max(eta or 0, externa)
+        evento = {"etapa": etapa, "percentual": round(percentual, 1), "eta_segundos": round(eta) if eta is not None else None}
+        evento.update(extras)
+        self.emitir(evento)
+
+    def etapa(self, nome):
+        """Função (indice, total, ano) para as etapas que processam ano a ano."""
+        def _avancar(indice, total, ano=None):
+            self.atualizar(nome, indice / total if total else 1.0, ano=ano, indice_ano=indice, total_anos=total)
+        return _avancar
+
+
+def executar_etapas(etapas, stop_event, log=print, max_paralelo=None, progresso=None):
+    """
+    Executa um grafo de etapas: as independentes rodam em paralelo e cada etapa começa assim
+    que todas as suas dependências terminam, de modo que a latência total é a do caminho
+    crítico e não a soma das etapas.
+
+    Retorna (resultados, tempos), com o resultado e o tempo de parede (s) de cada etapa.
+    Um erro em qualquer etapa impede o início de novas etapas e é propagado ao final.
+    Se stop_event for sinalizado, nenhuma nova etapa é iniciada. Com progresso (Progresso),
+    o início e o fim de cada etapa são informados.
+    """
+    por_nome = {etapa.nome: etapa for etapa in etapas}
+    for etapa in etapas:
+        desconhecidas = [d for d in etapa.dependencias if d not in por_nome]
+        if desconhecidas:
+            raise ValueError(f"Etapa '{etapa.nome}' depende de etapas inexistentes: {desconhecidas}")
+
+    resultados, tempos = {}, {}
+    aguardando = list(etapas)
+    em_execucao = {}
+    erro = None
+
+    def _cronometrar(etapa, argumentos):
+        inicio = time.perf_counter()
+        try:
+            return etapa.funcao(**argumentos)
+        finally:
+            tempos[etapa.nome] = time.perf_counter() - inicio
+            DURACAO_ETAPA.observar(tempos[etapa.nome], etapa=etapa.nome)
+
+    with ThreadPoolExecutor(max_workers=max_paralelo or len(etapas) or 1) as executor:
+        while aguardando or em_execucao:
+            if erro is None and not stop_event.is_set():
+                prontas = [e for e in aguardando if all(d in resultados for d in e.dependencias)]
+                for etapa in prontas:
+                    aguardando.remove(etapa)
+                    if etapa.mensagem:
+                        log(etapa.mensagem)
+                    if progresso is not None:
+                        progresso.atualizar(etapa.nome, 0.0)
+                    argumentos = {d: resultados[d] for d in etapa.dependencias}
+                    em_execucao[executor.submit(_cronometrar, etapa, argumentos)] = etapa
+            else:
+                aguardando.clear()
+
+            if not em_execucao:
+                if aguardando:
+                    raise RuntimeError(f"Dependências circulares entre as etapas: {[e.nome for e in aguardando]}")
+                break
+
+            concluidos, _ = wait(em_execucao, return_when=FIRST_COMPLETED)
+            for futuro in concluidos:
+                etapa = em_execucao.pop(futuro)
+                try:
+                    resultados[etapa.nome] = futuro.result()
+                    if progresso is not None:
+                        progresso.atualizar(etapa.nome, 1.0)
+                except Exception as e:
+                    if erro is None:
+                        erro = e
+
+    if erro is not None:
+        raise erro
+    return resultados, tempos
@@ -0,0 +1,103 @@
+import os
+
+import numpy as np
+import pandas as pd
+import rasterio
+
+# MOD16A3GF (ET_500m / PET_500m): valores inteiros em 0,1 mm/ano; acima de 32700 são códigos de preenchimento
+ESCALA_MOD16 = 0.1
+MAXIMO_VALIDO_MOD16 = 32700
+
+
+def arquivos_et_pet(_localdataName, ano):
+    """
+    Caminhos (et_tif, pet_tif) do ano na pasta BALANCO_HIDRICO_{ano}, ou None se faltar algum.
+    """
+    subpasta_ano = os.path.normpath(os.path.join(_localdataName, f"BALANCO_HIDRICO_{ano}"))
+    if not os.path.isdir(subpasta_ano):
+        return None
+
+    et_tif = pet_tif = None
+    for f in os.listdir(subpasta_ano):
+        if "_ET_500m" in f:
+            et_tif = os.path.join(subpasta_ano, f)
+        if "_PET_500m" in f:
+            pet_tif = os.path.join(subpasta_ano, f)
+    if not et_tif or not pet_tif:
+        return None
+    return et_tif, pet_tif
+
+
+def grade_mod16(anos, _localdataName):
+    """
+    (crs, transform) do primeiro ano com rasters de ET/PET, para georreferenciar o raster médio.
+    """
+    for ano in anos:
+        arquivos = arquivos_et_pet(_localdataName, ano)
+        if arquivos is not None:
+            with rasterio.open(arquivos[0]) as src:
+                return src.crs, src.transform
+    return None
+
+
+def ler_banda_mod16(caminho):
+    """
+    Lê a banda em float32 com NaN nos pixels sem dado (nodata do arquivo e preenchimentos do MOD16).
+    """
+    with rasterio.open(caminho) as src:
+        dados = src.read(1, out_dtype=np.float32)
+        nodata = src.nodata
+    invalidos = ~np.isfinite(dados) | (dados < 0) | (dados > MAXIMO_VALIDO_MOD16)
+    if nodata is not None:
+        invalidos |= dados == nodata
+    dados[invalidos] = np.nan
+    return dados
+
+
+def passada_aridez(anos, _localdataName, stop_event=None, log=print):
+    """
+    Percorre os anos uma única vez, lendo ET e PET de cada ano uma só vez.
+
+    Acumula soma e contagem (float32, ignorando NaN) da razão ET/PET por pixel, de modo que a
+    memória não cresce com o número de anos, e calcula ao mesmo tempo as médias de ET e PET
+    da área em cada ano. Retorna (raster médio de ET/PET ou None, DataFrame Ano/ET/PET).
+    """
+    soma = contagem = None
+    medias = []
+    for ano in anos:
+        if stop_event is not None and stop_event.is_set():
+            break
+        arquivos = arquivos_et_pet(_localdataName, ano)
+        if arquivos is None:
+            log(f"Arquivos ET ou PET do ano {ano} não encontrados; ano ignorado no mapa de aridez.")
+            continue
+
+        et = ler_banda_mod16(arquivos[0])
+        pet = ler_banda_mod16(arquivos[1])
+        if et.shape != pet.shape or (soma is not None and et.shape != soma.shape):
+            log(f"Grade de ET/PET do ano {ano} diferente dos demais anos; ano ignorado no mapa de aridez.")
+            continue
+        if soma is None:
+            soma = np.zeros(et.shape, dtype=np.float32)
+            contagem = np.zeros(et.shape, dtype=np.uint16)
+
+        medias.append((ano, _media(et) * ESCALA_MOD16, _media(pet) * ESCALA_MOD16))
+
+        # Razão calculada sobre o próprio array de ET, sem cópias intermediárias
+        validos = np.isfinite(et) & np.isfinite(pet) & (pet > 0)
+        np.divide(et, pet, out=et, where=validos)
+        np.add(soma, et, out=soma, where=validos)
+        contagem += validos
+
+    medias_anuais = pd.DataFrame(medias, columns=["Ano", "ET", "PET"])
+    if soma is None or not contagem.any():
+        return None, medias_anuais
+
+    media = np.full(soma.shape, np.nan, dtype=np.float32)
+    np.divide(soma, contagem, out=media, where=contagem > 0)
+    return media, medias_anuais
+
+
+def _media(banda):
+    validos = np.isfinite(banda)
+    return float(banda[validos].mean(dtype=np.float64)) if validos.any() else float("nan")
@@ -0,0 +1,98 @@
+import os
+import sqlite3
+
+import pandas as pd
+
+ARQUIVO_TABELA = "resultados_anuais.sqlite"
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS anos (
+    ano INTEGER PRIMARY KEY,
+    et REAL,
+    pet REAL,
+    deficit REAL,
+    precipitacao REAL,
+    indice_aridez_unep REAL,
+    aridez REAL
+)
+"""
+
+
+def _conectar(_localdataName):
+    os.makedirs(_localdataName, exist_ok=True)
+    conexao = sqlite3.connect(os.path.join(_localdataName, ARQUIVO_TABELA), timeout=30)
+    conexao.execute(_ESQUEMA)
+    return conexao
+
+
+def ler_balanco(_localdataName, anos):
+    """
+    Retorna o DataFrame (Ano, ET, PET, Deficit) dos anos já calculados para o local.
+    """
+    return _ler(_localdataName, anos, "et, pet, deficit", "et IS NOT NULL AND pet IS NOT NULL",
+                ["Ano", "ET", "PET", "Deficit"])
+
+
+def ler_precipitacao(_localdataName, anos):
+    """
+    Retorna o DataFrame (Ano, Precipitacao) dos anos já calculados para o local.
+    """
+    return _ler(_localdataName, anos, "precipitacao", "precipitacao IS NOT NULL", ["Ano", "Precipitacao"])
+
+
+def salvar_balanco(_localdataName, _balanco):
+    """
+    Grava (ou atualiza) ET, PET e déficit por ano e recalcula os índices derivados.
+    """
+    linhas = [(int(a), float(et), float(pet), float(d))
+              for a, et, pet, d in _balanco[["Ano", "ET", "PET", "Deficit"]].itertuples(index=False)]
+    _gravar(_localdataName, """
+        INSERT INTO anos (ano, et, pet, deficit) VALUES (?, ?, ?, ?)
+        ON CONFLICT(ano) DO UPDATE SET et = excluded.et, pet = excluded.pet, deficit = excluded.deficit
+    """, linhas)
+
+
+def salvar_precipitacao(_localdataName, _precipitacao_df):
+    """
+    Grava (ou atualiza) a precipitação por ano e recalcula os índices derivados.
+    """
+    linhas = [(int(a), float(p)) for a, p in _precipitacao_df[["Ano", "Precipitacao"]].itertuples(index=False)]
+    _gravar(_localdataName, """
+        INSERT INTO anos (ano, precipitacao) VALUES (?, ?)
+        ON CONFLICT(ano) DO UPDATE SET precipitacao = excluded.precipitacao
+    """, linhas)
+
+
+def _ler(_localdataName, anos, colunas, condicao, nomes):
+    anos = [int(a) for a in anos]
+    if not anos:
+        return pd.DataFrame(columns=nomes)
+    conexao = _conectar(_localdataName)
+    try:
+        linhas = conexao.execute(
+            f"SELECT ano, {colunas} FROM anos WHERE {condicao} AND ano BETWEEN ? AND ? ORDER BY ano",
+            (min(anos), max(anos)),
+        ).fetchall()
+    finally:
+        conexao.close()
+    selecionados = set(anos)
+    df = pd.DataFrame([linha for linha in linhas if linha[0] in selecionados], columns=nomes)
+    df["Ano"] = df["Ano"].astype(int)
+    return df
+
+
+def _gravar(_localdataName, sql, linhas):
+    if not linhas:
+        return
+    conexao = _conectar(_localdataName)
+    try:
+        with conexao:  # transação única: todas as linhas ou nenhuma
+            conexao.executemany(sql, linhas)
+            conexao.execute("""
+                UPDATE anos SET
+                    indice_aridez_unep = CASE WHEN pet <> 0 THEN precipitacao / pet END,
+                    aridez = CASE WHEN et <> 0 THEN precipitacao / et END
+                WHERE precipitacao IS NOT NULL AND et IS NOT NULL AND pet IS NOT NULL
+            """)
+    finally:
+        conexao.close()
@@ -0,0 +1,162 @@
+"""
+Raster de aridez como Cloud-Optimized GeoTIFF e tiles XYZ (Web Mercator, 256x256 PNG) gerados
+sob demanda a partir dele, com cache em memória e em disco.
+"""
+import hashlib
+import math
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.io import MemoryFile
+from rasterio.shutil import copy as copiar_raster
+from rasterio.transform import from_bounds
+from rasterio.vrt import WarpedVRT
+from rasterio.warp import transform_bounds
+
+from app.globals import CACHE_DIR, MAX_TILES_EM_MEMORIA
+from app.process.mapa_png import codificar_png, colorir_aridez
+
+PASTA_CACHE_TILES = os.path.join(CACHE_DIR, "tiles")
+TAMANHO_TILE = 256
+ZOOM_MAXIMO = 18
+ORIGEM_MERCATOR = 20037508.342789244  # Metade da largura do mundo em EPSG:3857 (m)
+METROS_POR_GRAU = 111320.0
+
+
+def salvar_cog(dados, crs, transform, destino):
+    """
+    Grava o raster (float32, NaN sem dado) como COG: blocos de 256, DEFLATE e overviews
+    por média, gravado de forma atômica.
+    """
+    dados = np.asarray(dados, dtype=np.float32)
+    perfil = {
+        "driver": "GTiff", "dtype": "float32", "count": 1, "nodata": float("nan"),
+        "height": dados.shape[0], "width": dados.shape[1], "crs": crs, "transform": transform,
+    }
+    temporario = f"{destino}.{threading.get_ident()}.tmp"
+    with MemoryFile() as memoria:
+        with memoria.open(**perfil) as dst:
+            dst.write(dados, 1)
+        with memoria.open() as src:
+            copiar_raster(
+                src, temporario, driver="COG", BLOCKSIZE=TAMANHO_TILE, COMPRESS="DEFLATE", PREDICTOR="YES",
+                OVERVIEWS="AUTO", RESAMPLING="AVERAGE",
+            )
+    os.replace(temporario, destino)
+    return destino
+
+
+def limites_tile(z, x, y):
+    """Limites (xmin, ymin, xmax, ymax) do tile XYZ em EPSG:3857."""
+    tamanho = 2 * ORIGEM_MERCATOR / (1 << z)
+    xmin = -ORIGEM_MERCATOR + x * tamanho
+    ymax = ORIGEM_MERCATOR - y * tamanho
+    return xmin, ymax - tamanho, xmin + tamanho, ymax
+
+
+def tile_valido(z, x, y):
+    return 0 <= z <= ZOOM_MAXIMO and 0 <= x < (1 << z) and 0 <= y < (1 << z)
+
+
+def limites_geograficos(caminho_cog):
+    """Limites [oeste, sul, leste, norte] do raster em graus (para ajustar a vista do mapa)."""
+    with rasterio.open(caminho_cog) as src:
+        return list(transform_bounds(src.crs, "EPSG:4326", *src.bounds))
+
+
+def renderizar_tile(caminho_cog, z, x, y):
+    """PNG 256x256 do tile XYZ: o COG reprojetado para Web Mercator e colorido como o mapa de IA."""
+    limites = limites_tile(z, x, y)
+    with rasterio.open(caminho_cog) as src:
+        raster = transform_bounds(src.crs, "EPSG:3857", *src.bounds)
+        if limites[0] >= raster[2] or limites[2] <= raster[0] or limites[1] >= raster[3] or limites[3] <= raster[1]:
+            return _tile_vazio()
+        nivel = _nivel_overview(src, limites)
+
+    # Lê a menor overview que ainda tem resolução suficiente para o zoom pedido
+    with rasterio.open(caminho_cog, overview_level=nivel) as src:
+        with WarpedVRT(
+            src, crs="EPSG:3857", transform=from_bounds(*limites, TAMANHO_TILE, TAMANHO_TILE),
+            width=TAMANHO_TILE, height=TAMANHO_TILE, resampling=Resampling.nearest,
+            src_nodata=float("nan"), nodata=float("nan"), dtype="float32",
+        ) as vrt:
+            dados = vrt.read(1)
+    return codificar_png(colorir_aridez(dados))
+
+
+def _nivel_overview(src, limites):
+    fatores = src.overviews(1)
+    if not fatores:
+        return None
+    # Resolução aproximada do raster em metros, na latitude do seu centro
+    latitude = (src.bounds.bottom + src.bounds.top) / 2 if src.crs.is_geographic else 0
+    resolucao = src.res[0] * (METROS_POR_GRAU * math.cos(math.radians(latitude)) if src.crs.is_geographic else 1)
+    resolucao_tile = (limites[2] - limites[0]) / TAMANHO_TILE
+    nivel = None
+    for i, fator in enumerate(fatores):
+        if resolucao * fator <= resolucao_tile:
+            nivel = i
+    return nivel
+
+
+_vazio = None
+
+
+def _tile_vazio():
+    global _vazio
+    if _vazio is None:
+        _vazio = codificar_png(np.zeros((TAMANHO_TILE, TAMANHO_TILE, 4), dtype=np.uint8))
+    return _vazio
+
+
+class CacheTiles:
+    """
+    Tiles já renderizados: LRU em memória e cópia em disco, ambos indexados pela versão do
+    COG (caminho, mtime e tamanho), de modo que um novo raster invalida os tiles antigos.
+    """
+
+    def __init__(self, pasta=PASTA_CACHE_TILES, max_itens=MAX_TILES_EM_MEMORIA):
+        self.pasta = pasta
+        self.max_itens = max_itens
+        self._lock = threading.Lock()
+        self._itens = OrderedDict()  # (versao, z, x, y) -> PNG
+
+    def obter(self, caminho_cog, z, x, y):
+        """PNG do tile, ou None se o COG não existe."""
+        try:
+            info = os.stat(caminho_cog)
+        except FileNotFoundError:
+            return None
+        versao = hashlib.sha1(f"{os.path.abspath(caminho_cog)}:{info.st_mtime_ns}:{info.st_size}".encode()).hexdigest()
+        chave = (versao, z, x, y)
+
+        with self._lock:
+            png = self._itens.get(chave)
+            if png is not None:
+                self._itens.move_to_end(chave)
+                return png
+
+        arquivo = os.path.join(self.pasta, versao, str(z), str(x), f"{y}.png")
+        try:
+            with open(arquivo, "rb") as f:
+                png = f.read()
+        except FileNotFoundError:
+            png = renderizar_tile(caminho_cog, z, x, y)
+            os.makedirs(os.path.dirname(arquivo), exist_ok=True)
+            temporario = f"{arquivo}.{threading.get_ident()}.tmp"
+            with open(temporario, "wb") as f:
+                f.write(png)
+            os.replace(temporario, arquivo)
+
+        with self._lock:
+            self._itens[chave] = png
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+        return png
+
+
+cache_tiles = CacheTiles()
@@ -1,43 +1,28 @@
-import json
 import os
 import requests
 
-USER_DB_PATH = "app/static/usuarios_db.json"
+from app.globals import PASTA_DADOS
+
+from app.process.cache_produtos import liberar_referencias
+from app.process.cliente_appeears import cliente
+from app.process.geocodificador import geocodificador
+from app.process.validador_tokens import converter_expiracao, validador_tokens
 
 def get_location_name(latitude, longitude, log=print):
     """
-    Obtém o nome da localização a partir das coordenadas geográficas usando a API Nominatim.
+    Obtém o nome da localização a partir das coordenadas geográficas, pelo gazetteer local
+    de municípios (com o Nominatim como alternativa).
     
     Parâmetros:
         latitude (float): Latitude da localização.
         longitude (float): Longitude da localização.    
     
     Retorna:
-        str: Nome da localização ou mensagem de erro.
+        str: "Cidade - Estado", ou as coordenadas se o local não puder ser identificado.
     """
-    try:
-        url = f"https://nominatim.openstreetmap.org/reverse?format=json&lat={latitude}&lon={longitude}"
-        headers = {"User-Agent": "PaleBlueDot-DuneDivers/1.0 (seu-email@example.com)"}
-        response = requests.get(url, headers=headers)
-        if response.status_code != 200:
-            raise Exception(f"Erro na API: {response.status_code} - {response.text}")
-        data = response.json()
-        if "address" not in data:
-            raise Exception("Resposta da API não contém o campo 'address'")
-        
-        # Obtém os campos relevantes da resposta
-        address = data["address"]
-        cidade = address.get("city") or address.get("town") or address.get("village") or "Localização desconhecida"
-        estado = address.get("state", "")
-        log(f"Localização obtida: {cidade} - {estado}")
-        
-        return f"{cidade} - {estado}"
-    except requests.exceptions.RequestException as e:
-        return f"Erro de conexão com a API Nominatim: {e}"
-    except Exception as e:
-        return f"Erro ao processar a resposta da API Nominatim: {e}"
+    return geocodificador.nome_local(latitude, longitude, log=log)
     
-def excluir_dados_usuario(user_id, api, head, base_dir="app/static/data", log=print):
+def excluir_dados_usuario(user_id, api, head, base_dir=PASTA_DADOS, log=print):
     """
     Exclui todos os dados associados a um determinado user_id, incluindo a pasta de cache e tasks no AppEEARS.
 
@@ -58,6 +43,8 @@ def excluir_dados_usuario(user_id, api, head, base_dir="app/static/data", log=pr
     # Verifica se a pasta do usuário existe
     if os.path.exists(user_dir):
         log(f"Excluindo dados do usuário: {user_id}")
+        # Libera as referências ao cache compartilhado; entradas sem outros usuários são apagadas
+        liberar_referencias(user_dir)
         # Remove todos os arquivos e subdiretórios dentro da pasta do usuário
         for root, dirs, files in os.walk(user_dir, topdown=False):
             for file in files:
@@ -75,7 +62,7 @@ def excluir_tasks_appeears(api, head, log=print):
     """
     try:
         # Obter a lista de tasks
-        response = requests.get(f"{api}task", headers=head)
+        response = cliente.get(f"{api}task", headers=head)
         response.raise_for_status()
         tasks = response.json()
 
@@ -84,7 +71,7 @@ def excluir_tasks_appeears(api, head, log=print):
             task_id = task.get("task_id")
             task_name = task.get("task_name", "")  # Supondo que o nome da task esteja no campo 'task_name'
             if task_id and task_name.startswith("BALANCO_HIDRICO_"):
-                delete_response = requests.delete(f"{api}task/{task_id}", headers=head)
+                delete_response = cliente.delete(f"{api}task/{task_id}", headers=head)
                 delete_response.raise_for_status()
                 log(f"Task '{task_name}' excluída com sucesso.")
     except requests.RequestException as e:
@@ -97,32 +84,21 @@ def obter_token_autenticacao(api, _user, _password):
     Obtém o token de autenticação da API usando as credenciais fornecidas.
     """
     try:
-        token_response = requests.post(f'{api}login', auth=(_user, _password)).json()
+        token_response = cliente.post(f'{api}login', auth=(_user, _password)).json()
         token = token_response['token']
         head = {'Authorization': f'Bearer {token}'}
+        # A validade do token passa a ser conhecida: ele não precisa ser reconsultado até expirar
+        expiracao = converter_expiracao(token_response.get('expiration'))
+        if expiracao is not None:
+            validador_tokens.registrar_expiracao(head, expiracao)
         return head
     except Exception as e:
         print(f"Erro ao obter o token de autenticação: {e}")
         raise
 
-def verificar_token_valido(api,head):
+def verificar_token_valido(api, head, expira_em=None):
     """
-    Faz uma requisição de teste à API para verificar se o token é válido.
+    Verifica se o token é válido. O resultado fica em cache até a expiração do token
+    (validador_tokens), e verificações simultâneas do mesmo token viram uma só requisição.
     """
-    try:
-        response = requests.get(api, headers=head)
-        return response.status_code == 200  # Retorna True se o token for válido
-    except Exception:
-        return False
-
-def carregar_usuarios():
-    """Carrega o banco de dados de usuários do arquivo JSON."""
-    if os.path.exists(USER_DB_PATH):
-        with open(USER_DB_PATH, "r") as file:
-            return json.load(file)
-    return {}
-
-def salvar_usuarios(usuarios):
-    """Salva o banco de dados de usuários no arquivo JSON."""
-    with open(USER_DB_PATH, "w") as file:
-        json.dump(usuarios, file, indent=4)
+    return validador_tokens.valido(api, head, expira_em=expira_em)
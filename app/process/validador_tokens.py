@@ -0,0 +1,117 @@
+import threading
+import time
+from datetime import datetime
+
+from app.process.cliente_appeears import cliente
+
+# Validade assumida para tokens cuja expiração não é conhecida (ex.: sessões anteriores)
+TTL_SEM_EXPIRACAO = 300
+# Resultados negativos são guardados por pouco tempo, só para absorver rajadas de requisições
+TTL_INVALIDO = 10
+
+
+class ValidadorTokens:
+    """
+    Cache da validade dos tokens do AppEEARS.
+
+    Um token válido é aceito até a expiração informada no login (ou por TTL_SEM_EXPIRACAO,
+    se ela não é conhecida), sem nova consulta à API. Verificações simultâneas do mesmo
+    token são agrupadas em uma única requisição (single-flight).
+    """
+
+    def __init__(self, ttl_sem_expiracao=TTL_SEM_EXPIRACAO, ttl_invalido=TTL_INVALIDO):
+        self.ttl_sem_expiracao = ttl_sem_expiracao
+        self.ttl_invalido = ttl_invalido
+        self._lock = threading.Lock()
+        self._resultados = {}  # token -> (valido, valido_ate)
+        self._expiracoes = {}  # token -> expiração (epoch) informada no login
+        self._em_andamento = {}  # token -> threading.Event da verificação em curso
+        self.consultas = 0
+
+    def registrar_expiracao(self, head, expiracao):
+        """Guarda a expiração (epoch) de um token recém-emitido; ele já nasce válido."""
+        token = _token(head)
+        with self._lock:
+            self._expiracoes[token] = expiracao
+            self._resultados[token] = (True, expiracao)
+
+    def expiracao(self, head):
+        with self._lock:
+            return self._expiracoes.get(_token(head))
+
+    def descartar(self, head):
+        token = _token(head)
+        with self._lock:
+            self._resultados.pop(token, None)
+            self._expiracoes.pop(token, None)
+
+    def valido(self, api, head, expira_em=None):
+        """
+        Indica se o token é válido, consultando a API apenas quando o resultado em cache
+        venceu. expira_em (epoch), vindo da sessão, cobre tokens emitidos por outro worker.
+        """
+        token = _token(head)
+        if not token:
+            return False
+        agora = time.time()
+
+        while True:
+            with self._lock:
+                expiracao = self._expiracoes.get(token) or expira_em
+                if expiracao is not None and agora >= expiracao:
+                    self._resultados.pop(token, None)
+                    return False
+                resultado = self._resultados.get(token)
+                if resultado is not None and agora < resultado[1]:
+                    return resultado[0]
+
+                evento = self._em_andamento.get(token)
+                lider = evento is None
+                if lider:
+                    evento = self._em_andamento[token] = threading.Event()
+
+            if not lider:
+                # Outra requisição já está consultando este token: usa o resultado dela
+                evento.wait(30)
+                with self._lock:
+                    resultado = self._resultados.get(token)
+                if resultado is not None:
+                    return resultado[0]
+                continue
+
+            try:
+                valido = self._consultar(api, head)
+                with self._lock:
+                    if valido:
+                        valido_ate = expiracao if expiracao is not None else agora + self.ttl_sem_expiracao
+                    else:
+                        valido_ate = agora + self.ttl_invalido
+                    self._resultados[token] = (valido, valido_ate)
+                return valido
+            finally:
+                with self._lock:
+                    self._em_andamento.pop(token, None)
+                evento.set()
+
+    def _consultar(self, api, head):
+        self.consultas += 1
+        try:
+            response = cliente.get(api, headers=head)
+            return response.status_code == 200  # Retorna True se o token for válido
+        except Exception:
+            return False
+
+
+def converter_expiracao(texto):
+    """Converte a expiração do login do AppEEARS ("2024-06-17T18:27:52Z") em epoch."""
+    try:
+        return datetime.fromisoformat(texto.replace("Z", "+00:00")).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+
+def _token(head):
+    return (head or {}).get("Authorization")
+
+
+validador_tokens = ValidadorTokens()
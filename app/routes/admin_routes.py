@@ -0,0 +1,27 @@
+from functools import wraps
+
+from flask import Blueprint, jsonify, session, url_for
+
+from app.globals import ADMINISTRADORES, URL_DADOS
+from app.process.perfilador import listar_perfis
+
+admin_bp = Blueprint("admin", __name__, url_prefix="/admin")
+
+
+def exigir_administrador(rota):
+    @wraps(rota)
+    def verificar(*args, **kwargs):
+        if session.get("usuario") not in ADMINISTRADORES:
+            return jsonify({"error": "Acesso restrito a administradores"}), 403
+        return rota(*args, **kwargs)
+    return verificar
+
+
+@admin_bp.route("/perfis", methods=["GET"])
+@exigir_administrador
+def perfis():
+    """Perfis de jobs salvos (speedscope e relatório de cada job), do mais recente ao mais antigo."""
+    arquivos = listar_perfis()
+    for perfil in arquivos:
+        perfil["url"] = url_for("static", filename=f"{URL_DADOS}/{perfil['user_id']}/perfis/{perfil['arquivo']}")
+    return jsonify({"perfis": arquivos})
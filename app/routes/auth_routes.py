@@ -1,10 +1,37 @@
 from flask import Blueprint, request, jsonify, session, redirect, url_for
-from app.process.utils import obter_token_autenticacao, carregar_usuarios, salvar_usuarios
+from app.process.utils import obter_token_autenticacao, verificar_token_valido
+from app.process.banco_usuarios import banco_usuarios
+from app.process.validador_tokens import validador_tokens
 import hashlib
 from app.globals import api_url
 
 auth_bp = Blueprint("auth", __name__)
 
+# Rotas acessíveis sem sessão
+ROTAS_PUBLICAS = {"static", "main.index", "main.favicon", "main.acesso", "main.logout", "auth.autenticar", "auth.logout",
+                  "metricas.exportar_metricas"}
+# Páginas HTML: sem sessão válida redirecionam para o acesso; as demais rotas respondem 401 em JSON
+PAGINAS = {"main.formulario_inicial", "main.form", "main.app_principal", "main.simulacoes_irrigacao", "main.painel"}
+
+
+def verificar_autenticacao():
+    """
+    before_request comum a todos os blueprints: exige sessão com token válido do AppEEARS.
+    A validade vem do cache do validador_tokens, sem uma requisição à API por página.
+    """
+    if request.endpoint is None or request.endpoint in ROTAS_PUBLICAS:
+        return None
+
+    head = session.get("head")
+    if head is not None and verificar_token_valido(api_url, head, expira_em=session.get("token_expira_em")):
+        return None
+
+    mensagem = "Token expirado. Faça login novamente." if head is not None else "Usuário não autenticado"
+    session.pop("head", None)  # Remove o token inválido da sessão
+    if request.endpoint in PAGINAS:
+        return redirect(url_for("main.acesso"))  # Redireciona para a página de acesso
+    return jsonify({"error": mensagem, "redirect": url_for("main.acesso")}), 401
+
 @auth_bp.route("/autenticar", methods=["POST"])
 def autenticar():
     data = request.get_json()  # Recebe o JSON do frontend
@@ -18,22 +45,15 @@ def autenticar():
         # Gera o token de autenticação
         head = obter_token_autenticacao(api_url, usuario, senha)
 
-        # Carrega o banco de dados de usuários
-        usuarios = carregar_usuarios()
-
-        # Verifica se o usuário já possui um user_id
-        if usuario in usuarios:
-            user_id = usuarios[usuario]
-        else:
-            # Gera um ID único para o usuário usando um hash do nome de usuário
-            user_id = hashlib.md5(usuario.encode()).hexdigest()
-            usuarios[usuario] = user_id
-            salvar_usuarios(usuarios)  # Salva o novo usuário no banco de dados
+        # Busca o user_id do usuário ou o cadastra com um ID gerado pelo hash do nome de usuário
+        user_id = banco_usuarios.registrar(usuario, hashlib.md5(usuario.encode()).hexdigest())
 
         # Armazena o cabeçalho e o user_id na sessão
         session["head"] = head
         session["usuario"] = usuario
         session["user_id"] = user_id
+        # Expiração do token, para que qualquer worker aceite a sessão sem consultar a API
+        session["token_expira_em"] = validador_tokens.expiracao(head)
 
         return jsonify({"message": "Autenticação bem-sucedida", "redirect": url_for("main.form")})
     except Exception as e:
@@ -41,7 +61,10 @@ def autenticar():
 
 @auth_bp.route("/logout", methods=["POST"])
 def logout():
+    if "head" in session:
+        validador_tokens.descartar(session["head"])
     session.pop("head", None)  # Remove o token da sessão
+    session.pop("token_expira_em", None)
     session.pop("usuario", None)  # Remove o usuário da sessão
     session.pop("user_id", None)  # Remove o user_id da sessão
     return jsonify({"message": "Logout realizado com sucesso.", "redirect": url_for("main.acesso")})
\ No newline at end of file
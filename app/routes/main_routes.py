@@ -1,11 +1,14 @@
 import json
 import os
-from flask import Blueprint, render_template, session, redirect, url_for, jsonify, request
+from flask import Blueprint, Response, render_template, session, redirect, url_for, jsonify, request, make_response
 from flask import send_from_directory
 
 from app.dto.dtos import ResultadosDTO
-from app.process.utils import verificar_token_valido
-from app.globals import api_url
+from app.globals import PASTA_DADOS
+from app.process.cache_resultados import cache_resultados
+from app.process.file_operations import caminho_raster_aridez
+from app.process.tiles_aridez import cache_tiles, limites_geograficos, tile_valido
+from app.routes.respostas import condicional, responder_json
 main_bp = Blueprint("main", __name__)  # O nome do Blueprint deve ser "main"
 
 @main_bp.route("/", methods=["GET"])
@@ -25,7 +28,7 @@ def acesso():
     if "head" in session:
         # Verifica se já preencheu o formulário inicial
         user_id = session.get("user_id")
-        formulario_inicial_path = os.path.join("app/static/data", user_id, "formulario_inicial.json")
+        formulario_inicial_path = os.path.join(PASTA_DADOS, user_id, "formulario_inicial.json")
         
         if os.path.exists(formulario_inicial_path):
             # Redireciona para o formulário principal se já preencheu o inicial
@@ -37,19 +40,10 @@ def acesso():
 
 @main_bp.route("/formulario-inicial", methods=["GET"])
 def formulario_inicial():
-    if "head" not in session:
-        return redirect(url_for("main.acesso"))  # Redireciona para a página de acesso se não estiver autenticado
-
-    head = session["head"]
     user_id = session.get("user_id")
 
-    # Verifica se o token ainda é válido
-    if not verificar_token_valido(api_url, head):
-        session.pop("head", None)  # Remove o token inválido da sessão
-        return redirect(url_for("main.acesso"))  # Redireciona para a página de acesso
-
     # Verifica se já preencheu o formulário inicial
-    user_folder = os.path.join("app/static/data", user_id)
+    user_folder = os.path.join(PASTA_DADOS, user_id)
     formulario_inicial_path = os.path.join(user_folder, "formulario_inicial.json")
     
     if os.path.exists(formulario_inicial_path):
@@ -60,9 +54,6 @@ def formulario_inicial():
 
 @main_bp.route("/salvar-formulario-inicial", methods=["POST"])
 def salvar_formulario_inicial():
-    if "head" not in session:
-        return jsonify({"erro": "Usuário não autenticado"}), 401
-
     try:
         dados = request.get_json()
         user_id = session.get("user_id")
@@ -71,7 +62,7 @@ def salvar_formulario_inicial():
             return jsonify({"erro": "ID de usuário não encontrado"}), 400
 
         # Criar pasta do usuário se não existir
-        user_folder = os.path.join("app/static/data", user_id)
+        user_folder = os.path.join(PASTA_DADOS, user_id)
         os.makedirs(user_folder, exist_ok=True)
 
         # Salvar o formulário inicial
@@ -98,20 +89,11 @@ def salvar_formulario_inicial():
 
 @main_bp.route("/form", methods=["GET"])
 def form():
-    if "head" not in session:
-        return redirect(url_for("main.acesso"))  # Redireciona para a página de acesso se não estiver autenticado
-
-    head = session["head"]
     usuario = session["usuario"]
     user_id = session.get("user_id")
 
-    # Verifica se o token ainda é válido
-    if not verificar_token_valido(api_url, head):
-        session.pop("head", None)  # Remove o token inválido da sessão
-        return redirect(url_for("main.acesso"))  # Redireciona para a página de acesso
-
     # Verifica se preencheu o formulário inicial
-    user_folder = os.path.join("app/static/data", user_id)
+    user_folder = os.path.join(PASTA_DADOS, user_id)
     formulario_inicial_path = os.path.join(user_folder, "formulario_inicial.json")
     
     if not os.path.exists(formulario_inicial_path):
@@ -130,20 +112,11 @@ def form():
 
 @main_bp.route("/app", methods=["GET"])
 def app_principal():
-    if "head" not in session:
-        return redirect(url_for("main.acesso"))  # Redireciona para a página de acesso se não estiver autenticado
-
-    head = session["head"]
     usuario = session["usuario"]
     user_id = session.get("user_id")
 
-    # Verifica se o token ainda é válido
-    if not verificar_token_valido(api_url, head):
-        session.pop("head", None)  # Remove o token inválido da sessão
-        return redirect(url_for("main.acesso"))  # Redireciona para a página de acesso
-
     # Verifica se preencheu o formulário inicial
-    user_folder = os.path.join("app/static/data", user_id)
+    user_folder = os.path.join(PASTA_DADOS, user_id)
     formulario_inicial_path = os.path.join(user_folder, "formulario_inicial.json")
     
     if not os.path.exists(formulario_inicial_path):
@@ -154,20 +127,11 @@ def app_principal():
 
 @main_bp.route("/simulacoes-irrigacao", methods=["GET"])
 def simulacoes_irrigacao():
-    if "head" not in session:
-        return redirect(url_for("main.acesso"))  # Redireciona para a página de acesso se não estiver autenticado
-
-    head = session["head"]
     usuario = session["usuario"]
     user_id = session.get("user_id")
 
-    # Verifica se o token ainda é válido
-    if not verificar_token_valido(api_url, head):
-        session.pop("head", None)  # Remove o token inválido da sessão
-        return redirect(url_for("main.acesso"))  # Redireciona para a página de acesso
-
     # Verifica se preencheu o formulário inicial
-    user_folder = os.path.join("app/static/data", user_id)
+    user_folder = os.path.join(PASTA_DADOS, user_id)
     formulario_inicial_path = os.path.join(user_folder, "formulario_inicial.json")
     
     if not os.path.exists(formulario_inicial_path):
@@ -178,12 +142,9 @@ def simulacoes_irrigacao():
 
 @main_bp.route("/verificar-dados-analise", methods=["GET"])
 def verificar_dados_analise():
-    if "head" not in session:
-        return jsonify({"erro": "Usuário não autenticado"}), 401
-
     try:
         user_id = session.get("user_id")
-        user_folder = os.path.join("app/static/data", user_id)
+        user_folder = os.path.join(PASTA_DADOS, user_id)
         resultados_path = os.path.join(user_folder, f"{user_id}_resultados.json")
 
         tem_dados = os.path.exists(resultados_path)
@@ -199,20 +160,16 @@ def verificar_dados_analise():
 
 @main_bp.route("/api/dados-analise", methods=["GET"])
 def api_dados_analise():
-    if "head" not in session:
-        return jsonify({"erro": "Usuário não autenticado"}), 401
-
     try:
         user_id = session.get("user_id")
-        user_folder = os.path.join("app/static/data", user_id)
+        user_folder = os.path.join(PASTA_DADOS, user_id)
         resultados_path = os.path.join(user_folder, f"{user_id}_resultados.json")
 
-        if not os.path.exists(resultados_path):
+        resultados = cache_resultados.ler(resultados_path)
+        if resultados is None:
             return jsonify({"tem_dados": False}), 404
+        resultados_data = resultados.dados
 
-        with open(resultados_path, "r") as f:
-            resultados_data = json.load(f)
-            
         # Processar dados para a API
         # Preparar dados do gráfico de precipitação consistentes com o painel
         grafico_precipitacao = resultados_data.get("dados_grafico_precipitacao")
@@ -245,41 +202,71 @@ def api_dados_analise():
             "indices": resultados_data.get("indices_e_classificacoes", []),
             "recomendacoes": resultados_data.get("recomendacoes", []),
             "mapa_IA": resultados_data.get("mapa_IA", None),  # Caminho do mapa
+            **_camada_aridez(resultados_data),  # Tiles XYZ e COG do mapa, quando disponíveis
             "grafico_precipitacao": grafico_precipitacao
         }
         
-        return jsonify(dados_resumo)
+        return responder_json(dados_resumo, resultados)
 
     except Exception as e:
         print(f"Erro ao carregar dados da análise: {e}")
         return jsonify({"erro": "Erro interno do servidor"}), 500
 
+def _raster_aridez(resultados_data):
+    """Caminho do COG de aridez da análise (ao lado do PNG do mapa IA), ou None se não existe."""
+    mapa_IA = resultados_data.get("mapa_IA")
+    if not mapa_IA:
+        return None
+    caminho = caminho_raster_aridez(
+        os.path.join("app", "static", os.path.dirname(mapa_IA)),
+        resultados_data.get("ano_inicial"), resultados_data.get("ano_final"),
+    )
+    return caminho if os.path.exists(caminho) else None
+
+def _camada_aridez(resultados_data):
+    caminho_cog = _raster_aridez(resultados_data)
+    if caminho_cog is None:
+        return {}
+    return {
+        "mapa_IA_tiles": "/tiles/aridez/{z}/{x}/{y}.png",
+        "mapa_IA_cog": url_for("static", filename=os.path.relpath(caminho_cog, os.path.join("app", "static")).replace("\\", "/")),
+        "limites_IA": limites_geograficos(caminho_cog),  # [oeste, sul, leste, norte]
+    }
+
+@main_bp.route("/tiles/aridez/<int:z>/<int:x>/<int:y>.png", methods=["GET"])
+def tile_aridez(z, x, y):
+    """Tile XYZ (PNG 256x256, Web Mercator) do mapa de aridez da última análise do usuário."""
+    user_id = session.get("user_id")
+    resultados_path = os.path.join(PASTA_DADOS, user_id, f"{user_id}_resultados.json")
+    resultados = cache_resultados.ler(resultados_path)
+    caminho_cog = _raster_aridez(resultados.dados) if resultados is not None else None
+    png = cache_tiles.obter(caminho_cog, z, x, y) if caminho_cog and tile_valido(z, x, y) else None
+    if png is None:
+        return jsonify({"erro": "Tile não encontrado"}), 404
+    return condicional(Response(png, mimetype="image/png"), resultados)
+
 @main_bp.route("/api/dados-grafico-precipitacao", methods=["GET"])
 def api_dados_grafico_precipitacao():
-    if "head" not in session:
-        return jsonify({"erro": "Usuário não autenticado"}), 401
-
     try:
         user_id = session.get("user_id")
-        user_folder = os.path.join("app/static/data", user_id)
+        user_folder = os.path.join(PASTA_DADOS, user_id)
         resultados_path = os.path.join(user_folder, f"{user_id}_resultados.json")
 
-        if not os.path.exists(resultados_path):
+        resultados = cache_resultados.ler(resultados_path)
+        if resultados is None:
             return jsonify({"erro": "Dados de análise não encontrados"}), 404
+        resultados_data = resultados.dados
 
-        with open(resultados_path, "r") as f:
-            resultados_data = json.load(f)
-        
         # Extrair dados do gráfico de precipitação
         dados_grafico = resultados_data.get("dados_grafico_precipitacao", {})
         
         if dados_grafico:
-            return jsonify({
+            return responder_json({
                 "titulo": dados_grafico.get("titulo", "Precipitação Anual"),
                 "anos": dados_grafico.get("anos", []),
                 "valores": dados_grafico.get("valores", []),
                 "unidade": dados_grafico.get("unidade", "mm")
-            })
+            }, resultados)
         else:
             return jsonify({"erro": "Dados de gráfico não disponíveis"}), 404
 
@@ -289,65 +276,57 @@ def api_dados_grafico_precipitacao():
 
 @main_bp.route("/painel", methods=["GET"])
 def painel():
-    if "head" not in session:
-        return redirect(url_for("main.acesso"))  # Redireciona para a página de acesso se não estiver autenticado
-
-    head = session["head"]
     user_id = session.get("user_id")
 
-    # Verifica se o token ainda é válido
-    if not verificar_token_valido(api_url, head):
-        session.pop("head", None)  # Remove o token inválido da sessão
-        return redirect(url_for("main.acesso"))  # Redireciona para a página de acesso
-
     # Caminho para os resultados salvos
-    user_folder = os.path.join("app/static/data", user_id)
+    user_folder = os.path.join(PASTA_DADOS, user_id)
     resultados_path = os.path.join(user_folder, f"{user_id}_resultados.json")    
     
-    # Tenta carregar os resultados do disco
-    if os.path.exists(resultados_path):
-        try:
-            with open(resultados_path, "r") as f:
-                resultados_data = json.load(f)
-                  # Mapear campos antigos para os novos se necessário (compatibilidade retroativa)
-                campos_mapeamento = {
-                    'grafico_precipitacao': 'dados_grafico_precipitacao',
-                    'grafico_precipitacao_vs_evaporacao': 'dados_grafico_precipitacao_vs_evaporacao',
-                    'grafico_balanco_hidrico': 'dados_grafico_balanco_hidrico',
-                    'grafico_rai': 'dados_grafico_rai',
-                    'grafico_aridez': 'dados_grafico_aridez'
-                }
-                
-                # Atualizar os nomes dos campos se necessário
-                for campo_antigo, campo_novo in campos_mapeamento.items():
-                    if campo_antigo in resultados_data and campo_novo not in resultados_data:
-                        valor = resultados_data.pop(campo_antigo)
-                        # Se o valor é uma string (caminho de arquivo), substitui por None para indicar dados indisponíveis
-                        if isinstance(valor, str):
-                            print(f"Convertendo campo {campo_antigo} de caminho de arquivo para dados estruturados (será substituído por dados de exemplo)")
-                            resultados_data[campo_novo] = None  # Será tratado no frontend
-                        else:
-                            resultados_data[campo_novo] = valor
-                
-                resultados = ResultadosDTO(**resultados_data)  # Reconstrói o DTO a partir do JSON
-        except Exception as e:
-            print(f"Erro ao carregar resultados do disco: {e}")
-            return render_template("error.html", mensagem="Erro ao carregar os resultados.")
-    else:
+    # Tenta carregar os resultados (do cache, se o arquivo não mudou)
+    try:
+        arquivo = cache_resultados.ler(resultados_path)
+    except Exception as e:
+        print(f"Erro ao carregar resultados do disco: {e}")
+        return render_template("error.html", mensagem="Erro ao carregar os resultados.")
+    if arquivo is None:
         # Se não há resultados, redireciona para o app principal
         return redirect(url_for("main.app_principal"))
 
-    # Passa os resultados para o template
-    return render_template("painel.html", resultados=resultados)
+    try:
+        resultados_data = dict(arquivo.dados)  # Cópia: o dicionário em cache é compartilhado
+        # Mapear campos antigos para os novos se necessário (compatibilidade retroativa)
+        campos_mapeamento = {
+            'grafico_precipitacao': 'dados_grafico_precipitacao',
+            'grafico_precipitacao_vs_evaporacao': 'dados_grafico_precipitacao_vs_evaporacao',
+            'grafico_balanco_hidrico': 'dados_grafico_balanco_hidrico',
+            'grafico_rai': 'dados_grafico_rai',
+            'grafico_aridez': 'dados_grafico_aridez'
+        }
+        
+        # Atualizar os nomes dos campos se necessário
+        for campo_antigo, campo_novo in campos_mapeamento.items():
+            if campo_antigo in resultados_data and campo_novo not in resultados_data:
+                valor = resultados_data.pop(campo_antigo)
+                # Se o valor é uma string (caminho de arquivo), substitui por None para indicar dados indisponíveis
+                if isinstance(valor, str):
+                    print(f"Convertendo campo {campo_antigo} de caminho de arquivo para dados estruturados (será substituído por dados de exemplo)")
+                    resultados_data[campo_novo] = None  # Será tratado no frontend
+                else:
+                    resultados_data[campo_novo] = valor
+        
+        resultados = ResultadosDTO(**resultados_data)  # Reconstrói o DTO a partir do JSON
+    except Exception as e:
+        print(f"Erro ao carregar resultados do disco: {e}")
+        return render_template("error.html", mensagem="Erro ao carregar os resultados.")
+
+    # Passa os resultados para o template (304 se o navegador já tem esta versão)
+    return condicional(make_response(render_template("painel.html", resultados=resultados)), arquivo)
 
 @main_bp.route("/api/dados-formulario-inicial", methods=["GET"])
 def api_dados_formulario_inicial():
-    if "head" not in session:
-        return jsonify({"erro": "Usuário não autenticado"}), 401
-
     try:
         user_id = session.get("user_id")
-        user_folder = os.path.join("app/static/data", user_id)
+        user_folder = os.path.join(PASTA_DADOS, user_id)
         formulario_inicial_path = os.path.join(user_folder, "formulario_inicial.json")
 
         if not os.path.exists(formulario_inicial_path):
@@ -389,20 +368,16 @@ def api_dados_formulario_inicial():
 @main_bp.route("/api/dados-climaticos", methods=["GET"])
 def api_dados_climaticos():
     """Retorna os dados climáticos para cálculo de irrigação"""
-    if "head" not in session:
-        return jsonify({"erro": "Usuário não autenticado"}), 401
-
     try:
         user_id = session.get("user_id")
-        user_folder = os.path.join("app/static/data", user_id)
+        user_folder = os.path.join(PASTA_DADOS, user_id)
         resultados_path = os.path.join(user_folder, f"{user_id}_resultados.json")
         
-        if not os.path.exists(resultados_path):
+        # Carrega os dados de resultados (do cache, se o arquivo não mudou)
+        resultados = cache_resultados.ler(resultados_path)
+        if resultados is None:
             return jsonify({"erro": "Dados climáticos não encontrados"}), 404
-        
-        # Carrega os dados de resultados
-        with open(resultados_path, "r", encoding="utf-8") as f:
-            dados_resultados = json.load(f)
+        dados_resultados = resultados.dados
         
         # Extrai os dados climáticos necessários
         dados_climaticos = {
@@ -410,7 +385,7 @@ def api_dados_climaticos():
             "dados_grafico_precipitacao": dados_resultados.get("dados_grafico_precipitacao", {})
         }
         
-        return jsonify(dados_climaticos)
+        return responder_json(dados_climaticos, resultados)
         
     except Exception as e:
         print(f"Erro ao obter dados climáticos: {e}")
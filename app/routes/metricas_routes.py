@@ -0,0 +1,53 @@
+import hmac
+import time
+
+from flask import Blueprint, Response, g, request
+
+from app.globals import METRICAS_TOKEN
+from app.process.cliente_appeears import cliente
+from app.process.fila_jobs import fila_jobs
+from app.process.metricas import DURACAO_REQUISICAO, metricas
+from app.process.monitor_tarefas import monitor_tarefas
+
+metricas_bp = Blueprint("metricas", __name__)
+
+# Medidores lidos a cada gravação (somados entre os workers) ou, os globais, no momento da raspagem
+metricas.medidor(
+    "jobs", "Análises executando e na fila (todos os workers).",
+    lambda: fila_jobs.contagem(), ("estado",), por_processo=False,
+)
+metricas.medidor(
+    "appeears_tarefas", "Tarefas do AppEEARS acompanhadas pelos workers, por status.",
+    lambda: monitor_tarefas.contagem(), ("status",),
+)
+metricas.medidor(
+    "cliente_http_eventos_total", "Requisições por endpoint, novas tentativas e acertos de cache do cliente HTTP.",
+    lambda: cliente.contadores(), ("evento",), tipo="counter",
+)
+
+
+def iniciar_cronometro():
+    g.inicio_requisicao = time.perf_counter()
+
+
+def registrar_requisicao(resposta):
+    """
+    after_request: duração da requisição por rota (o padrão da URL, não a URL pedida). Em
+    respostas transmitidas, como o SSE de /progresso, mede até o início da transmissão.
+    """
+    inicio = g.pop("inicio_requisicao", None)
+    if inicio is not None:
+        rota = request.url_rule.rule if request.url_rule is not None else "desconhecida"
+        DURACAO_REQUISICAO.observar(
+            time.perf_counter() - inicio, rota=rota, metodo=request.method, status=resposta.status_code
+        )
+    return resposta
+
+
+@metricas_bp.route("/metrics", methods=["GET"])
+def exportar_metricas():
+    if METRICAS_TOKEN and not hmac.compare_digest(
+        request.headers.get("Authorization", ""), f"Bearer {METRICAS_TOKEN}"
+    ):
+        return Response("Não autorizado\n", status=401, mimetype="text/plain")
+    return Response(metricas.exportar(), mimetype="text/plain; version=0.0.4; charset=utf-8")
@@ -1,73 +1,76 @@
-import shutil
-from flask import Blueprint, request, jsonify, session, url_for
-import threading
-from app.models import processar_dados
-from app.globals import stop_event
-from app.dto.dtos import ProcessarDadosDTO
+import time
+from flask import Blueprint, Response, request, jsonify, session, stream_with_context
+from app.models import processar_dados, processar_lote
+from app.globals import ADMINISTRADORES, MAX_LOCAIS_LOTE, PASTA_DADOS, PERFILAR_JOBS
+from app.dto.dtos import ProcessarDadosDTO, ProcessarLoteDTO
 import os
 import json
 
-from app.process.utils import verificar_token_valido
-from app.globals import api_url
+from app.process.cache_resultados import cache_resultados, salvar_resultados
+from app.process.fila_jobs import FilaCheia, fila_jobs
+from app.process.monitor_tarefas import monitor_tarefas
+from app.process.perfilador import perfilado
+from app.routes.respostas import responder_json
 
 process_bp = Blueprint("process_routes", __name__)
 
-resultados_globais = {}
-
-def baixar_dados_thread(latitude, longitude, cultura, estagio, thread_id, head, user_id):
-    try:
-        stop_event.clear()
-        resultados_globais[thread_id] = {"logs": [], "resultados": None}
-
-        def log(msg):
-            print(msg)
-            resultados_globais[thread_id]["logs"].append(msg)
-
-        log("Iniciando processamento...")
-
-        # Cria o DTO
-        dto = ProcessarDadosDTO(
-            latitude=latitude,
-            longitude=longitude,
-            cultura=cultura,
-            estagio=estagio,
-            head=head,
-            user_id=user_id,
-        )
-
-        # Passa o DTO para a função processar_dados
-        resultados = processar_dados(dto, log=log)
-
-        # Verifica se o processo foi interrompido
-        if stop_event.is_set():
-            log("Processo interrompido pelo usuário. Nenhum dado será retornado.")
-            return
-
-        # Armazena os resultados apenas se o processo não foi interrompido
-        resultados_globais[thread_id]["resultados"] = resultados        # Salva os resultados em disco
-        user_folder = os.path.join("app/static/data", user_id)
-        os.makedirs(user_folder, exist_ok=True)
-        resultados_path = os.path.join(user_folder, f"{user_id}_resultados.json")
-        with open(resultados_path, "w") as f:
-            json.dump(resultados.to_dict(), f, default=str)  # Converte o DTO para JSON usando to_dict()
-    except Exception as e:
-        if not stop_event.is_set():
-            resultados_globais[thread_id]["logs"].append(f"Erro: {str(e)}")
-            print(f"Erro ao baixar dados: {e}")
+def executar_analise(job, latitude, longitude, cultura, estagio, head, user_id):
+    """
+    Job de análise de um local. Retorna o caminho do JSON de resultados (None se interrompido).
+    """
+    job.log("Iniciando processamento...")
+
+    # Cria o DTO com o cancelamento próprio do job
+    dto = ProcessarDadosDTO(
+        latitude=latitude,
+        longitude=longitude,
+        cultura=cultura,
+        estagio=estagio,
+        head=head,
+        user_id=user_id,
+        stop_event=job.stop_event,
+    )
+
+    # Passa o DTO para a função processar_dados
+    resultados = processar_dados(dto, log=job.log, emitir_progresso=job.progresso)
+
+    # Verifica se o processo foi interrompido
+    if job.stop_event.is_set() or resultados is None:
+        job.log("Processo interrompido pelo usuário. Nenhum dado será retornado.")
+        return None
+
+    # Salva os resultados em disco
+    user_folder = os.path.join(PASTA_DADOS, user_id)
+    os.makedirs(user_folder, exist_ok=True)
+    resultados_path = os.path.join(user_folder, f"{user_id}_resultados.json")
+    salvar_resultados(resultados_path, resultados.to_dict())  # Converte o DTO para JSON usando to_dict()
+    return resultados_path
+
+
+def _com_perfil(funcao, pedido):
+    """
+    A função do job, perfilada quando configurado (PERFILAR_JOBS) ou quando um administrador
+    pede perfil=1 na requisição.
+    """
+    pedido_perfil = str(pedido.get("perfil", "")).lower() in ("1", "true", "sim")
+    if PERFILAR_JOBS or (pedido_perfil and session.get("usuario") in ADMINISTRADORES):
+        return perfilado(funcao)
+    return funcao
+
+
+def _resposta_fila_cheia(erro):
+    resposta = jsonify({
+        "error": "Muitas análises em andamento. Tente novamente em instantes.",
+        "posicao_fila": erro.posicao,
+    })
+    resposta.headers["Retry-After"] = "30"
+    return resposta, 429
 
 @process_bp.route("/iniciar-carregamento", methods=["POST"])
 def iniciar_carregamento():
-    if "head" not in session:
-        return jsonify({"error": "Usuário não autenticado"}), 401
-
     head = session["head"]
     user_id = session["user_id"]
 
-    # Verifica se o token ainda é válido
-    if not verificar_token_valido(api_url, head):
-        session.pop("head", None)  # Remove o token inválido da sessão
-        return jsonify({"error": "Token expirado. Faça login novamente.", "redirect": url_for("main.acesso")}), 401
-
     try:
         # Extrai os dados do formulário
         latitude = request.form.get("latitude")
@@ -79,66 +82,161 @@ def iniciar_carregamento():
         if not all([latitude, longitude, cultura, estagio]):
             return jsonify({"error": "Todos os campos (latitude, longitude, cultura, estagio) são obrigatórios"}), 400
 
-        # Gera o thread_id
-        thread_id = f"{latitude}_{longitude}_{cultura}_{estagio}"
-
-        # Inicia a thread com o DTO
-        thread = threading.Thread(
-            target=baixar_dados_thread,
-            args=(latitude, longitude, cultura, estagio, thread_id, head, user_id),
-        )
-        thread.start()
+        # Agenda o job na fila; o thread_id devolvido ao frontend é o ID do job
+        try:
+            job_id, posicao = fila_jobs.enfileirar(
+                user_id, "analise", _com_perfil(executar_analise, request.form), latitude, longitude, cultura, estagio,
+                head, user_id
+            )
+        except FilaCheia as e:
+            return _resposta_fila_cheia(e)
 
-        # Retorna JSON com o ID da thread
-        return jsonify({"thread_id": thread_id})
+        return jsonify({"thread_id": job_id, "job_id": job_id, "posicao_fila": posicao}), 202
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
 
-@process_bp.route("/parar-carregamento", methods=["POST"])
-def parar_carregamento():
-    if "head" not in session:
-        return jsonify({"error": "Usuário não autenticado"}), 401
-
+def executar_lote(job, coordenadas, cultura, estagio, head, user_id):
+    """
+    Job de análise em lote. Retorna o caminho do JSON de resultados (None se interrompido).
+    """
+    job.log(f"Iniciando processamento em lote de {len(coordenadas)} local(is)...")
+
+    dto = ProcessarLoteDTO(
+        coordenadas=coordenadas,
+        cultura=cultura,
+        estagio=estagio,
+        head=head,
+        user_id=user_id,
+        stop_event=job.stop_event,
+    )
+    resultados = processar_lote(dto, log=job.log, emitir_progresso=job.progresso)
+
+    if job.stop_event.is_set() or resultados is None:
+        job.log("Processo interrompido pelo usuário. Nenhum dado será retornado.")
+        return None
+
+    user_folder = os.path.join(PASTA_DADOS, user_id)
+    os.makedirs(user_folder, exist_ok=True)
+    resultados_path = os.path.join(user_folder, f"{user_id}_resultados_lote.json")
+    salvar_resultados(resultados_path, resultados.to_dict())
+    return resultados_path
+
+@process_bp.route("/iniciar-carregamento-lote", methods=["POST"])
+def iniciar_carregamento_lote():
+    """
+    Inicia a análise de vários locais. Corpo JSON:
+    {"coordenadas": [[lat, lon], ...], "cultura": "...", "estagio": "..."}
+    """
     head = session["head"]
+    user_id = session["user_id"]
+
+    try:
+        dados = request.get_json(silent=True) or {}
+        coordenadas = dados.get("coordenadas")
+        cultura = dados.get("cultura")
+        estagio = dados.get("estagio")
 
-    # Verifica se o token ainda é válido
-    if not verificar_token_valido(api_url, head):
-        session.pop("head", None)  # Remove o token inválido da sessão
-        return jsonify({"error": "Token expirado. Faça login novamente.", "redirect": url_for("main.acesso")}), 401
+        # Validação dos campos
+        if not all([coordenadas, cultura, estagio]):
+            return jsonify({"error": "Todos os campos (coordenadas, cultura, estagio) são obrigatórios"}), 400
+        if len(coordenadas) > MAX_LOCAIS_LOTE:
+            return jsonify({"error": f"O lote aceita no máximo {MAX_LOCAIS_LOTE} coordenadas"}), 400
+        coordenadas = [(float(lat), float(lon)) for lat, lon in coordenadas]
+
+        try:
+            job_id, posicao = fila_jobs.enfileirar(
+                user_id, "lote", _com_perfil(executar_lote, dados), coordenadas, cultura, estagio, head, user_id
+            )
+        except FilaCheia as e:
+            return _resposta_fila_cheia(e)
+
+        return jsonify({"thread_id": job_id, "job_id": job_id, "posicao_fila": posicao}), 202
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
 
-    stop_event.set()  # Sinaliza para parar o processo
 
-    # Caminho para a pasta de cache
-    cache_dir = "app/static/data"
-    parametros_cache_path = os.path.join(cache_dir, "parametros_cache.json")
+@process_bp.route("/resultados-lote", methods=["GET"])
+def resultados_lote():
+    user_id = session["user_id"]
+    resultados_path = os.path.join(PASTA_DADOS, user_id, f"{user_id}_resultados_lote.json")
+    resultados = cache_resultados.ler(resultados_path)
+    if resultados is None:
+        return jsonify({"error": "Nenhum resultado de lote encontrado"}), 404
+    return responder_json(resultados.dados, resultados)
 
-    if os.path.exists(cache_dir):
-        # Itera sobre os arquivos e pastas dentro de data
-        for item in os.listdir(cache_dir):
-            item_path = os.path.join(cache_dir, item)
-            # Remove tudo, exceto o arquivo parametros_cache.json
-            if item_path != parametros_cache_path:
-                if os.path.isfile(item_path):
-                    os.remove(item_path)
-                elif os.path.isdir(item_path):
-                    shutil.rmtree(item_path)
 
-    return jsonify({"status": "Carregamento interrompido e cache limpo, exceto o arquivo de parâmetros."})
+@process_bp.route("/parar-carregamento", methods=["POST"])
+def parar_carregamento():
+    # Cancela apenas o job informado ou, sem ID, os jobs ativos do próprio usuário
+    dados = request.get_json(silent=True) or {}
+    job_id = dados.get("thread_id") or request.form.get("thread_id") or request.args.get("thread_id")
+    cancelados = fila_jobs.cancelar(job_id=job_id, user_id=session["user_id"])
+
+    return jsonify({"status": "Carregamento interrompido.", "jobs_cancelados": cancelados})
 
 
 @process_bp.route("/status", methods=["GET"])
 def status():
-    if "head" not in session:
-        return jsonify({"error": "Usuário não autenticado"}), 401
-
     head = session["head"]
 
-    # Verifica se o token ainda é válido
-    if not verificar_token_valido(api_url, head):
-        session.pop("head", None)  # Remove o token inválido da sessão
-        return jsonify({"error": "Token expirado. Faça login novamente.", "redirect": url_for("main.acesso")}), 401
-
     thread_id = request.args.get("thread_id")
-    logs = resultados_globais.get(thread_id, {}).get("logs", [])
-    return jsonify({"logs": logs})
+    job = fila_jobs.status(thread_id) if thread_id else {}
+    if job and job["user_id"] != session.get("user_id"):
+        job = {}
+    # Estimativa de conclusão das tarefas do AppEEARS deste usuário (None se não há tarefas pendentes)
+    eta = monitor_tarefas.eta(head)
+    return jsonify({
+        "logs": job.get("logs", []),
+        "estado": job.get("estado"),
+        "posicao_fila": job.get("posicao_fila"),
+        "eta_segundos": round(eta) if eta is not None else None,
+    })
+
+
+@process_bp.route("/progresso", methods=["GET"])
+def progresso():
+    """
+    Fluxo Server-Sent Events do job: eventos "log" (mensagem), "progresso" (etapa, percentual,
+    ano, índice do ano e ETA) e "fim" (estado final). O token é verificado uma única vez,
+    na abertura do fluxo (verificar_autenticacao); as novidades vêm do banco da fila.
+    """
+    job_id = request.args.get("thread_id")
+    if not job_id or fila_jobs.dono(job_id) != session.get("user_id"):
+        return jsonify({"error": "Job não encontrado"}), 404
+
+    # Reconexões do EventSource retomam do último evento recebido ("seq_log-seq_evento")
+    try:
+        seq_log, seq_evento = (int(x) for x in request.headers.get("Last-Event-ID", "0-0").split("-"))
+    except ValueError:
+        seq_log, seq_evento = 0, 0
+
+    def _mensagem(evento, dados):
+        return f"id: {seq_log}-{seq_evento}\nevent: {evento}\ndata: {json.dumps(dados, default=str)}\n\n"
+
+    def gerar():
+        nonlocal seq_log, seq_evento
+        ultimo_envio = time.monotonic()
+        while True:
+            estado, logs, eventos = fila_jobs.novidades(job_id, seq_log, seq_evento)
+            for seq, mensagem in logs:
+                seq_log = seq
+                yield _mensagem("log", {"mensagem": mensagem})
+            for seq, evento in eventos:
+                seq_evento = seq
+                yield _mensagem("progresso", evento)
+            if logs or eventos:
+                ultimo_envio = time.monotonic()
+
+            if estado not in ("na_fila", "executando"):
+                yield _mensagem("fim", {"estado": estado})
+                return
+            if time.monotonic() - ultimo_envio > 15:
+                yield ": keep-alive\n\n"  # Mantém a conexão aberta em proxies
+                ultimo_envio = time.monotonic()
+            time.sleep(0.5)
+
+    resposta = Response(stream_with_context(gerar()), mimetype="text/event-stream")
+    resposta.headers["Cache-Control"] = "no-cache"
+    resposta.headers["X-Accel-Buffering"] = "no"
+    return resposta
@@ -0,0 +1,54 @@
+import gzip
+
+from flask import Response, request
+
+from app.globals import TAMANHO_MINIMO_COMPRESSAO
+from app.process.cache_resultados import serializar
+
+# Tipos de resposta comprimidos (o SSE de /progresso é transmitido sem compressão)
+TIPOS_COMPRIMIVEIS = {"application/json", "text/html", "text/css", "application/javascript", "text/javascript"}
+
+
+def responder_json(dados, resultados):
+    """
+    Resposta JSON derivada de um arquivo de resultados, com ETag e Last-Modified da versão do
+    arquivo: se o cliente já tem essa versão, responde 304 sem corpo.
+    """
+    resposta = Response(serializar(dados), mimetype="application/json")
+    return condicional(resposta, resultados)
+
+
+def condicional(resposta, resultados):
+    resposta.set_etag(resultados.etag)
+    resposta.last_modified = resultados.modificado_em
+    resposta.cache_control.private = True
+    resposta.cache_control.no_cache = True  # O navegador guarda, mas sempre revalida
+    return resposta.make_conditional(request)
+
+
+def comprimir_resposta(resposta):
+    """
+    after_request comum a todos os blueprints: comprime com gzip respostas grandes quando
+    o cliente aceita.
+    """
+    resposta.vary.add("Accept-Encoding")
+    if (
+        resposta.status_code != 200
+        or resposta.direct_passthrough
+        or resposta.is_streamed
+        or "Content-Encoding" in resposta.headers
+        or resposta.mimetype not in TIPOS_COMPRIMIVEIS
+        or "gzip" not in request.accept_encodings
+    ):
+        return resposta
+
+    corpo = resposta.get_data()
+    if len(corpo) < TAMANHO_MINIMO_COMPRESSAO:
+        return resposta
+    resposta.set_data(gzip.compress(corpo, compresslevel=6))
+    resposta.headers["Content-Encoding"] = "gzip"
+    # A versão comprimida tem outros bytes: a ETag passa a ser fraca (mesma versão dos dados)
+    etag, fraca = resposta.get_etag()
+    if etag and not fraca:
+        resposta.set_etag(etag, weak=True)
+    return resposta
@@ -1,5 +1,6 @@
 from flask import Blueprint, jsonify, session
-from app.process.utils import excluir_dados_usuario, carregar_usuarios, salvar_usuarios
+from app.process.utils import excluir_dados_usuario
+from app.process.banco_usuarios import banco_usuarios
 from app.globals import api_url
 user_bp = Blueprint("user_routes", __name__)
 
@@ -12,13 +13,8 @@ def apagar_conta():
     user_id = session.get("user_id")
     head = session.get("head")
 
-    # Carrega o banco de dados de usuários
-    usuarios = carregar_usuarios()
-
     # Remove o usuário do banco de dados
-    if usuario in usuarios:
-        del usuarios[usuario]
-        salvar_usuarios(usuarios)
+    banco_usuarios.remover(usuario)
 
     # Exclui os dados do usuário (pasta de cache e tasks no AppEEARS)
     if user_id and head:
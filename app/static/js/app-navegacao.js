@@ -238,7 +238,10 @@ class IrrigaApp {
         }
 
         // Exibir mapa de aridez
-        if (dados.mapa_IA) {
+        if (dados.mapa_IA_tiles && window.L) {
+            // Mapa interativo: só os tiles visíveis são carregados
+            this.exibirMapaAridezTiles(dados);
+        } else if (dados.mapa_IA) {
             this.exibirMapaAridez(dados.mapa_IA);
         }
 
@@ -576,6 +579,35 @@ class IrrigaApp {
         }
     }
 
+    exibirMapaAridezTiles(dados) {
+        const container = document.getElementById('mapa-aridez');
+        const divMapa = document.getElementById('leaflet-mapa');
+        if (!container || !divMapa) return;
+
+        container.style.display = 'block';
+        container.querySelector('.loading-spinner').style.display = 'none';
+        container.querySelector('.loading-text').style.display = 'none';
+        divMapa.style.display = 'block';
+
+        if (this.mapaAridez) {
+            this.mapaAridez.remove();
+        }
+        const [oeste, sul, leste, norte] = dados.limites_IA;
+        const limites = L.latLngBounds([sul, oeste], [norte, leste]);
+        this.mapaAridez = L.map(divMapa);
+        L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
+            attribution: '&copy; OpenStreetMap'
+        }).addTo(this.mapaAridez);
+        L.tileLayer(dados.mapa_IA_tiles, { opacity: 0.75, bounds: limites, maxZoom: 18 }).addTo(this.mapaAridez);
+        this.mapaAridez.fitBounds(limites);
+
+        // O botão de expansão continua mostrando o PNG completo do mapa
+        const expandBtn = document.getElementById('expandir-mapa');
+        if (expandBtn && dados.mapa_IA) {
+            expandBtn.onclick = () => this.abrirMapaModal(`/static/${dados.mapa_IA}`, true);
+        }
+    }
+
     exibirMapaAridez(caminhoMapa) {
         const container = document.getElementById('mapa-aridez');
         const iframe = document.getElementById('iframe-mapa');
@@ -90,7 +90,7 @@ document.addEventListener("DOMContentLoaded", () => {
     }, 500); // Delay para garantir que o modal carregue
   });
 
-  let statusInterval = null; // Variável global para controlar o polling
+  let fonteProgresso = null; // EventSource do job em andamento
 
   document.querySelector("form").addEventListener("submit", function (e) {
     e.preventDefault();
@@ -106,9 +106,21 @@ document.addEventListener("DOMContentLoaded", () => {
       method: "POST",
       body: formData,
     })
-      .then((res) => res.json())
-      .then((data) => {
+      .then((res) => res.json().then((data) => ({ status: res.status, data })))
+      .then(({ status, data }) => {
         cancelamentoSolicitado = false;
+
+        // Fila cheia: o servidor informa quantas análises aguardam à frente
+        if (status === 429) {
+          document.getElementById("logStatus").textContent =
+            `Servidor ocupado: ${data.posicao_fila} análise(s) na fila. Tente novamente em instantes.`;
+          setTimeout(() => {
+            loadingModal.hide();
+            isModalVisible = false;
+          }, 3000);
+          return;
+        }
+
         const threadId = data.thread_id;
 
         // SALVA O THREAD_ID NO LOCALSTORAGE
@@ -118,91 +130,83 @@ document.addEventListener("DOMContentLoaded", () => {
       });
   });
 
+  // Acompanha o job pelo fluxo de eventos do servidor (sem polling)
   function buscarLogs(threadId) {
     const logContainer = document.getElementById("logStatus");
     const progressBar = document.getElementById("progressBar");
+    let ultimoLog = "Iniciando...";
+    let etaSegundos = null;
+
+    if (fonteProgresso) {
+      fonteProgresso.close();
+    }
+    fonteProgresso = new EventSource(
+      `/progresso?thread_id=${encodeURIComponent(threadId)}`
+    );
 
-    fetch(`/status?thread_id=${threadId}`)
-      .then((res) => res.json())
-      .then((data) => {
-        const logs = data.logs || [];
-        let ultimoLog = logs[logs.length - 1] || "Iniciando...";
-
-        const cancelado = logs.some(
-          (log) =>
-            log.includes("cancelada") ||
-            log.includes("interrompido") ||
-            log.includes("Processo interrompido pelo usuário") ||
-            log.includes("Erro") ||
-            log.includes("Cache limpo")
-        );
-
-        const completo = logs.some((log) =>
-          log.includes("Processamento completo")
-        );
-
-        // Verifica se o cancelamento foi solicitado
-        if (!cancelamentoSolicitado) {
-          // Atualiza a barra de progresso
-          const progresso = Math.min((logs.length / 20) * 100, 100); // Supondo 10 etapas
-          progressBar.style.width = `${progresso}%`;
-          progressBar.setAttribute("aria-valuenow", progresso);
-        }
-
-        if (cancelamentoSolicitado) {
-          const cancelamentoLogs = logs.filter(
-            (log) =>
-              log.includes("Cancelada") ||
-              log.includes("Interrompido") ||
-              log.includes("Processo interrompido pelo usuário") ||
-              log.includes("Erro") ||
-              log.includes("Cache limpo")
-          );
-
-          if (cancelamentoLogs.length > 0) {
-            ultimoLog = cancelamentoLogs[cancelamentoLogs.length - 1];
-            logContainer.textContent = ultimoLog;
-          } else {
-            logContainer.textContent = "Cancelando...";
-          }
-
-          if (cancelado) {
-            clearTimeout(statusInterval);
-            setTimeout(() => {
-              loadingModal.hide();
-              isModalVisible = false;
-            }, 1500);
-          } else {
-            statusInterval = setTimeout(() => buscarLogs(threadId), 2000);
-          }
-
-          return;
-        }
+    function mostrarLog() {
+      if (cancelamentoSolicitado) {
+        const cancelamento =
+          ultimoLog.includes("Cancelada") ||
+          ultimoLog.includes("Interrompido") ||
+          ultimoLog.includes("Processo interrompido pelo usuário") ||
+          ultimoLog.includes("Erro");
+        logContainer.textContent = cancelamento ? ultimoLog : "Cancelando...";
+        return;
+      }
+      logContainer.textContent =
+        etaSegundos != null
+          ? `${ultimoLog} (cerca de ${formatarEta(etaSegundos)} restantes)`
+          : ultimoLog;
+    }
+
+    fonteProgresso.addEventListener("log", (e) => {
+      ultimoLog = JSON.parse(e.data).mensagem;
+      mostrarLog();
+    });
+
+    fonteProgresso.addEventListener("progresso", (e) => {
+      const evento = JSON.parse(e.data);
+      etaSegundos = evento.eta_segundos;
+      if (cancelamentoSolicitado) {
+        return;
+      }
+      progressBar.style.width = `${evento.percentual}%`;
+      progressBar.setAttribute("aria-valuenow", evento.percentual);
+      mostrarLog();
+    });
+
+    fonteProgresso.addEventListener("fim", (e) => {
+      const estado = JSON.parse(e.data).estado;
+      fonteProgresso.close();
+      fonteProgresso = null;
+      localStorage.removeItem("thread_id_em_andamento");
+
+      if (estado === "concluido" && !cancelamentoSolicitado) {
+        progressBar.style.width = "100%"; // Completa a barra
+        window.location.href = `/painel?thread_id=${threadId}`;
+      } else {
+        setTimeout(() => {
+          loadingModal.hide();
+          isModalVisible = false;
+        }, 1500);
+      }
+    });
 
-        logContainer.textContent = ultimoLog;
-
-        if (completo || cancelado) {
-          clearTimeout(statusInterval);
-          localStorage.removeItem("thread_id_em_andamento");
-
-          if (completo) {
-            progressBar.style.width = "100%"; // Completa a barra
-            window.location.href = `/painel?thread_id=${threadId}`;
-          } else {
-            setTimeout(() => {
-              loadingModal.hide();
-              isModalVisible = false;
-            }, 1500);
-          }
-          return;
-        } else {
-          statusInterval = setTimeout(() => buscarLogs(threadId), 2000);
-        }
-      })
-      .catch((err) => {
-        console.error("Erro ao buscar logs:", err);
+    fonteProgresso.onerror = () => {
+      // Quedas de conexão são retomadas pelo próprio EventSource; CLOSED indica recusa do servidor
+      if (fonteProgresso && fonteProgresso.readyState === EventSource.CLOSED) {
         logContainer.textContent = "[Erro ao buscar logs]";
-      });
+        localStorage.removeItem("thread_id_em_andamento");
+      }
+    };
+  }
+
+  function formatarEta(segundos) {
+    if (segundos < 60) {
+      return `${segundos} s`;
+    }
+    return `${Math.round(segundos / 60)} min`;
   }
 
   stopButton.addEventListener("click", function () {
@@ -219,10 +223,14 @@ document.addEventListener("DOMContentLoaded", () => {
     window.addEventListener("beforeunload", bloquearAtualizacao);
 
     // REMOVE O THREAD_ID DO LOCALSTORAGE
+    const threadId = localStorage.getItem("thread_id_em_andamento");
     localStorage.removeItem("thread_id_em_andamento");
 
+    // Cancela apenas o job desta página
     fetch("/parar-carregamento", {
       method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ thread_id: threadId }),
     })
       .then((response) => response.json())
       .catch((error) => {
@@ -0,0 +1,59 @@
+"""
+Compara um resultado do pytest-benchmark (--benchmark-json) com a baseline versionada.
+
+    pytest benchmarks --benchmark-json=resultado.json
+    python benchmarks/comparar.py benchmarks/baselines/referencia.json resultado.json --tolerancia 0.20
+
+Sai com código 1 se a mediana de algum benchmark piorar mais que a tolerância (uso em CI).
+Com --atualizar, o resultado passa a ser a nova baseline.
+"""
+import argparse
+import json
+import shutil
+import sys
+
+
+def medianas(caminho):
+    with open(caminho, "r") as f:
+        dados = json.load(f)
+    return {b["fullname"]: b["stats"]["median"] for b in dados["benchmarks"]}
+
+
+def comparar(referencia, atual, tolerancia):
+    """Retorna (linhas do relatório, nomes dos benchmarks que pioraram além da tolerância)."""
+    linhas, piores = [], []
+    for nome in sorted(set(referencia) | set(atual)):
+        antes, depois = referencia.get(nome), atual.get(nome)
+        if antes is None or depois is None:
+            linhas.append(f"{'novo' if antes is None else 'removido':>9}  {nome}")
+            continue
+        variacao = depois / antes - 1
+        marca = "PIOR" if variacao > tolerancia else ("melhor" if variacao < -tolerancia else "")
+        linhas.append(f"{variacao:+9.1%}  {nome}  ({antes * 1e3:.3f} ms -> {depois * 1e3:.3f} ms) {marca}")
+        if variacao > tolerancia:
+            piores.append(nome)
+    return linhas, piores
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara benchmarks com a baseline.")
+    parser.add_argument("referencia", help="JSON da baseline")
+    parser.add_argument("atual", help="JSON do resultado atual")
+    parser.add_argument("--tolerancia", type=float, default=0.20, help="piora relativa aceita na mediana (padrão 0.20)")
+    parser.add_argument("--atualizar", action="store_true", help="grava o resultado atual como nova baseline")
+    args = parser.parse_args(argv)
+
+    linhas, piores = comparar(medianas(args.referencia), medianas(args.atual), args.tolerancia)
+    print("\n".join(linhas))
+    if args.atualizar:
+        shutil.copyfile(args.atual, args.referencia)
+        print(f"Baseline atualizada: {args.referencia}")
+        return 0
+    if piores:
+        print(f"\n{len(piores)} benchmark(s) mais lentos que a baseline além de {args.tolerancia:.0%}.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
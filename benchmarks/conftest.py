@@ -0,0 +1,94 @@
+"""
+Fixtures dos benchmarks: um diretório de trabalho temporário com dados sintéticos no mesmo
+layout do servidor (app/static/data, app/cache) e a rede desligada.
+"""
+import os
+import threading
+
+import pytest
+
+import dados_sinteticos as ds
+from dados_sinteticos import AREA, LATITUDE, LONGITUDE, USER_ID
+
+
+def pytest_addoption(parser):
+    grupo = parser.getgroup("dados sintéticos")
+    grupo.addoption("--lado-raster", type=int, default=512, help="lado (pixels) dos GeoTIFFs de ET/PET")
+    grupo.addoption("--anos", type=int, default=5, help="quantidade de anos sintéticos")
+    grupo.addoption("--lado-chirps", type=int, default=600, help="lado (pixels, 0,05°) dos GeoTIFFs do CHIRPS")
+
+
+@pytest.fixture(scope="session")
+def configuracao(request):
+    anos = request.config.getoption("--anos")
+    return {
+        "lado_raster": request.config.getoption("--lado-raster"),
+        "lado_chirps": request.config.getoption("--lado-chirps"),
+        "anos": list(range(2024 - anos + 1, 2025)),
+    }
+
+
+@pytest.fixture(scope="session", autouse=True)
+def pasta_trabalho(tmp_path_factory):
+    """Os caminhos do app são relativos: os benchmarks rodam dentro de uma pasta temporária."""
+    pasta = tmp_path_factory.mktemp("trabalho")
+    with pytest.MonkeyPatch.context() as mp:
+        mp.chdir(pasta)
+        yield pasta
+
+
+@pytest.fixture(scope="session", autouse=True)
+def sem_rede():
+    """Toda requisição HTTP do app passa pelo cliente_appeears; nos benchmarks ela falha na hora."""
+    from app.process.cliente_appeears import ClienteAppEEARS
+
+    def requisitar(self, metodo, url, timeout=None, **kwargs):
+        raise RuntimeError(f"Rede desativada nos benchmarks: {metodo} {url}")
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(ClienteAppEEARS, "requisitar", requisitar)
+        yield
+
+
+@pytest.fixture(scope="session")
+def pasta_local(pasta_trabalho, configuracao):
+    """Pasta do local de processar_dados com os anos de ET/PET já "baixados" do AppEEARS."""
+    pasta = os.path.join("app", "static", "data", USER_ID, f"{float(LATITUDE)}_{float(LONGITUDE)}_{AREA}")
+    ds.gerar_local_mod16(pasta, configuracao["anos"], ds.limites_area(LATITUDE, LONGITUDE, AREA), configuracao["lado_raster"])
+    os.makedirs(os.path.join(pasta, "resultados"), exist_ok=True)
+    return pasta
+
+
+@pytest.fixture(scope="session")
+def acervo_chirps(pasta_trabalho, configuracao):
+    """GeoTIFFs do CHIRPS no acervo compartilhado, cobrindo a área do local."""
+    from app.process.acervo_chirps import PASTA_CHIRPS
+
+    lado_graus = configuracao["lado_chirps"] * 0.05
+    return ds.gerar_chirps(PASTA_CHIRPS, configuracao["anos"], ds.limites_area(LATITUDE, LONGITUDE, lado_graus))
+
+
+@pytest.fixture(scope="session")
+def gazetteer(pasta_trabalho):
+    from app.process.geocodificador import ARQUIVO_GAZETTEER
+
+    return ds.gerar_gazetteer(ARQUIVO_GAZETTEER)
+
+
+@pytest.fixture
+def data_json():
+    from app.process.map_operations import montar_data_json
+
+    oeste, sul, leste, norte = ds.limites_area(LATITUDE, LONGITUDE, AREA)
+    return montar_data_json([[oeste, norte], [leste, norte], [leste, sul], [oeste, sul]])
+
+
+@pytest.fixture
+def parar():
+    return threading.Event()
+
+
+@pytest.fixture
+def log():
+    """Descarta as mensagens de progresso, para não medir a saída no terminal."""
+    return lambda *args, **kwargs: None
@@ -0,0 +1,134 @@
+"""
+Geradores de dados sintéticos no formato dos arquivos reais: estatísticas e GeoTIFFs de ET/PET
+do MOD16A3GF (como entregues pelo AppEEARS), GeoTIFFs anuais do CHIRPS e o gazetteer de municípios.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import rasterio
+from rasterio.transform import from_bounds
+
+# Local usado pelos benchmarks (mesma área de 10° que processar_dados pede ao AppEEARS)
+LATITUDE = -8.2
+LONGITUDE = -36.0
+AREA = 10
+USER_ID = "benchmark"
+
+PREENCHIMENTO_MOD16 = 32767
+NODATA_CHIRPS = -9999.0
+COLUNAS_ESTATISTICAS = [
+    "File Name", "Dataset", "aid", "Date", "Count", "Minimum", "Maximum", "Range", "Mean",
+    "Standard Deviation", "Variance", "Upper Quartile", "Upper 1.5 IQR", "Median", "Lower 1.5 IQR", "Lower Quartile",
+]
+
+
+def limites_area(latitude, longitude, lado_graus):
+    """(oeste, sul, leste, norte) do quadrado de lado_graus centrado no ponto, como o getBox."""
+    meio = lado_graus / 2
+    return longitude - meio, latitude - meio, longitude + meio, latitude + meio
+
+
+def gravar_tif(caminho, dados, limites, nodata):
+    altura, largura = dados.shape
+    with rasterio.open(
+        caminho, "w", driver="GTiff", height=altura, width=largura, count=1, dtype=dados.dtype,
+        crs="EPSG:4326", transform=from_bounds(*limites, largura, altura), nodata=nodata,
+    ) as dst:
+        dst.write(dados, 1)
+
+
+def gerar_bandas_mod16(pasta, ano, limites, lado_px, rng, fracao_preenchimento=0.02, aid=1):
+    """
+    Grava os GeoTIFFs de ET e PET (int16, 0,1 mm/ano, com pixels de preenchimento) de uma área
+    (aid) em um ano e retorna as linhas correspondentes do CSV de estatísticas do AppEEARS.
+    """
+    os.makedirs(pasta, exist_ok=True)
+    et = rng.integers(1000, 9000, (lado_px, lado_px)).astype(np.int16)
+    pet = (et + rng.integers(4000, 12000, (lado_px, lado_px))).astype(np.int16)
+    preenchidos = rng.random((lado_px, lado_px)) < fracao_preenchimento
+    et[preenchidos] = PREENCHIMENTO_MOD16
+    pet[preenchidos] = PREENCHIMENTO_MOD16
+
+    linhas = []
+    for banda, dados in (("ET_500m", et), ("PET_500m", pet)):
+        nome = f"MOD16A3GF.061_{banda}_doy{ano}001_aid{aid:04d}.tif"
+        gravar_tif(os.path.join(pasta, nome), dados, limites, PREENCHIMENTO_MOD16)
+        validos = dados[~preenchidos].astype(np.float64) * 0.1
+        linhas.append([
+            nome, banda, f"aid{aid:04d}", f"{ano}-01-01", validos.size, validos.min(), validos.max(),
+            validos.max() - validos.min(), validos.mean(), validos.std(), validos.var(),
+            np.percentile(validos, 75), validos.max(), np.median(validos), validos.min(), np.percentile(validos, 25),
+        ])
+    return linhas
+
+
+def gravar_estatisticas_mod16(pasta, linhas):
+    pd.DataFrame(linhas, columns=COLUNAS_ESTATISTICAS).to_csv(
+        os.path.join(pasta, "MOD16A3GF-061-Statistics.csv"), index=False
+    )
+
+
+def gerar_ano_mod16(pasta_ano, ano, limites, lado_px, rng, fracao_preenchimento=0.02):
+    """
+    Grava os GeoTIFFs de ET e PET e o MOD16A3GF-061-Statistics.csv do ano.
+    Retorna as médias (ET, PET) em mm/ano.
+    """
+    linhas = gerar_bandas_mod16(pasta_ano, ano, limites, lado_px, rng, fracao_preenchimento)
+    gravar_estatisticas_mod16(pasta_ano, linhas)
+    return linhas[0][8], linhas[1][8]
+
+
+def gerar_local_mod16(pasta_local, anos, limites, lado_px, semente=0):
+    """Pastas BALANCO_HIDRICO_{ano} de um local, como após o download das tarefas do AppEEARS."""
+    rng = np.random.default_rng(semente)
+    return {
+        ano: gerar_ano_mod16(os.path.join(pasta_local, f"BALANCO_HIDRICO_{ano}"), ano, limites, lado_px, rng)
+        for ano in anos
+    }
+
+
+def gerar_chirps(pasta, anos, limites, resolucao=0.05, semente=0):
+    """
+    GeoTIFFs anuais do CHIRPS (float32, mm/ano, nodata -9999 sobre parte do oceano) cobrindo os
+    limites informados, com os nomes do acervo (chirps-v2.0.{ano}.tif).
+    """
+    os.makedirs(pasta, exist_ok=True)
+    largura = int(round((limites[2] - limites[0]) / resolucao))
+    altura = int(round((limites[3] - limites[1]) / resolucao))
+    rng = np.random.default_rng(semente)
+    caminhos = {}
+    for ano in anos:
+        dados = rng.gamma(4.0, 200.0, (altura, largura)).astype(np.float32)
+        dados[:, : largura // 10] = NODATA_CHIRPS
+        caminhos[ano] = os.path.join(pasta, f"chirps-v2.0.{ano}.tif")
+        gravar_tif(caminhos[ano], dados, limites, NODATA_CHIRPS)
+    return caminhos
+
+
+def gerar_gazetteer(caminho, quantidade=5570, semente=0):
+    """Gazetteer com centroides aleatórios sobre o Brasil, no formato do gerado pelo geocodificador."""
+    rng = np.random.default_rng(semente)
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    pd.DataFrame({
+        "codigo_ibge": np.arange(1100000, 1100000 + quantidade),
+        "nome": [f"Municipio {i}" for i in range(quantidade)],
+        "uf": "XX",
+        "estado": "Estado",
+        "latitude": rng.uniform(-33.7, 5.2, quantidade),
+        "longitude": rng.uniform(-73.9, -34.8, quantidade),
+    }).to_csv(caminho, index=False)
+    return caminho
+
+
+def balanco_sintetico(anos, semente=0):
+    """DataFrames (balanço hídrico, precipitação) anuais com índices já calculados, como após a etapa de índices."""
+    rng = np.random.default_rng(semente)
+    anos = np.asarray(list(anos))
+    et = rng.uniform(300, 900, len(anos))
+    pet = et + rng.uniform(400, 1200, len(anos))
+    precipitacao = rng.uniform(200, 1400, len(anos))
+    balanco = pd.DataFrame({"Ano": anos, "ET": et, "PET": pet, "Deficit": pet - et})
+    balanco["Indice de Aridez UNEP"] = precipitacao / pet
+    balanco["Aridez"] = precipitacao / et
+    return balanco, pd.DataFrame({"Ano": anos, "Precipitacao": precipitacao})
@@ -0,0 +1,14 @@
+"""Mapa de aridez: razão ET/PET por ano, média dos anos, PNG e COG."""
+from app.process.climate_analysis import processar_dados_aridez
+from app.process.graphics import mostraGraficoDoAno
+
+
+def test_mostra_grafico_do_ano(benchmark, pasta_local, configuracao):
+    aridez = benchmark(mostraGraficoDoAno, configuracao["anos"][-1], pasta_local)
+    assert aridez.shape == (configuracao["lado_raster"],) * 2
+
+
+def test_processar_dados_aridez(benchmark, pasta_local, configuracao):
+    anos = configuracao["anos"]
+    caminho = benchmark(processar_dados_aridez, anos[0], anos[-1], pasta_local, f"{pasta_local}/resultados", "Benchmark")
+    assert caminho.endswith(".png")
@@ -0,0 +1,24 @@
+"""Índices e classificações sobre as séries anuais."""
+import pytest
+
+import dados_sinteticos as ds
+from app.process.climate_analysis import calcular_e_classificar_indices_aridez
+from app.process.graphics import calcular_e_gerar_grafico_rai
+
+
+@pytest.fixture(params=[21, 100], ids=lambda n: f"{n}anos")
+def series(request):
+    return ds.balanco_sintetico(range(2024 - request.param + 1, 2025))
+
+
+def test_calcular_e_classificar_indices_aridez(benchmark, series):
+    balanco, _ = series
+    anos = balanco["Ano"]
+    resultados = benchmark(lambda: calcular_e_classificar_indices_aridez(balanco.copy(), anos.iloc[0], anos.iloc[-1]))
+    assert len(resultados) == 4
+
+
+def test_calcular_e_gerar_grafico_rai(benchmark, series):
+    balanco, precipitacao = series
+    dados = benchmark(lambda: calcular_e_gerar_grafico_rai(balanco.copy(), precipitacao, None))
+    assert len(dados["dados"]["anos"]) == len(balanco)
@@ -0,0 +1,17 @@
+"""Leitura dos dados de entrada: estatísticas do MOD16 e recorte anual do CHIRPS."""
+import os
+
+from app.process.data_receiving import precipitacao_ano_chirps, processar_dados_localmente
+
+
+def test_processar_dados_localmente(benchmark, pasta_local, configuracao):
+    ano = configuracao["anos"][-1]
+    arquivo = os.path.join(pasta_local, f"BALANCO_HIDRICO_{ano}", "MOD16A3GF-061-Statistics.csv")
+    et, pet = benchmark(processar_dados_localmente, arquivo)
+    assert et.iloc[0] > 0 and pet.iloc[0] > et.iloc[0]
+
+
+def test_precipitacao_ano_chirps(benchmark, acervo_chirps, data_json, pasta_local, parar, configuracao, log):
+    ano = configuracao["anos"][-1]
+    media = benchmark(precipitacao_ano_chirps, ano, data_json, pasta_local, parar, log=log)
+    assert media > 0
@@ -0,0 +1,23 @@
+"""Análise completa (processar_dados) sobre os dados sintéticos, sem acesso à rede."""
+import os
+
+from dados_sinteticos import LATITUDE, LONGITUDE, USER_ID
+from app.dto.dtos import ProcessarDadosDTO
+from app.models import processar_dados
+from app.process.tabela_anual import ARQUIVO_TABELA
+
+
+def test_processar_dados(benchmark, pasta_local, acervo_chirps, gazetteer, configuracao, log):
+    anos = configuracao["anos"]
+    tabela = os.path.join(pasta_local, ARQUIVO_TABELA)
+
+    def sem_tabela_anual():
+        # Cada rodada relê as estatísticas e o CHIRPS, em vez de só a tabela anual já calculada
+        if os.path.exists(tabela):
+            os.remove(tabela)
+        dto = ProcessarDadosDTO(LATITUDE, LONGITUDE, "milho", "medio", {}, USER_ID, ano_inicial=anos[0], ano_final=anos[-1])
+        return (dto,), {"log": log}
+
+    resultados = benchmark.pedantic(processar_dados, setup=sem_tabela_anual, rounds=5, warmup_rounds=1)
+    assert resultados is not None
+    assert resultados.dados_grafico_aridez["dados"]["anos"] == anos
@@ -0,0 +1,82 @@
+"""
+Teste de carga com Locust: agricultores simultâneos fazendo login, pedindo uma análise,
+acompanhando o status até a conclusão e abrindo o painel.
+
+    locust -f carga/locustfile.py --host http://127.0.0.1:5000 --users 50 --spawn-rate 5
+
+O app deve apontar para o simulador (SIMULADOR_URL). Além das rotas, o relatório do Locust traz
+duas medidas do job como um todo: "espera na fila" (do pedido até um worker assumir a análise,
+o que mostra a saturação dos workers) e "análise completa" (do pedido até o fim do job).
+Pedidos recusados com a fila cheia (429) aparecem como "fila cheia".
+"""
+import itertools
+import os
+import random
+import time
+
+from locust import HttpUser, between, task
+
+# Semiárido pernambucano, onde ficam os locais de teste
+LATITUDES = (-9.3, -7.3)
+LONGITUDES = (-41.0, -35.0)
+CULTURAS = ("milho", "feijao", "tomate", "cana-de-acucar")
+ESTAGIOS = ("inicial", "medio", "final")
+
+INTERVALO_STATUS = float(os.environ.get("CARGA_INTERVALO_STATUS", 2))
+LIMITE_ANALISE = float(os.environ.get("CARGA_LIMITE_ANALISE", 3600))
+ESTADOS_FINAIS = ("concluido", "erro", "cancelado")
+
+_numeros = itertools.count(1)
+
+
+class Agricultor(HttpUser):
+    wait_time = between(5, 30)
+
+    def on_start(self):
+        self.usuario = f"agricultor{next(_numeros)}"
+        self.client.post("/autenticar", json={"usuario": self.usuario, "senha": "simulador"})
+
+    @task
+    def analisar(self):
+        formulario = {
+            "latitude": round(random.uniform(*LATITUDES), 4),
+            "longitude": round(random.uniform(*LONGITUDES), 4),
+            "cultura": random.choice(CULTURAS),
+            "estagio": random.choice(ESTAGIOS),
+        }
+        inicio = time.time()
+        with self.client.post("/iniciar-carregamento", data=formulario, catch_response=True) as resposta:
+            if resposta.status_code == 429:
+                resposta.success()
+                self._registrar("fila cheia", inicio)
+                return
+            if resposta.status_code != 202:
+                resposta.failure(f"status {resposta.status_code}")
+                return
+            job_id = resposta.json()["thread_id"]
+
+        estado, em_execucao = None, False
+        while estado not in ESTADOS_FINAIS:
+            if time.time() - inicio > LIMITE_ANALISE:
+                self._registrar("análise completa", inicio, TimeoutError(f"job {job_id} sem conclusão"))
+                return
+            time.sleep(INTERVALO_STATUS)
+            with self.client.get("/status", params={"thread_id": job_id}, catch_response=True) as resposta:
+                if resposta.status_code != 200:
+                    resposta.failure(f"status {resposta.status_code}")
+                    continue
+                estado = resposta.json().get("estado")
+            if not em_execucao and estado != "na_fila":
+                em_execucao = True
+                self._registrar("espera na fila", inicio)
+
+        erro = None if estado == "concluido" else RuntimeError(f"job {job_id} terminou como {estado}")
+        self._registrar("análise completa", inicio, erro)
+        if erro is None:
+            self.client.get("/painel")
+
+    def _registrar(self, nome, inicio, erro=None):
+        self.environment.events.request.fire(
+            request_type="JOB", name=nome, response_time=(time.time() - inicio) * 1000,
+            response_length=0, exception=erro, context={},
+        )
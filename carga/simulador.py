@@ -0,0 +1,437 @@
+"""
+Servidor substituto local das partes do AppEEARS, do CHIRPS e do Nominatim usadas pela análise,
+para testes de carga sem credenciais da NASA nem horas de fila do AppEEARS:
+
+    python -m carga.simulador --porta 5001 --fila 30 --processamento 60 --falhas 0.02 --limite-rps 50
+    SIMULADOR_URL=http://127.0.0.1:5001 python run.py
+
+AppEEARS: login, task, task/{id}, bundle/{id}, bundle/{id}/{file_id}, product/{produto} e
+spatial/proj. As tarefas passam por pending, queued, processing e done conforme os tempos de fila
+e de processamento configurados, com no máximo --tarefas-simultaneas em processamento. Os bundles
+(GeoTIFFs de ET/PET e MOD16A3GF-061-Statistics.csv) e os GeoTIFFs anuais do CHIRPS são sintéticos,
+gerados na primeira vez que são pedidos com os mesmos geradores dos benchmarks.
+
+Falhas (503), limite de requisições por segundo (429 com Retry-After), latência e banda dos
+downloads valem para todos os serviços simulados.
+"""
+import argparse
+import hashlib
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+import numpy as np
+from flask import Flask, Response, jsonify, request
+
+from benchmarks.dados_sinteticos import gerar_bandas_mod16, gerar_chirps, gravar_estatisticas_mod16
+
+TAMANHO_BLOCO = 64 * 1024
+# Região coberta pelos GeoTIFFs sintéticos do CHIRPS (o original é global): o Brasil inteiro
+LIMITES_CHIRPS = (-75.0, -35.0, -30.0, 6.0)
+
+CAMADAS_MOD16 = {
+    "ET_500m": {"Description": "Total Evapotranspiration", "Units": "kg/m^2/year", "ScaleFactor": 0.1, "FillValue": 32767},
+    "LE_500m": {"Description": "Average Latent Heat Flux", "Units": "J/m^2/day", "ScaleFactor": 10000.0, "FillValue": 32767},
+    "PET_500m": {"Description": "Total Potential Evapotranspiration", "Units": "kg/m^2/year", "ScaleFactor": 0.1, "FillValue": 32767},
+    "PLE_500m": {"Description": "Average Potential Latent Heat Flux", "Units": "J/m^2/day", "ScaleFactor": 10000.0, "FillValue": 32767},
+    "ET_QC_500m": {"Description": "Quality control flags", "Units": "class flag", "ScaleFactor": None, "FillValue": 255},
+}
+PROJECOES = [
+    {"Name": "native", "Description": "Native Projection", "Available": True},
+    {"Name": "geographic", "Description": "Geographic", "Proj4": "+proj=longlat +datum=WGS84 +no_defs",
+     "Datum": "wgs84", "EPSG": 4326, "Units": "degrees", "Available": True},
+    {"Name": "sinu_modis", "Description": "MODIS Sinusoidal",
+     "Proj4": "+proj=sinu +lon_0=0 +x_0=0 +y_0=0 +a=6371007.181 +b=6371007.181 +units=m +no_defs",
+     "Units": "meters", "Available": True},
+]
+
+
+class LimiteRequisicoes:
+    """Balde de fichas: no máximo por_segundo requisições por segundo, com rajadas de até um segundo."""
+
+    def __init__(self, por_segundo):
+        self.por_segundo = por_segundo
+        self._fichas = float(por_segundo)
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def permitir(self):
+        if not self.por_segundo:
+            return True
+        with self._lock:
+            agora = time.monotonic()
+            self._fichas = min(self.por_segundo, self._fichas + (agora - self._ultimo) * self.por_segundo)
+            self._ultimo = agora
+            if self._fichas < 1:
+                return False
+            self._fichas -= 1
+            return True
+
+
+class Simulador:
+    """
+    Estado do servidor substituto: tokens emitidos, tarefas (com os horários em que cada uma
+    começa e termina de ser processada) e arquivos sintéticos já gerados.
+    """
+
+    def __init__(self, pasta, fila=30.0, processamento=60.0, tarefas_simultaneas=10, falhas=0.0,
+                 tarefas_com_erro=0.0, limite_rps=0, latencia=0.0, banda_kib=0, validade_token=48 * 3600,
+                 lado_raster=64):
+        self.pasta = pasta
+        self.fila = fila
+        self.processamento = processamento
+        self.falhas = falhas
+        self.tarefas_com_erro = tarefas_com_erro
+        self.latencia = latencia
+        self.banda = banda_kib * 1024
+        self.validade_token = validade_token
+        self.lado_raster = lado_raster
+        self.limite = LimiteRequisicoes(limite_rps)
+
+        self._lock = threading.Lock()
+        self._tokens = {}  # token -> expiração (epoch)
+        self._tarefas = {}  # task_id -> dicionário da tarefa
+        self._arquivos = {}  # file_id -> caminho
+        self._bundles = {}  # task_id -> lista de arquivos do bundle
+        self._gerando = {}  # chave -> threading.Lock da geração em curso
+        # Instantes em que cada vaga de processamento fica livre
+        self._vagas = [0.0] * max(1, tarefas_simultaneas)
+
+    # Autenticação
+
+    def login(self):
+        token = uuid.uuid4().hex
+        expiracao = time.time() + self.validade_token
+        with self._lock:
+            self._tokens[token] = expiracao
+        return {
+            "token_type": "Bearer",
+            "token": token,
+            "expiration": datetime.fromtimestamp(expiracao, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        }
+
+    def token(self):
+        """Token Bearer válido da requisição, ou None."""
+        cabecalho = request.headers.get("Authorization", "")
+        token = cabecalho[len("Bearer "):] if cabecalho.startswith("Bearer ") else None
+        with self._lock:
+            expiracao = self._tokens.get(token)
+        return token if expiracao is not None and expiracao > time.time() else None
+
+    # Tarefas
+
+    def criar_tarefa(self, token, pedido):
+        agora = time.time()
+        with self._lock:
+            vaga = min(range(len(self._vagas)), key=self._vagas.__getitem__)
+            inicio = max(agora + self.fila, self._vagas[vaga])
+            fim = inicio + self.processamento * random.uniform(0.8, 1.2)
+            self._vagas[vaga] = fim
+            tarefa = {
+                "task_id": str(uuid.uuid4()),
+                "task_name": pedido.get("task_name"),
+                "task_type": pedido.get("task_type"),
+                "params": pedido.get("params", {}),
+                "token": token,
+                "criada": agora,
+                "inicio": inicio,
+                "fim": fim,
+                "erro": random.random() < self.tarefas_com_erro,
+                "apagada": False,
+            }
+            self._tarefas[tarefa["task_id"]] = tarefa
+        return tarefa
+
+    def tarefa(self, token, task_id):
+        with self._lock:
+            tarefa = self._tarefas.get(task_id)
+        return tarefa if tarefa is not None and tarefa["token"] == token and not tarefa["apagada"] else None
+
+    def tarefas(self, token):
+        with self._lock:
+            return [t for t in self._tarefas.values() if t["token"] == token and not t["apagada"]]
+
+    def apagar(self, tarefa):
+        with self._lock:
+            tarefa["apagada"] = True
+
+    def status(self, tarefa, agora=None):
+        agora = agora or time.time()
+        if agora < tarefa["criada"] + 1:
+            return "pending"
+        if agora < tarefa["inicio"]:
+            return "queued"
+        if agora < tarefa["fim"]:
+            return "processing"
+        return "error" if tarefa["erro"] else "done"
+
+    def descrever(self, tarefa):
+        """Tarefa no formato das respostas de task e task/{id} do AppEEARS."""
+        return {
+            "task_id": tarefa["task_id"],
+            "task_name": tarefa["task_name"],
+            "task_type": tarefa["task_type"],
+            "status": self.status(tarefa),
+            "created": _iso(tarefa["criada"]),
+            "updated": _iso(min(time.time(), tarefa["fim"])),
+            "params": tarefa["params"],
+        }
+
+    # Arquivos sintéticos
+
+    def bundle(self, tarefa):
+        """Arquivos do bundle da tarefa, gerados uma única vez (ET/PET por área e ano e as estatísticas)."""
+        task_id = tarefa["task_id"]
+        with self._gerador(f"bundle_{task_id}"):
+            if task_id in self._bundles:
+                return self._bundles[task_id]
+
+            pasta = os.path.join(self.pasta, "bundles", task_id)
+            params = tarefa["params"]
+            primeiro, ultimo = params["dates"][0]["yearRange"]
+            features = params["geo"].get("features") or [{"geometry": params["geo"]}]
+            rng = np.random.default_rng(int(hashlib.sha1(task_id.encode()).hexdigest()[:8], 16))
+
+            linhas = []
+            for aid, feature in enumerate(features, start=1):
+                limites = _limites_geometria(feature["geometry"])
+                for ano in range(int(primeiro), int(ultimo) + 1):
+                    linhas += gerar_bandas_mod16(pasta, ano, limites, self.lado_raster, rng, aid=aid)
+            gravar_estatisticas_mod16(pasta, linhas)
+
+            arquivos = []
+            for nome in sorted(os.listdir(pasta)):
+                caminho = os.path.join(pasta, nome)
+                file_id = str(uuid.uuid4())
+                arquivos.append({
+                    "file_id": file_id,
+                    "file_name": nome,
+                    "file_size": os.path.getsize(caminho),
+                    "file_type": nome.rsplit(".", 1)[-1],
+                    "sha256": _sha256(caminho),
+                })
+                self._arquivos[file_id] = caminho
+            self._bundles[task_id] = arquivos
+            return arquivos
+
+    def arquivo_bundle(self, file_id):
+        return self._arquivos.get(file_id)
+
+    def tif_chirps(self, ano):
+        pasta = os.path.join(self.pasta, "chirps")
+        caminho = os.path.join(pasta, f"chirps-v2.0.{ano}.tif")
+        with self._gerador(f"chirps_{ano}"):
+            if not os.path.exists(caminho):
+                gerar_chirps(pasta, [ano], LIMITES_CHIRPS, semente=ano)
+        return caminho
+
+    def _gerador(self, chave):
+        with self._lock:
+            return self._gerando.setdefault(chave, threading.Lock())
+
+    # Condições de rede
+
+    def perturbar(self):
+        """Resposta de erro simulada (429 ou 503) para a requisição atual, ou None."""
+        if self.latencia:
+            time.sleep(self.latencia)
+        if not self.limite.permitir():
+            resposta = jsonify({"message": "Too many requests"})
+            resposta.headers["Retry-After"] = "1"
+            return resposta, 429
+        if random.random() < self.falhas:
+            return jsonify({"message": "Service temporarily unavailable"}), 503
+        return None
+
+    def enviar_arquivo(self, caminho, tipo="application/octet-stream"):
+        """Envia o arquivo com suporte a Range (retomada dos downloads) e limite de banda."""
+        tamanho = os.path.getsize(caminho)
+        inicio, fim, status = 0, tamanho, 200
+        cabecalhos = {"Accept-Ranges": "bytes"}
+        if request.range is not None and request.range.units == "bytes" and len(request.range.ranges) == 1:
+            faixa = request.range.range_for_length(tamanho)
+            if faixa is None:
+                return Response(status=416, headers={"Content-Range": f"bytes */{tamanho}"})
+            inicio, fim = faixa
+            status = 206
+            cabecalhos["Content-Range"] = f"bytes {inicio}-{fim - 1}/{tamanho}"
+        cabecalhos["Content-Length"] = str(fim - inicio)
+
+        banda = self.banda
+
+        def gerar():
+            with open(caminho, "rb") as f:
+                f.seek(inicio)
+                restante = fim - inicio
+                while restante > 0:
+                    bloco = f.read(min(TAMANHO_BLOCO, restante))
+                    if not bloco:
+                        break
+                    restante -= len(bloco)
+                    yield bloco
+                    if banda:
+                        time.sleep(len(bloco) / banda)
+
+        return Response(gerar(), status=status, headers=cabecalhos, mimetype=tipo, direct_passthrough=True)
+
+
+def criar_app(simulador):
+    app = Flask(__name__)
+
+    @app.before_request
+    def perturbar():
+        return simulador.perturbar()
+
+    def _exigir_token():
+        token = simulador.token()
+        if token is None:
+            return None, (jsonify({"message": "You are not authorized to access this resource"}), 403)
+        return token, None
+
+    # AppEEARS
+
+    @app.route("/api/", methods=["GET"])
+    def raiz():
+        _, erro = _exigir_token()
+        return erro or jsonify({"message": "AppEEARS (simulador)"})
+
+    @app.route("/api/login", methods=["POST"])
+    def login():
+        if request.authorization is None or not request.authorization.username:
+            return jsonify({"message": "Authentication required"}), 401
+        return jsonify(simulador.login())
+
+    @app.route("/api/product/<produto>", methods=["GET"])
+    def produto(produto):
+        if not produto.startswith("MOD16A3GF"):
+            return jsonify({"message": f"Product {produto} not found"}), 404
+        return jsonify(CAMADAS_MOD16)
+
+    @app.route("/api/spatial/proj", methods=["GET"])
+    def projecoes():
+        return jsonify(PROJECOES)
+
+    @app.route("/api/task", methods=["GET", "POST"])
+    def tarefas():
+        token, erro = _exigir_token()
+        if erro:
+            return erro
+        if request.method == "GET":
+            return jsonify([simulador.descrever(t) for t in simulador.tarefas(token)])
+
+        pedido = request.get_json(silent=True) or {}
+        params = pedido.get("params") or {}
+        if pedido.get("task_type") != "area" or "geo" not in params or not params.get("dates"):
+            return jsonify({"message": "Invalid task request"}), 400
+        tarefa = simulador.criar_tarefa(token, pedido)
+        return jsonify({"task_id": tarefa["task_id"], "status": "pending"}), 202
+
+    @app.route("/api/task/<task_id>", methods=["GET", "DELETE"])
+    def tarefa(task_id):
+        token, erro = _exigir_token()
+        if erro:
+            return erro
+        tarefa = simulador.tarefa(token, task_id)
+        if tarefa is None:
+            return jsonify({"message": f"Task {task_id} not found"}), 404
+        if request.method == "DELETE":
+            simulador.apagar(tarefa)
+            return Response(status=204)
+        return jsonify(simulador.descrever(tarefa))
+
+    @app.route("/api/bundle/<task_id>", methods=["GET"])
+    def bundle(task_id):
+        token, erro = _exigir_token()
+        if erro:
+            return erro
+        tarefa = simulador.tarefa(token, task_id)
+        if tarefa is None or simulador.status(tarefa) != "done":
+            return jsonify({"message": f"Bundle {task_id} not found"}), 404
+        return jsonify({
+            "task_id": task_id,
+            "bundle_type": "area",
+            "files": simulador.bundle(tarefa),
+            "created": _iso(tarefa["fim"]),
+            "updated": _iso(tarefa["fim"]),
+        })
+
+    @app.route("/api/bundle/<task_id>/<file_id>", methods=["GET"])
+    def arquivo_bundle(task_id, file_id):
+        token, erro = _exigir_token()
+        if erro:
+            return erro
+        caminho = simulador.arquivo_bundle(file_id)
+        if simulador.tarefa(token, task_id) is None or caminho is None:
+            return jsonify({"message": f"File {file_id} not found"}), 404
+        return simulador.enviar_arquivo(caminho)
+
+    # CHIRPS (GET também atende HEAD)
+
+    @app.route("/chirps/chirps-v2.0.<int:ano>.tif", methods=["GET"])
+    def chirps(ano):
+        return simulador.enviar_arquivo(simulador.tif_chirps(ano), tipo="image/tiff")
+
+    # Nominatim
+
+    @app.route("/nominatim/reverse", methods=["GET"])
+    def nominatim():
+        try:
+            latitude, longitude = float(request.args["lat"]), float(request.args["lon"])
+        except (KeyError, ValueError):
+            return jsonify({"error": "Unable to geocode"}), 400
+        return jsonify({
+            "lat": str(latitude),
+            "lon": str(longitude),
+            "display_name": f"Município {latitude:.1f} {longitude:.1f}, Brasil",
+            "address": {"town": f"Município {latitude:.1f} {longitude:.1f}", "state": "Simulado", "country_code": "br"},
+        })
+
+    return app
+
+
+def _limites_geometria(geometria):
+    pontos = np.asarray(geometria["coordinates"][0], dtype=np.float64)
+    return pontos[:, 0].min(), pontos[:, 1].min(), pontos[:, 0].max(), pontos[:, 1].max()
+
+
+def _sha256(caminho):
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(TAMANHO_BLOCO), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def _iso(epoch):
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor substituto do AppEEARS, do CHIRPS e do Nominatim.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=5001)
+    parser.add_argument("--pasta", help="pasta dos arquivos sintéticos (padrão: pasta temporária)")
+    parser.add_argument("--fila", type=float, default=30.0, help="segundos mínimos de cada tarefa na fila")
+    parser.add_argument("--processamento", type=float, default=60.0, help="segundos de processamento de cada tarefa (±20%%)")
+    parser.add_argument("--tarefas-simultaneas", type=int, default=10, help="tarefas processadas ao mesmo tempo")
+    parser.add_argument("--falhas", type=float, default=0.0, help="fração das requisições respondidas com 503")
+    parser.add_argument("--tarefas-com-erro", type=float, default=0.0, help="fração das tarefas que terminam em error")
+    parser.add_argument("--limite-rps", type=float, default=0, help="requisições por segundo antes do 429 (0: sem limite)")
+    parser.add_argument("--latencia", type=float, default=0.0, help="segundos somados a cada resposta")
+    parser.add_argument("--banda", type=int, default=0, help="KiB/s de cada download (0: sem limite)")
+    parser.add_argument("--validade-token", type=float, default=48 * 3600, help="segundos de validade dos tokens")
+    parser.add_argument("--lado-raster", type=int, default=64, help="lado (pixels) dos GeoTIFFs de ET/PET")
+    args = parser.parse_args()
+
+    pasta = args.pasta or tempfile.mkdtemp(prefix="simulador_")
+    print(f"Arquivos sintéticos em {pasta}")
+    simulador = Simulador(
+        pasta, fila=args.fila, processamento=args.processamento, tarefas_simultaneas=args.tarefas_simultaneas,
+        falhas=args.falhas, tarefas_com_erro=args.tarefas_com_erro, limite_rps=args.limite_rps,
+        latencia=args.latencia, banda_kib=args.banda, validade_token=args.validade_token, lado_raster=args.lado_raster,
+    )
+    criar_app(simulador).run(host=args.host, port=args.porta, threaded=True)
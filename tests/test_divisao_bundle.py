@@ -0,0 +1,72 @@
+"""
+Divisão dos bundles de tarefas multianuais e de lote do AppEEARS nas pastas BALANCO_HIDRICO_{ano}.
+
+    pytest tests
+"""
+import os
+
+import numpy as np
+
+from app.process.data_receiving import dividir_bundle_lote, dividir_bundle_multianual, processar_dados_localmente
+from benchmarks.dados_sinteticos import (
+    AREA, LATITUDE, LONGITUDE, gerar_bandas_mod16, gravar_estatisticas_mod16, limites_area
+)
+
+ESTATISTICAS = "MOD16A3GF-061-Statistics.csv"
+
+
+def _bundle(pasta, anos):
+    rng = np.random.default_rng(0)
+    limites = limites_area(LATITUDE, LONGITUDE, AREA)
+    linhas = []
+    for ano in anos:
+        linhas += gerar_bandas_mod16(pasta, ano, limites, 8, rng)
+    gravar_estatisticas_mod16(pasta, linhas)
+
+
+def test_ano_ausente_no_bundle_nao_e_criado(tmp_path):
+    bundle = tmp_path / "BALANCO_HIDRICO_2020_2022"
+    _bundle(str(bundle), [2020, 2022])
+
+    divididos = dividir_bundle_multianual(str(bundle), [2020, 2021, 2022], str(tmp_path))
+
+    assert divididos == [2020, 2022]
+    # Sem pasta nem CSV, o ano continua ausente e é pedido de novo na próxima análise
+    assert not os.path.exists(tmp_path / "BALANCO_HIDRICO_2021")
+    for ano in divididos:
+        pasta_ano = tmp_path / f"BALANCO_HIDRICO_{ano}"
+        assert sorted(f for f in os.listdir(pasta_ano) if f.endswith(".tif")) == [
+            f"MOD16A3GF.061_ET_500m_doy{ano}001_aid0001.tif", f"MOD16A3GF.061_PET_500m_doy{ano}001_aid0001.tif",
+        ]
+        et, pet = processar_dados_localmente(str(pasta_ano / ESTATISTICAS))
+        assert 0 < et.iloc[0] < pet.iloc[0]
+
+
+def test_ano_sem_geotiffs_nao_e_criado(tmp_path):
+    bundle = tmp_path / "BALANCO_HIDRICO_2020_2021"
+    _bundle(str(bundle), [2020, 2021])
+    for nome in os.listdir(bundle):
+        if "_doy2021" in nome:
+            os.remove(bundle / nome)
+
+    assert dividir_bundle_multianual(str(bundle), [2020, 2021], str(tmp_path)) == [2020]
+    assert not os.path.exists(tmp_path / "BALANCO_HIDRICO_2021")
+
+
+def test_lote_divide_por_area_e_ignora_anos_sem_dados(tmp_path):
+    bundle = tmp_path / "lote" / "tarefa"
+    rng = np.random.default_rng(0)
+    limites = limites_area(LATITUDE, LONGITUDE, AREA)
+    linhas = gerar_bandas_mod16(str(bundle), 2020, limites, 8, rng, aid=1)
+    linhas += gerar_bandas_mod16(str(bundle), 2021, limites, 8, rng, aid=1)
+    linhas += gerar_bandas_mod16(str(bundle), 2020, limites, 8, rng, aid=2)
+    gravar_estatisticas_mod16(str(bundle), linhas)
+    local_1, local_2 = tmp_path / "local_1", tmp_path / "local_2"
+
+    divididos = dividir_bundle_lote(str(bundle), {1: (str(local_1), [2020, 2021]), 2: (str(local_2), [2020, 2021])})
+
+    assert divididos == {1: [2020, 2021], 2: [2020]}
+    assert not os.path.exists(local_2 / "BALANCO_HIDRICO_2021")
+    assert sorted(f for f in os.listdir(local_2 / "BALANCO_HIDRICO_2020") if f.endswith(".tif")) == [
+        "MOD16A3GF.061_ET_500m_doy2020001_aid0002.tif", "MOD16A3GF.061_PET_500m_doy2020001_aid0002.tif",
+    ]
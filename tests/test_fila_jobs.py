@@ -0,0 +1,59 @@
+"""
+Recuperação dos jobs deixados como ativos por processos que não existem mais.
+
+    pytest tests
+"""
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from app.process.fila_jobs import FilaJobs
+
+
+def _pid_encerrado():
+    processo = subprocess.Popen([sys.executable, "-c", "pass"])
+    processo.wait()
+    return processo.pid
+
+
+def _inserir_job(fila, job_id, estado, pid):
+    conexao = fila._conectar()
+    try:
+        with conexao:
+            conexao.execute(
+                "INSERT INTO jobs (id, user_id, tipo, estado, criado_em, pid, instancia) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, "usuario", "analise", estado, time.time(), pid, "anterior"),
+            )
+    finally:
+        conexao.close()
+
+
+def test_job_de_processo_encerrado_e_interrompido(tmp_path):
+    fila = FilaJobs(str(tmp_path / "jobs.sqlite"), max_simultaneos=1, tamanho_fila=1)
+    _inserir_job(fila, "morto", "executando", _pid_encerrado())
+    _inserir_job(fila, "mesmo_pid", "na_fila", os.getpid())
+
+    # Sem reinício desta instância: a leitura do estado já recupera os jobs
+    assert fila.status("morto")["estado"] == "interrompido"
+    assert fila.novidades("mesmo_pid")[0] == "interrompido"
+    assert fila.contagem() == {"executando": 0, "na_fila": 0}
+
+
+def test_jobs_do_proprio_processo_nao_sao_recuperados(tmp_path):
+    fila = FilaJobs(str(tmp_path / "jobs.sqlite"), max_simultaneos=1, tamanho_fila=0)
+    _inserir_job(fila, "morto", "executando", _pid_encerrado())
+    liberar = threading.Event()
+
+    # Os órfãos não contam para o limite da fila
+    job_id, _ = fila.enfileirar("usuario", "analise", lambda job: liberar.wait(5) and "resultado")
+    assert fila.recuperar_orfaos() == 0
+    assert fila.status(job_id)["estado"] in ("na_fila", "executando")
+
+    liberar.set()
+    for _ in range(50):
+        if fila.status(job_id)["estado"] == "concluido":
+            break
+        time.sleep(0.1)
+    assert fila.status(job_id)["resultado"] == "resultado"
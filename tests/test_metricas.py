@@ -0,0 +1,58 @@
+"""
+Agregação das métricas entre processos (workers do gunicorn) no banco compartilhado.
+
+    pytest tests
+"""
+import time
+
+from app.process import metricas as modulo
+from app.process.metricas import RegistroMetricas
+
+
+def _registro(caminho, ativos):
+    registro = RegistroMetricas(caminho)
+    contador = registro.contador("requisicoes_total", "Requisições.", ("rota",))
+    histograma = registro.histograma("duracao_segundos", "Duração.", buckets=(1, 10))
+    registro.medidor("tarefas", "Tarefas deste processo.", lambda: {"processing": ativos})
+    registro.medidor("jobs", "Jobs do servidor.", lambda: {"executando": 2}, ("estado",), por_processo=False)
+    return registro, contador, histograma
+
+
+def test_soma_os_processos(tmp_path):
+    caminho = str(tmp_path / "metricas.sqlite")
+    a, contador_a, histograma_a = _registro(caminho, 1)
+    b, contador_b, histograma_b = _registro(caminho, 3)
+    contador_a.inc(rota="/status")
+    contador_b.inc(2, rota="/status")
+    histograma_a.observar(0.5)
+    histograma_b.observar(5)
+    b.gravar()
+
+    texto = a.exportar()
+
+    assert 'requisicoes_total{rota="/status"} 3' in texto
+    assert 'duracao_segundos_bucket{le="1"} 1' in texto
+    assert 'duracao_segundos_bucket{le="10"} 2' in texto
+    assert "duracao_segundos_sum 5.5" in texto
+    assert "tarefas 4" in texto
+    # Medidor global: lido uma vez, sem somar os processos
+    assert 'jobs{estado="executando"} 2' in texto
+
+
+def test_processo_encerrado_continua_nos_contadores(tmp_path, monkeypatch):
+    caminho = str(tmp_path / "metricas.sqlite")
+    a, contador_a, _ = _registro(caminho, 1)
+    b, contador_b, _ = _registro(caminho, 3)
+    contador_a.inc(rota="/status")
+    contador_b.inc(2, rota="/status")
+    a.gravar()
+    b.gravar()
+
+    # b para de gravar e expira
+    agora = time.time() + modulo.EXPIRACAO_PROCESSO + 1
+    monkeypatch.setattr(modulo.time, "time", lambda: agora)
+    texto = a.exportar()
+
+    assert 'requisicoes_total{rota="/status"} 3' in texto
+    assert "tarefas 1" in texto
+    assert texto.count("processo_info{") == 1